@@ -0,0 +1,211 @@
+"""
+SQLite database of an analysis (--store): the correlated operations, the
+connections and the detector events, indexed for ad-hoc queries such as
+the slow operations of a client during a few minutes. The query methods
+are used by analyze_logs.py --query and by the UI.
+"""
+
+import json
+import sqlite3
+from itertools import islice
+
+from operation_store import VERBS
+
+# Rows inserted per executemany() call
+STORE_BATCH = 10000
+# Default number of rows returned by a query
+QUERY_LIMIT = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS operations (
+    epoch INTEGER,
+    end_time REAL,
+    conn INTEGER,
+    op INTEGER,
+    verb TEXT,
+    err INTEGER,
+    etime REAL,
+    wtime REAL,
+    optime REAL,
+    client_ip TEXT
+);
+CREATE INDEX IF NOT EXISTS operations_epoch ON operations (epoch);
+CREATE INDEX IF NOT EXISTS operations_conn ON operations (conn, op);
+CREATE INDEX IF NOT EXISTS operations_verb ON operations (verb, epoch);
+CREATE INDEX IF NOT EXISTS operations_client_ip ON operations (client_ip, epoch);
+CREATE TABLE IF NOT EXISTS connections (
+    conn INTEGER,
+    open_time REAL,
+    close_time REAL,
+    client_ip TEXT,
+    ops INTEGER,
+    etime REAL,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS connections_conn ON connections (conn, open_time);
+CREATE INDEX IF NOT EXISTS connections_open_time ON connections (open_time);
+CREATE INDEX IF NOT EXISTS connections_client_ip ON connections (client_ip, open_time);
+CREATE TABLE IF NOT EXISTS events (
+    detector TEXT,
+    epoch INTEGER,
+    timematch TEXT,
+    severity TEXT,
+    count INTEGER,
+    event TEXT
+);
+CREATE INDEX IF NOT EXISTS events_epoch ON events (epoch);
+CREATE INDEX IF NOT EXISTS events_detector ON events (detector, epoch);
+"""
+
+def batches(rows, size=STORE_BATCH):
+    """Split an iterable of rows into lists of at most 'size' rows"""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+def missing(value, none=-1):
+    """None for the missing values of the columnar stores (-1 or NaN)"""
+    return None if value == none or value != value else value
+
+class AnalysisStore:
+    """
+    An analysis database. The times are UTC epochs; the timezone offset of
+    the logs is kept in the metadata to convert the local times of the
+    queries (see utc_epoch).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def clear(self):
+        """Remove the rows of a previous analysis"""
+        with self.db:
+            for table in ('metadata', 'operations', 'connections', 'events'):
+                self.db.execute('DELETE FROM %s' % table)
+
+    def set_metadata(self, key, value):
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)',
+                            (key, json.dumps(value)))
+
+    def get_metadata(self, key, default=None):
+        row = self.db.execute('SELECT value FROM metadata WHERE key = ?', (key,)).fetchone()
+        return default if row is None else json.loads(row['value'])
+
+    def utc_epoch(self, local_epoch, tz_offset=None):
+        """UTC epoch of a local time, in the timezone of the logs unless 'tz_offset' is given"""
+        if tz_offset is None:
+            tz_offset = self.get_metadata('tz_offset', 0)
+        return local_epoch - tz_offset
+
+    def add_operations(self, operations):
+        """
+        Insert the operations of an OperationStore, in batched transactions,
+        then set their client IP from the connections (see add_connections)
+        """
+        first = self.db.execute('SELECT COALESCE(MAX(rowid), 0) FROM operations').fetchone()[0]
+        columns = [operations.column(name).tolist()
+                   for name in ('epoch', 'end', 'conn', 'op', 'verb', 'err',
+                                'etime', 'wtime', 'optime')]
+        rows = ((missing(epoch), missing(end), missing(conn), missing(op), VERBS[verb] or None,
+                 missing(err), missing(etime), missing(wtime), missing(optime))
+                for epoch, end, conn, op, verb, err, etime, wtime, optime in zip(*columns))
+        with self.db:
+            for batch in batches(rows):
+                self.db.executemany(
+                    'INSERT INTO operations (epoch, end_time, conn, op, verb, err, etime, wtime, optime)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', batch)
+            # the connection of an operation is the last one of its number
+            # opened before it
+            self.db.execute(
+                'UPDATE operations SET client_ip = ('
+                ' SELECT c.client_ip FROM connections c WHERE c.conn = operations.conn'
+                ' AND (c.open_time IS NULL OR c.open_time <= operations.end_time)'
+                ' ORDER BY c.open_time DESC LIMIT 1)'
+                ' WHERE rowid > ?', (first,))
+
+    def add_connections(self, connections, incremental=False):
+        """
+        Insert the connections of a ConnectionStore. In an incremental
+        analysis the connections left open by the previous run are replaced,
+        as they are continued by this one.
+        """
+        columns = [connections.column(name).tolist()
+                   for name in ('conn', 'open', 'close', 'client', 'ops', 'etime', 'reason')]
+        clients = connections.clients
+        reasons = connections.reasons
+        rows = ((conn, missing(opened), missing(close),
+                 clients[client] if client >= 0 else None, ops, etime,
+                 reasons[reason] if reason >= 0 else None)
+                for conn, opened, close, client, ops, etime, reason in zip(*columns))
+        with self.db:
+            if incremental:
+                self.db.execute('DELETE FROM connections WHERE close_time IS NULL')
+            for batch in batches(rows):
+                self.db.executemany(
+                    'INSERT INTO connections (conn, open_time, close_time, client_ip, ops, etime, reason)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?)', batch)
+
+    def add_events(self, detector, events):
+        """Insert the events of a detector, each one also kept whole as JSON"""
+        rows = ((detector, event.get('epoch'), event.get('timematch'), event.get('severity'),
+                 event.get('count'), json.dumps(event))
+                for event in events)
+        with self.db:
+            for batch in batches(rows):
+                self.db.executemany(
+                    'INSERT INTO events (detector, epoch, timematch, severity, count, event)'
+                    ' VALUES (?, ?, ?, ?, ?, ?)', batch)
+
+    def _query(self, table, time_column, conditions, since, until, limit):
+        """Rows of a table matching the (column, operator, value) conditions, by time"""
+        clauses = []
+        parameters = []
+        if since is not None:
+            conditions.append((time_column, '>=', since))
+        if until is not None:
+            conditions.append((time_column, '<', until))
+        for column, operator, value in conditions:
+            if value is not None:
+                clauses.append('%s %s ?' % (column, operator))
+                parameters.append(value)
+        sql = 'SELECT * FROM %s' % table
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY %s LIMIT ?' % time_column
+        parameters.append(limit)
+        return [dict(row) for row in self.db.execute(sql, parameters)]
+
+    def operations(self, client_ip=None, verb=None, conn=None, min_etime=None,
+                   since=None, until=None, limit=QUERY_LIMIT):
+        """The operations matching all the given criteria, 'since' and 'until' bounding their epoch"""
+        return self._query('operations', 'epoch',
+                           [('client_ip', '=', client_ip), ('verb', '=', verb),
+                            ('conn', '=', conn), ('etime', '>=', min_etime)],
+                           since, until, limit)
+
+    def connections(self, client_ip=None, conn=None, since=None, until=None, limit=QUERY_LIMIT):
+        """The connections matching all the given criteria, 'since' and 'until' bounding their open time"""
+        return self._query('connections', 'open_time',
+                           [('client_ip', '=', client_ip), ('conn', '=', conn)],
+                           since, until, limit)
+
+    def events(self, detector=None, since=None, until=None, limit=QUERY_LIMIT):
+        """The detector events, 'since' and 'until' bounding their epoch"""
+        rows = self._query('events', 'epoch', [('detector', '=', detector)], since, until, limit)
+        for row in rows:
+            row['event'] = json.loads(row['event'])
+        return rows
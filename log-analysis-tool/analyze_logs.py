@@ -5,441 +5,2517 @@ This will search log files for specific terms and analyze the results.
 """
 
 import os
-import pdb
 import re
 import sys
+import time
 import argparse
+import base64
+import bz2
+import calendar
+import gzip
+import hashlib
+import heapq
+import lzma
 import json
-from datetime import datetime
-from collections import Counter, defaultdict
+import mmap
+import socket
+from array import array
+from datetime import datetime, timezone
+from collections import Counter, OrderedDict, defaultdict, deque
+from collections import namedtuple
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from operator import itemgetter
+import numpy as np
 from agent_helper import enhance_solutions, is_ai_enhancement_enabled
-    
+from operation_store import OperationStore, PERCENTILES
+from connection_store import ConnectionStore
+from parse_cache import ParseCache, CACHE_BUDGET, save_column, load_column
+from analysis_store import AnalysisStore, QUERY_LIMIT
+from interval_tree import IntervalTree
+from heavy_hitters import new_sketch, sketch_add, merge_sketches, sketch_top
+from hyperloglog import new_registers, registers_add, merge_registers, estimate_distinct
+from tdigest import (new_digest, digest_add, merge_digests, digest_count, digest_quantile,
+                     compress_digest)
+
+# Header of a 389-DS access log line:
+# [03/Oct/2023:00:43:21.123456789 +0200] conn=12 op=3 SRCH base="..." ...
+ACCESS_LINE_RE = re.compile(
+    r'^\[(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2})[^\]]*\]'
+    r'(?: conn=(\d+))?(?: op=(-?\d+))?(?: ([A-Z]+)\b)?')
+CONNECTION_FROM_RE = re.compile(r'connection from', re.IGNORECASE)
+KEYVAL_RE = re.compile(r'(\w+)=("[^"]*"|\S+)')
+# '*.log' files and the active or rotated 389-DS access logs, possibly compressed
+LOG_FILE_RE = re.compile(r'(\.log|^access(\.\d{8}-\d{6})?)(\.gz|\.bz2|\.xz)?$')
+ROTATION_RE = re.compile(r'\.(\d{8})-(\d{6})(?:\.|$)')
+COMPRESSED_OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+MONTHS = {'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+          'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12}
+
+# A tokenized access log line shared by all the detectors.
+# 'epoch' is the UTC second of 'timestamp', the one the detectors compare.
+# 'rest' is the remainder of the line after the verb.
+# 'time' is the UTC time of a RESULT line with its sub-second fraction.
+AccessRecord = namedtuple('AccessRecord', [
+    'timestamp', 'epoch', 'conn', 'op', 'verb', 'tag', 'err', 'nentries',
+    'etime', 'wtime', 'optime', 'notes', 'rest', 'time'])
+
+# Memoized epochs of the second prefixes ('03/Oct/2023:00:43:21') and of the
+# timezone suffixes ('+0200'): a log has many lines per second, so each
+# distinct second is only decoded once
+LOCAL_EPOCHS = {}
+TZ_OFFSETS = {'': 0}
+LOCAL_EPOCHS_MAX = 100000
+
+def local_epoch(timestamp):
+    """
+    Seconds since the epoch of an access log timestamp like
+    '03/Oct/2023:00:43:21', ignoring its timezone (memoized), or None
+    """
+    try:
+        return LOCAL_EPOCHS[timestamp]
+    except KeyError:
+        pass
+    day, month, remainder = timestamp.split('/')
+    year, hour, minute, second = remainder.split(':')
+    if month not in MONTHS:
+        return None
+    epoch = calendar.timegm((int(year), MONTHS[month], int(day),
+                             int(hour), int(minute), int(second)))
+    if len(LOCAL_EPOCHS) >= LOCAL_EPOCHS_MAX:
+        LOCAL_EPOCHS.clear()
+    LOCAL_EPOCHS[timestamp] = epoch
+    return epoch
+
+def timezone_offset(tz):
+    """Offset in seconds of a timezone suffix like '+0200' (memoized)"""
+    try:
+        return TZ_OFFSETS[tz]
+    except KeyError:
+        pass
+    try:
+        offset = int(tz[1:3]) * 3600 + int(tz[3:5]) * 60
+    except ValueError:
+        offset = 0
+    if tz[:1] == '-':
+        offset = -offset
+    TZ_OFFSETS[tz] = offset
+    return offset
+
+def timestamp_epoch(timestamp, tz=''):
+    """UTC seconds since the epoch of a timestamp and its timezone suffix"""
+    epoch = local_epoch(timestamp)
+    if epoch is None:
+        return None
+    return epoch - timezone_offset(tz)
+
+def line_time(line, epoch):
+    """The time of a line with its sub-second fraction, if any"""
+    if line[21:22] == '.' and epoch is not None:
+        try:
+            return epoch + float(line[21:line.find(' ', 21)].rstrip(']'))
+        except ValueError:
+            pass
+    return epoch
+
+def tokenize_access_line(line):
+    """
+    Split an access log line, once, into an AccessRecord.
+    Only RESULT and ABANDON lines have their key=value pairs parsed
+    (tag, err, nentries, etime, wtime, optime, notes), and only RESULT,
+    CONNECT and CLOSE lines their sub-second time; other fields are left
+    to None.
+    """
+    header = ACCESS_LINE_RE.match(line)
+    if header is None:
+        verb = 'CONNECT' if CONNECTION_FROM_RE.search(line) else None
+        return AccessRecord(None, None, None, None, verb, None, None, None,
+                            None, None, None, None, line, None)
+
+    timestamp, conn, op, verb = header.groups()
+    # the sub-second fraction, if any, is followed by the timezone:
+    # '[03/Oct/2023:00:43:21.123456789 +0200]'
+    if line[31:32] == ' ':
+        tz = line[32:37]
+    else:
+        tz = line[21:line.find(']', 21)].partition(' ')[2]
+    try:
+        epoch = LOCAL_EPOCHS[timestamp] - TZ_OFFSETS[tz]
+    except KeyError:
+        epoch = timestamp_epoch(timestamp, tz)
+    rest = line[header.end():].strip()
+    if conn is not None:
+        conn = int(conn)
+    if op is not None:
+        op = int(op)
+    tag = err = nentries = etime = wtime = optime = notes = time = None
+    if verb == 'RESULT':
+        time = line_time(line, epoch)
+    if verb == 'RESULT' or verb == 'ABANDON':
+        fields = dict(KEYVAL_RE.findall(rest))
+        tag = fields.get('tag')
+        notes = fields.get('notes')
+        try:
+            if 'err' in fields:
+                err = int(fields['err'])
+            if 'nentries' in fields:
+                nentries = int(fields['nentries'])
+        except ValueError:
+            pass
+        try:
+            if 'etime' in fields:
+                etime = float(fields['etime'])
+            if 'wtime' in fields:
+                wtime = float(fields['wtime'])
+            if 'optime' in fields:
+                optime = float(fields['optime'])
+        except ValueError:
+            pass
+    elif verb is None:
+        if CONNECTION_FROM_RE.search(rest):
+            verb = 'CONNECT'
+            time = line_time(line, epoch)
+        elif ' closed' in rest:
+            verb = 'CLOSE'
+            time = line_time(line, epoch)
+    return AccessRecord(timestamp, epoch, conn, op, verb, tag, err, nentries,
+                        etime, wtime, optime, notes, rest, time)
+
+def compressed_opener(file_path):
+    """Return the function opening a compressed log file, or None"""
+    return COMPRESSED_OPENERS.get(os.path.splitext(file_path)[1])
+
+def is_log_file(file_name):
+    """
+    Tell if a file name is a log file: any '*.log' or a 389-DS access log
+    either active ('access') or rotated ('access.20231003-004321'), each of
+    them possibly compressed (.gz, .bz2, .xz)
+    """
+    return LOG_FILE_RE.search(file_name) is not None
+
 def find_log_files(directory, max_files=100):
     """Find all log files in a directory"""
     log_files = []
     for root, _, files in os.walk(directory):
         for file in files:
-            if file.endswith('.log'):
+            if is_log_file(file):
                 log_files.append(os.path.join(root, file))
             if len(log_files) >= max_files:
                 break
     return log_files
 
-def check_abandon_high_etime(line, diag, results):
+def rotation_timestamp(file_path):
+    """
+    Return the rotation timestamp of a rotated log file name
+    ('access.20231003-004321.gz'), in seconds since the epoch of the local
+    time (as local_epoch), or None
+    """
+    rotation = ROTATION_RE.search(os.path.basename(file_path))
+    if rotation is None:
+        return None
+    date, hour = rotation.groups()
+    return calendar.timegm((int(date[:4]), int(date[4:6]), int(date[6:8]),
+                            int(hour[:2]), int(hour[2:4]), int(hour[4:6])))
+
+def first_timestamp(file_path):
+    """Return the timestamp of the first line of a log file, or None"""
+    try:
+        opener = compressed_opener(file_path) or open
+        with opener(file_path, 'rb') as f:
+            line = f.readline().decode('utf-8', errors='replace')
+            return tokenize_access_line(line).timestamp
+    except (OSError, EOFError, ValueError):
+        return None
+
+def order_log_files(files):
+    """
+    Order the log files chronologically, so that the detectors see the
+    events in order: a rotated file by the rotation timestamp of its name,
+    an active one by the timestamp of its first line. Files without any
+    recognized timestamp are kept, in their original order, at the end.
+    """
+    keyed = []
+    for index, file_path in enumerate(files):
+        key = rotation_timestamp(file_path)
+        if key is None:
+            timestamp = first_timestamp(file_path)
+            if timestamp is not None:
+                key = local_epoch(timestamp)
+        if key is None:
+            keyed.append(((1, 0), index, file_path))
+        else:
+            keyed.append(((0, key), index, file_path))
+    return [file_path for _, _, file_path in sorted(keyed)]
+
+# A detector counts the records matching its 'predicate' in a 'window':
+#  - 'second': the records of a same second,
+#  - 'lines': a run of consecutive matching records,
+#  - 'sliding': the records of the last 'seconds' seconds.
+# An event is registered in results[name][events] when a window closes
+# with a count reaching 'threshold' ('sliding': once the count falls back
+# below it, with the highest count). Its severity is the first one of
+# 'severities' ((severity, count) pairs, by decreasing count) reached,
+# 'normal' otherwise. 'label' tells what is counted. The event also has the
+# most frequent keys (see record_keys) of the records of its window.
+Detector = namedtuple('Detector', [
+    'name', 'events', 'predicate', 'window', 'seconds', 'threshold', 'severities', 'label'])
+
+# etime of an abandoned operation that was running for long time
+ABANDON_HIGH_ETIME = 20
+# Number of consecutive incoming connections revealing an unresponsive server
+UNRESPONSIVE_THRESHOLD = 10
+# Seconds over which the failed binds are counted
+FAILED_BINDS_SECONDS = 60
+
+def is_connection(record):
+    """A new incoming connection, logged by the accept thread"""
+    return record.verb == 'CONNECT'
+
+def is_abandon_too_late(record):
+    """An ABANDON of an operation that was already processed"""
+    return record.verb == 'ABANDON' and record.rest.startswith('targetop=NOTFOUND')
+
+def is_abandon_high_etime(record):
+    """An ABANDON of an operation that was running for long time"""
+    return (record.verb == 'ABANDON' and record.etime is not None and
+            record.etime >= ABANDON_HIGH_ETIME and
+            record.rest.startswith('targetop=') and
+            not record.rest.startswith('targetop=NOTFOUND'))
+
+def is_failed_bind(record):
+    """The result of a BIND rejected for invalid credentials"""
+    return record.verb == 'RESULT' and record.tag == '97' and record.err == 49
+
+# Detectors fed, in this order, with every tokenized record
+DETECTORS = [
+    # All workers are busy, unable to read operations and send results:
+    # only the new incoming connections are logged, by the accept thread
+    Detector('server_unresponsive', 'event_unresponsive', is_connection, 'lines', None,
+             UNRESPONSIVE_THRESHOLD, (('fatal', 150), ('critical', 75), ('warning', 10)),
+             'consecutive incoming connections'),
+    Detector('abandon_too_late', 'event_abandon_too_late', is_abandon_too_late, 'second', None,
+             10, (('fatal', 100), ('critical', 50), ('warning', 20)),
+             'abandons of operations already processed'),
+    Detector('abandon_high_etime', 'event_abandon_high_etime', is_abandon_high_etime, 'second', None,
+             5, (('fatal', 50), ('critical', 30), ('warning', 15)),
+             'abandons of long running operations'),
+    # Password guessing, or a client retrying with an expired password:
+    # the failed binds are spread over time, a per second count misses them
+    Detector('failed_binds', 'event_failed_binds', is_failed_bind, 'sliding', FAILED_BINDS_SECONDS,
+             50, (('fatal', 1000), ('critical', 300), ('warning', 50)),
+             'failed binds (invalid credentials)'),
+]
+
+def new_detector_state(detector):
+    """
+    Initial state of a detector: the count of its window, the time of the
+    event it would register ('timematch', 'epoch') and the sketches of the
+    keys of its window ('hitters')
+    """
+    state = {'count': 0, 'timematch': "", 'epoch': None, 'hitters': {}}
+    if detector.window == 'sliding':
+        # ring buffer of the counts of the last seconds, ending at 'second'
+        state.update(counts=[0] * detector.seconds, second=None, maxcount=0)
+    return state
+
+def register_event(detector, state, events, count):
+    """Register the event of a detector window reaching its threshold"""
+    severity = 'normal'
+    for name, threshold in detector.severities:
+        if count >= threshold:
+            severity = name
+            break
+    event = {"count": count,
+             "timematch": state["timematch"],
+             "epoch": state["epoch"],
+             "severity": severity}
+    if state['hitters']:
+        event['top'] = {dimension: sketch_top(sketch, WINDOW_HITTERS_TOP)
+                        for dimension, sketch in state['hitters'].items()}
+    events.append(event)
+
+def update_second_window(detector, record, state, events, keys):
+    """Count the matching records of each second"""
+    epoch = record.epoch
+    if epoch is None:
+        return
+    if epoch != state['epoch']:
+        # the record is in another second, close the previous one
+        if state['count'] >= detector.threshold:
+            register_event(detector, state, events, state['count'])
+        state['count'] = 0
+        state['timematch'] = record.timestamp
+        state['epoch'] = epoch
+        state['hitters'] = {}
+    if detector.predicate(record):
+        state['count'] += 1
+    if keys:
+        count_window_keys(state, keys)
+
+def update_lines_window(detector, record, state, events, keys):
+    """Count the consecutive matching records"""
+    if detector.predicate(record):
+        state['count'] += 1
+        if state['count'] == detector.threshold and record.timestamp:
+            state['timematch'] = record.timestamp
+            state['epoch'] = record.epoch
+        if keys:
+            count_window_keys(state, keys)
+    elif state['count']:
+        # end of the run of matching records
+        if state['count'] >= detector.threshold:
+            register_event(detector, state, events, state['count'])
+        state['count'] = 0
+        state['timematch'] = ""
+        state['epoch'] = None
+        state['hitters'] = {}
+
+def update_sliding_window(detector, record, state, events, keys):
+    """
+    Count the matching records of the last 'seconds' seconds in a ring
+    buffer of per-second counts: each second is cleared once when the
+    window slides over it, so an update is O(1) amortized. The keys are
+    counted from the start of the episode over the threshold.
+    """
+    epoch = record.epoch
+    if epoch is None:
+        return
+    counts = state['counts']
+    seconds = detector.seconds
+    last = state['second']
+    if epoch != last:
+        if last is None or epoch < last or epoch - last >= seconds:
+            counts[:] = [0] * seconds
+            state['count'] = 0
+        else:
+            for second in range(last + 1, epoch + 1):
+                state['count'] -= counts[second % seconds]
+                counts[second % seconds] = 0
+        state['second'] = epoch
+        if state['epoch'] is not None and state['count'] < detector.threshold:
+            # the count fell below the threshold, register the episode
+            register_event(detector, state, events, state['maxcount'])
+            state['timematch'] = ""
+            state['epoch'] = None
+            state['maxcount'] = 0
+            state['hitters'] = {}
+    if detector.predicate(record):
+        counts[epoch % seconds] += 1
+        state['count'] += 1
+        if state['count'] >= detector.threshold:
+            if state['epoch'] is None:
+                state['timematch'] = record.timestamp
+                state['epoch'] = epoch
+            state['maxcount'] = max(state['maxcount'], state['count'])
+    if keys and state['epoch'] is not None:
+        count_window_keys(state, keys)
+
+WINDOWS = {
+    'second': update_second_window,
+    'lines': update_lines_window,
+    'sliding': update_sliding_window,
+}
+
+# Whether the state of a detector, after 'record', no longer depends on the
+# state it had before the first record of a range (at 'first' epoch): from
+# there, runs of the detector started from any state are identical
+def second_window_settled(detector, state, record, first):
+    """Another second started: its window only holds records of the range"""
+    return first is not None and state['epoch'] is not None and state['epoch'] != first
+
+def lines_window_settled(detector, state, record, first):
+    """The run of matching records going on when the range started ended"""
+    return not detector.predicate(record)
+
+def sliding_window_settled(detector, state, record, first):
+    """
+    The window slid past the first second of the range, out of an episode
+    (a fresh run is in an episode whenever a run from another state is)
+    """
+    return (first is not None and state['second'] is not None and
+            state['second'] - first >= detector.seconds and state['epoch'] is None)
+
+SETTLED = {
+    'second': second_window_settled,
+    'lines': lines_window_settled,
+    'sliding': sliding_window_settled,
+}
+
+def unsettled_detectors(detectors, diag, record, first):
+    """The 'detectors' not settled after 'record' (see SETTLED)"""
+    return [detector for detector in detectors
+            if not SETTLED[detector.window](detector, diag[detector.name], record, first)]
+
+def init_detectors(diag, results, detectors=DETECTORS):
+    """
+    Set up the state and the event list of the detectors missing from
+    'diag' and 'results', when an analysis starts or continues a checkpoint
+    (written before a detector was declared), for detect()
+    """
+    for detector in detectors:
+        if detector.name not in diag:
+            diag[detector.name] = new_detector_state(detector)
+        results.setdefault(detector.name, {}).setdefault(detector.events, [])
+    return diag, results
+
+def is_fresh(diag):
+    """Whether the detectors are in their initial state, nothing before them changing what they detect"""
+    return detector_state(diag) == detector_state(init_detectors({}, {})[0])
+
+def detect(record, diag, results, detectors=DETECTORS):
+    """
+    Run all the declared detectors, or the given ones, on a tokenized
+    record (see init_detectors). Return the keys of the record (see
+    record_keys).
+    """
+    keys = record_keys(record)
+    for detector in detectors:
+        WINDOWS[detector.window](detector, record, diag[detector.name],
+                                 results[detector.name][detector.events], keys)
+    return keys
+
+# A completed LDAP operation: the request line joined to its RESULT line.
+# 'timestamp' and 'epoch' are the ones of the request; the request fields
+# (verb, base, scope, filter) are None when the request was not seen, the
+# result fields (tag, err, nentries, etime, wtime, optime, notes, end) when
+# the result was not seen. 'end' is the UTC time of the RESULT line.
+OperationRecord = namedtuple('OperationRecord', [
+    'timestamp', 'epoch', 'conn', 'op', 'verb', 'base', 'scope', 'filter',
+    'tag', 'err', 'nentries', 'etime', 'wtime', 'optime', 'notes', 'end'])
+
+# Maximum number of requests waiting for their RESULT in the correlator
+MAX_IN_FLIGHT = 100000
+# Requests answered by a RESULT line (UNBIND and ABANDON are not, and the
+# SORT, VLV, ENTRY... lines of an operation are not requests)
+REQUEST_VERBS = {'SRCH', 'ADD', 'MOD', 'DEL', 'MODRDN', 'CMP', 'BIND', 'EXT'}
+
+def request_operation(record):
+    """OperationRecord of a request line, waiting for its result"""
+    fields = dict(KEYVAL_RE.findall(record.rest))
+    base = fields.get('base', fields.get('dn'))
+    if base is not None:
+        base = base.strip('"')
+    scope = fields.get('scope')
+    if scope is not None and scope.isdigit():
+        scope = int(scope)
+    search_filter = fields.get('filter')
+    if search_filter is not None:
+        search_filter = search_filter.strip('"')
+    return OperationRecord(record.timestamp, record.epoch, record.conn, record.op,
+                           record.verb, base, scope, search_filter,
+                           None, None, None, None, None, None, None, None)
+
+def complete_operation(request, result):
+    """Fill the result fields of a request from its RESULT record"""
+    return request._replace(tag=result.tag, err=result.err, nentries=result.nentries,
+                            etime=result.etime, wtime=result.wtime,
+                            optime=result.optime, notes=result.notes, end=result.time)
+
+def iter_operations(records, in_flight=None, max_in_flight=MAX_IN_FLIGHT, flush=True):
+    """
+    Join the request lines to their RESULT line by (conn, op) and yield an
+    OperationRecord for each completed operation.
+    'in_flight' is the table of the requests waiting for their result; it
+    is bounded to 'max_in_flight' requests, the oldest one being yielded
+    without result when it overflows. The requests still in flight at the
+    end of 'records' are yielded too, unless 'flush' is False: they are
+    then left in 'in_flight' for the records that follow.
+    """
+    if in_flight is None:
+        in_flight = OrderedDict()
+    for record in records:
+        verb = record.verb
+        if verb == 'RESULT':
+            operation = in_flight.pop((record.conn, record.op), None)
+            if operation is None:
+                # the request is before the analyzed lines
+                operation = OperationRecord(record.timestamp, record.epoch,
+                                            record.conn, record.op,
+                                            None, None, None, None,
+                                            None, None, None, None, None, None, None, None)
+            yield complete_operation(operation, record)
+        elif verb in REQUEST_VERBS:
+            in_flight[(record.conn, record.op)] = request_operation(record)
+            if len(in_flight) > max_in_flight:
+                yield in_flight.popitem(last=False)[1]
+    if flush:
+        while in_flight:
+            yield in_flight.popitem(last=False)[1]
+
+# A simple filter item: '(uid=user1)', '(cn~=x)', '(description=*foo*)'
+FILTER_ITEM_RE = re.compile(r'\(([^()&|!=~<>]+)(~=|>=|<=|=)([^()]*)\)')
+# RESULT notes of the searches that did not fully use the indexes:
+# A (fully unindexed), U (partially unindexed) and P (paged search)
+UNINDEXED_NOTES = {'A', 'U', 'P'}
+# Number of filter fingerprints reported for each ranking
+UNINDEXED_TOP = 10
+# Assertion value of a filter item, but its wildcards
+ASSERTION_VALUE_RE = re.compile(r'[^*]+')
+# Memoized fingerprints of the last distinct filters: the same filters are
+# sent over and over by the clients
+FILTER_FINGERPRINTS = {}
+FILTER_FINGERPRINTS_MAX = 100000
+
+def normalize_filter_item(item):
+    """Fingerprint of a FILTER_ITEM_RE match"""
+    attribute, operator, value = item.groups()
+    return '(%s%s%s)' % (attribute.strip().lower(), operator, ASSERTION_VALUE_RE.sub('?', value))
+
+def filter_fingerprint(search_filter):
+    """
+    Normalize a search filter into a fingerprint shared by the searches that
+    only differ by their assertion values: '(&(uid=user1)(cn=*ab*))' gives
+    '(&(uid=?)(cn=*?*))'. Attribute names are lowercased, presence and
+    substring wildcards are kept.
+    """
+    fingerprint = FILTER_FINGERPRINTS.get(search_filter)
+    if fingerprint is None:
+        if len(FILTER_FINGERPRINTS) >= FILTER_FINGERPRINTS_MAX:
+            FILTER_FINGERPRINTS.clear()
+        fingerprint = FILTER_FINGERPRINTS[search_filter] = FILTER_ITEM_RE.sub(
+            normalize_filter_item, search_filter)
+    return fingerprint
+
+def analyze_unindexed_search(operation, stats):
+    """
+    Aggregate, per filter fingerprint, the searches whose RESULT has the
+    A, U or P notes: their count, total etime and total returned entries
+    """
+    notes = operation.notes
+    if notes is None or operation.tag != '101':
+        return
+    notes = set(notes.split(',')) & UNINDEXED_NOTES
+    if not notes:
+        return
+    if operation.filter is None:
+        # the request is before the analyzed lines
+        fingerprint = '?'
+    else:
+        fingerprint = filter_fingerprint(operation.filter)
+    searches = stats.setdefault('unindexed_searches', {})
+    search = searches.get(fingerprint)
+    if search is None:
+        search = searches[fingerprint] = {
+            'count': 0, 'etime': 0.0, 'nentries': 0, 'notes': [],
+            'filter': operation.filter, 'base': operation.base}
+    search['count'] += 1
+    search['etime'] += operation.etime or 0.0
+    search['nentries'] += operation.nentries or 0
+    if not notes.issubset(search['notes']):
+        search['notes'] = sorted(notes.union(search['notes']))
+
+def merge_unindexed_searches(stats, other):
+    """Merge the unindexed searches aggregated over another range"""
+    searches = stats.setdefault('unindexed_searches', {})
+    for fingerprint, search in other.get('unindexed_searches', {}).items():
+        if fingerprint not in searches:
+            searches[fingerprint] = dict(search)
+            continue
+        merged = searches[fingerprint]
+        merged['count'] += search['count']
+        merged['etime'] += search['etime']
+        merged['nentries'] += search['nentries']
+        merged['notes'] = sorted(set(merged['notes']) | set(search['notes']))
+
+def report_unindexed_searches(stats, top=UNINDEXED_TOP):
+    """Rank the filter fingerprints of the unindexed searches"""
+    searches = [dict(search, fingerprint=fingerprint, etime=round(search['etime'], 6))
+                for fingerprint, search in stats.get('unindexed_searches', {}).items()]
+    return {
+        'searches': sum(search['count'] for search in searches),
+        'top_by_count': sorted(searches, key=lambda s: s['count'], reverse=True)[:top],
+        'top_by_etime': sorted(searches, key=lambda s: s['etime'], reverse=True)[:top],
+        'top_by_nentries': sorted(searches, key=lambda s: s['nentries'], reverse=True)[:top],
+    }
+
+# Latencies of the operations summarized by t-digests
+LATENCY_METRICS = ('etime', 'wtime', 'optime')
+
+def analyze_latency(operation, stats):
+    """
+    Add the latencies of an operation to the t-digests of its minute and
+    verb: stats['latency_digests'][minute][verb][metric], the minute (epoch)
+    being a string and the verb '' when unknown, as in the JSON checkpoints
+    """
+    if operation.epoch is None:
+        return
+    digests = stats.setdefault('latency_digests', {})
+    minute = str(operation.epoch // 60 * 60)
+    verbs = digests.get(minute)
+    if verbs is None:
+        verbs = digests[minute] = {}
+    verb = operation.verb or ''
+    metrics = verbs.get(verb)
+    if metrics is None:
+        metrics = verbs[verb] = {}
+    for metric, value in zip(LATENCY_METRICS, (operation.etime, operation.wtime, operation.optime)):
+        if value is not None:
+            digest = metrics.get(metric)
+            if digest is None:
+                digest = metrics[metric] = new_digest()
+            digest_add(digest, value)
+
+def merge_latency_digests(stats, other):
+    """Merge the t-digests of the latencies of another range"""
+    digests = stats.setdefault('latency_digests', {})
+    for minute, verbs in other.get('latency_digests', {}).items():
+        if minute not in digests:
+            digests[minute] = verbs
+            continue
+        for verb, metrics in verbs.items():
+            if verb not in digests[minute]:
+                digests[minute][verb] = metrics
+                continue
+            merged = digests[minute][verb]
+            for metric, digest in metrics.items():
+                if metric in merged:
+                    merge_digests(merged[metric], digest)
+                else:
+                    merged[metric] = digest
+
+def compress_latency_digests(stats):
+    """Merge the values buffered by the latency digests, before saving them"""
+    for verbs in stats.get('latency_digests', {}).values():
+        for metrics in verbs.values():
+            for digest in metrics.values():
+                compress_digest(digest)
+
+# Minutes of latency digests an --incremental run carries over to the next
+# one: the last minute is completed by the next lines, and an operation
+# completed there may have been requested in the minute before
+LATENCY_CARRIED_MINUTES = 2
+
+def recent_latency_digests(stats, minutes=LATENCY_CARRIED_MINUTES):
+    """
+    The latency digests that the operations of the next incremental run
+    may still complete: the ones of the last 'minutes' minutes
+    """
+    digests = stats.get('latency_digests', {})
+    if not digests:
+        return {}
+    last = max(map(int, digests))
+    return {minute: verbs for minute, verbs in digests.items()
+            if int(minute) > last - minutes * 60}
+
+def report_latency_digests(stats, percentiles=PERCENTILES):
+    """
+    Percentiles of the latencies of the operations of each verb, per minute,
+    estimated from their t-digests: a list of {'minute', 'verb', 'count',
+    'etime': {'p50', ...}, 'wtime': ..., 'optime': ...} sorted by minute
+    """
+    rows = []
+    digests = stats.get('latency_digests', {})
+    for minute in sorted(digests, key=int):
+        for verb, metrics in sorted(digests[minute].items()):
+            row = {'minute': int(minute), 'verb': verb or None,
+                   'count': max(digest_count(digest) for digest in metrics.values())}
+            for metric in LATENCY_METRICS:
+                if metric in metrics:
+                    row[metric] = {'p%d' % percentile: digest_quantile(metrics[metric], percentile / 100.0)
+                                   for percentile in percentiles}
+            rows.append(row)
+    return rows
+
+def report_latency(operations, stats):
+    """
+    The 'latency' section of the results: the number of operations, their
+    exact percentiles ('etime_by_verb_minute', 'wtime_by_second') when the
+    operation store keeps them, and the ones estimated from the t-digests
+    """
+    latency = {'operations': len(operations)}
+    if operations.keep:
+        latency['etime_by_verb_minute'] = operations.etime_by_verb_minute()
+        latency['wtime_by_second'] = operations.wtime_by_second()
+    latency['digests_by_verb_minute'] = report_latency_digests(stats)
+    return latency
+
+# Updates blocking the other operations (backend lock, plugins...) when
+# they are long: the ones lasting at least LONG_UPDATE_ETIME seconds are
+# correlated with the events
+WRITE_VERBS = {'ADD', 'DEL', 'MODRDN', 'MOD'}
+LONG_UPDATE_ETIME = 1.0
+# Seconds before an event in which the long updates that ended are reported
+LONG_UPDATE_LOOKBEHIND = 30
+# Number of long updates attached to an event, the longest ones
+LONG_UPDATES_TOP = 5
+
+def analyze_long_update(operation, stats):
+    """
+    Record the long updates as [start, end, conn, op, verb, dn, etime] in
+    stats['long_updates'], the start being the RESULT time minus the etime
+    """
+    if (operation.verb in WRITE_VERBS and operation.end is not None and
+            operation.etime is not None and operation.etime >= LONG_UPDATE_ETIME):
+        stats.setdefault('long_updates', []).append(
+            [operation.end - operation.etime, operation.end, operation.conn, operation.op,
+             operation.verb, operation.base, operation.etime])
+
+def merge_long_updates(stats, other):
+    """Merge the long updates of another range"""
+    stats.setdefault('long_updates', []).extend(other.get('long_updates', []))
+
+def recent_long_updates(stats, lookbehind=LONG_UPDATE_LOOKBEHIND):
+    """
+    The long updates that may still precede the events of the next
+    incremental run: the ones ending in the last 'lookbehind' seconds
+    """
+    updates = stats.get('long_updates', [])
+    if not updates:
+        return []
+    last = max(update[1] for update in updates)
+    return [update for update in updates if update[1] >= last - lookbehind]
+
+def attach_long_updates(results, stats, lookbehind=LONG_UPDATE_LOOKBEHIND, top=LONG_UPDATES_TOP):
+    """
+    Attach to each event of the detectors the long updates running during
+    its second or ended in the 'lookbehind' seconds before: the 'top'
+    longest ones, as event['updates']. The updates are indexed in an
+    interval tree of their [start, end].
+    """
+    tree = IntervalTree((update[0], update[1], update) for update in stats.get('long_updates', []))
+    if not len(tree):
+        return
+    for detector in DETECTORS:
+        for event in results.get(detector.name, {}).get(detector.events, []):
+            if event['epoch'] is None:
+                continue
+            updates = sorted((update for _, _, update in
+                              tree.overlap(event['epoch'] - lookbehind, event['epoch'] + 1)),
+                             key=lambda update: (-update[6], update[0]))[:top]
+            if updates:
+                event['updates'] = [{
+                    'conn': conn, 'op': op, 'verb': verb, 'dn': dn,
+                    'start': round(start, 6), 'end': round(end, 6), 'etime': etime,
+                    'overlapping': end >= event['epoch'],
+                } for start, end, conn, op, verb, dn, etime in updates]
+
+# Analyzers fed with every correlated operation, updating a dict of
+# statistics, and the functions merging the statistics of two ranges
+OPERATION_ANALYZERS = [
+    (analyze_unindexed_search, merge_unindexed_searches),
+    (analyze_latency, merge_latency_digests),
+    (analyze_long_update, merge_long_updates),
+]
+
+def analyze_operations(operations, stats):
+    """Yield the operations once accounted by all the operation analyzers"""
+    for operation in operations:
+        for analyze, _ in OPERATION_ANALYZERS:
+            analyze(operation, stats)
+        yield operation
+
+def merge_operation_stats(stats, other, continuation=True):
+    """
+    Merge into 'stats' the operation statistics, and the statistics of the
+    records (see count_record), of another range: the following one of the
+    same logs, unless not a 'continuation' (another server)
+    """
+    for _, merge in OPERATION_ANALYZERS:
+        merge(stats, other)
+    merge_heavy_hitters(stats, other)
+    merge_distinct_values(stats, other)
+    merge_connections(stats, other, continuation)
+
+# Keys of the records whose most frequent values are tracked
+CLIENT_IP_RE = re.compile(r'connection from (\S+)')
+BIND_DN_RE = re.compile(r'\bdn="([^"]*)"')
+BASE_RE = re.compile(r'\bbase="([^"]*)"')
+FILTER_RE = re.compile(r'\bfilter="([^"]*)"')
+# Number of keys tracked, and reported, in each detector window
+WINDOW_HITTERS_CAPACITY = 20
+WINDOW_HITTERS_TOP = 5
+# Number of keys reported over the whole analysis
+HITTERS_TOP = 20
+
+def record_keys(record):
+    """
+    The (dimension, key) pairs of a record: the client IP of a new
+    connection, the bind DN of a BIND, the base and the filter fingerprint
+    of a SRCH. DNs are lowercased.
+    """
+    verb = record.verb
+    if verb == 'CONNECT':
+        match = CLIENT_IP_RE.search(record.rest)
+        if match:
+            return (('client_ip', match.group(1)),)
+    elif verb == 'BIND':
+        match = BIND_DN_RE.search(record.rest)
+        if match:
+            return (('bind_dn', match.group(1).lower()),)
+    elif verb == 'SRCH':
+        keys = []
+        match = BASE_RE.search(record.rest)
+        if match:
+            keys.append(('base', match.group(1).lower()))
+        match = FILTER_RE.search(record.rest)
+        if match:
+            keys.append(('filter', filter_fingerprint(match.group(1))))
+        return keys
+    return ()
+
+def count_window_keys(state, keys):
+    """Count the keys of a record in the sketches of a detector window"""
+    hitters = state['hitters']
+    for dimension, key in keys:
+        sketch = hitters.get(dimension)
+        if sketch is None:
+            sketch = hitters[dimension] = new_sketch(WINDOW_HITTERS_CAPACITY)
+        sketch_add(sketch, key)
+
+def count_heavy_hitters(keys, stats):
+    """
+    Count the keys of a record (see record_keys) in the sketches of
+    stats['heavy_hitters'], one per dimension: their memory is bounded
+    however many distinct keys the logs have
+    """
+    hitters = stats.setdefault('heavy_hitters', {})
+    for dimension, key in keys:
+        sketch = hitters.get(dimension)
+        if sketch is None:
+            sketch = hitters[dimension] = new_sketch()
+        sketch_add(sketch, key)
+
+def merge_heavy_hitters(stats, other):
+    """Merge the heavy hitters counted over another range"""
+    hitters = stats.setdefault('heavy_hitters', {})
+    for dimension, sketch in other.get('heavy_hitters', {}).items():
+        if dimension in hitters:
+            merge_sketches(hitters[dimension], sketch)
+        else:
+            hitters[dimension] = sketch
+
+def report_heavy_hitters(stats, top=HITTERS_TOP):
+    """The most frequent keys of each dimension"""
+    return {dimension: sketch_top(sketch, top)
+            for dimension, sketch in sorted(stats.get('heavy_hitters', {}).items())}
+
+# Values whose distinct count per minute is estimated: the connections of
+# the records and some of their keys (see record_keys)
+DISTINCT_DIMENSIONS = ('client_ip', 'conn', 'bind_dn', 'base')
+
+def count_distinct_values(record, keys, stats):
+    """
+    Add the connection and the keys of a record to the HyperLogLog
+    registers of its minute: stats['distinct_values'][minute][dimension].
+    The lines of a connection often follow each other: a connection is not
+    hashed again when it is the one of the previous record.
+    """
+    epoch = record.epoch
+    if epoch is None:
+        return
+    minute = epoch - epoch % 60
+    try:
+        minutes = stats['distinct_values']
+        last = stats['distinct_last']
+    except KeyError:
+        minutes = stats.setdefault('distinct_values', {})
+        last = stats.setdefault('distinct_last', [None, None])
+    registers = minutes.get(minute)
+    if registers is None:
+        registers = minutes[minute] = {}
+    conn = record.conn
+    if conn is not None and (conn != last[1] or minute != last[0]):
+        last[0] = minute
+        last[1] = conn
+        conns = registers.get('conn')
+        if conns is None:
+            conns = registers['conn'] = new_registers()
+        registers_add(conns, conn)
+    for dimension, key in keys:
+        if dimension in DISTINCT_DIMENSIONS:
+            values = registers.get(dimension)
+            if values is None:
+                values = registers[dimension] = new_registers()
+            registers_add(values, key)
+
+def merge_distinct_values(stats, other):
+    """Merge the HyperLogLog registers of another range"""
+    minutes = stats.setdefault('distinct_values', {})
+    for minute, registers in other.get('distinct_values', {}).items():
+        if minute not in minutes:
+            minutes[minute] = registers
+            continue
+        for dimension, values in registers.items():
+            if dimension in minutes[minute]:
+                merge_registers(minutes[minute][dimension], values)
+            else:
+                minutes[minute][dimension] = values
+
+def report_distinct_values(stats):
+    """
+    Time series of the estimated distinct counts: a list of {'minute',
+    'client_ip', 'conn', 'bind_dn', 'base'} sorted by minute (epoch)
+    """
+    rows = []
+    for minute, registers in sorted(stats.get('distinct_values', {}).items()):
+        row = {'minute': minute}
+        for dimension in DISTINCT_DIMENSIONS:
+            row[dimension] = estimate_distinct(registers[dimension]) if dimension in registers else 0
+        rows.append(row)
+    return rows
+
+# Reason of the close of a connection: 'conn=1 op=5 fd=64 closed - U1'
+CLOSE_REASON_RE = re.compile(r' - (\S+)$')
+# Number of clients reported with their connections
+CONNECTION_CLIENTS_TOP = 20
+# Clients opening at least this many connections with at most this many
+# operations on each (a BIND and one operation) open a connection per
+# operation
+CHURN_MIN_CONNECTIONS = 100
+CHURN_OPS_PER_CONNECTION = 2
+
+def track_connection(record, keys, stats):
+    """
+    Account a CONNECT, RESULT or CLOSE record in the lifecycle of its
+    connection, in the ConnectionStore of stats['connections']
+    """
+    if record.conn is None:
+        return
+    connections = stats.get('connections')
+    if connections is None:
+        connections = stats['connections'] = ConnectionStore()
+    verb = record.verb
+    if verb == 'RESULT':
+        connections.operation(record.conn, record.etime)
+    elif verb == 'CONNECT':
+        connections.connect(record.conn, record.time, keys[0][1] if keys else None)
+    else:
+        match = CLOSE_REASON_RE.search(record.rest.rstrip())
+        connections.close(record.conn, record.time, match.group(1) if match else None)
+
+def merge_connections(stats, other, continuation=True):
+    """
+    Continue the connections with the ones of the following range, or add
+    the ones of another server when it is not a 'continuation'
+    """
+    if 'connections' not in other:
+        return
+    if 'connections' in stats:
+        stats['connections'].merge(other['connections'], continuation)
+    else:
+        stats['connections'] = other['connections']
+
+def report_connections(stats, top=CONNECTION_CLIENTS_TOP):
+    """
+    Lifecycle of the connections (see ConnectionStore.lifecycle), with the
+    'top' clients opening the most connections and the clients opening a
+    connection per operation ('churning_clients')
+    """
+    connections = stats.get('connections')
+    if connections is None:
+        connections = ConnectionStore()
+    lifecycle = connections.lifecycle()
+    clients = lifecycle['clients']
+    lifecycle['churning_clients'] = [
+        client for client in clients
+        if client['closed'] >= CHURN_MIN_CONNECTIONS and
+        client['ops_per_connection'] <= CHURN_OPS_PER_CONNECTION]
+    lifecycle['clients'] = clients[:top]
+    return lifecycle
+
+def count_record(record, keys, stats):
+    """
+    Account a record, and its keys (see record_keys), in the statistics of
+    its range: the heavy hitters, the distinct values per minute and the
+    lifecycle of the connections
+    """
+    if keys:
+        count_heavy_hitters(keys, stats)
+    count_distinct_values(record, keys, stats)
+    verb = record.verb
+    if verb == 'RESULT' or verb == 'CONNECT' or verb == 'CLOSE':
+        track_connection(record, keys, stats)
+
+# Size of the blocks the memory-mapped search lowers and scans at once
+SEARCH_BLOCK_SIZE = 8 * 1024 * 1024
+# Head of a block sampled to choose between locating hits and decoding it whole
+DENSITY_PROBE_SIZE = 64 * 1024
+
+def iter_log_blocks(file_path, start=0, end=None, block_size=None):
+    """
+    Yield the content of a log file as blocks of whole lines.
+    Plain files are memory-mapped and can be restricted to the [start, end)
+    byte range. Compressed files are decompressed while streaming; for them
+    'start' and 'end' are offsets in the decompressed content.
+    """
+    if block_size is None:
+        block_size = SEARCH_BLOCK_SIZE
+    opener = compressed_opener(file_path)
+    if opener is not None:
+        with opener(file_path, 'rb') as f:
+            if start:
+                f.seek(start)
+            position = start
+            pending = b''
+            while end is None or position < end:
+                data = f.read(block_size if end is None else min(block_size, end - position))
+                if not data:
+                    break
+                position += len(data)
+                data = pending + data
+                cut = data.rfind(b'\n') + 1
+                pending = data[cut:]
+                if cut:
+                    yield data[:cut]
+            if pending:
+                yield pending
+        return
+
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if end is None or end > size:
+            end = size
+        if start >= end:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            block_start = start
+            while block_start < end:
+                block_end = min(block_start + block_size, end)
+                if block_end < end:
+                    # extend the block to the end of its last line
+                    newline = mm.find(b'\n', block_end - 1, end)
+                    block_end = end if newline < 0 else newline + 1
+                yield mm[block_start:block_end]
+                block_start = block_end
+
+def iter_matching_lines(file_path, search_term, start=0, end=None):
+    """
+    Yield (line_index, content) for the lines of a file containing the
+    search term (case insensitive). 'start' and 'end' restrict the scan to
+    a newline-aligned byte range; line_index is relative to 'start'.
+    ASCII terms are searched directly in the bytes of each block, only the
+    matching lines being decoded.
+    """
+    term = search_term.lower()
+    bytes_search = bool(search_term) and search_term.isascii() and '\n' not in search_term
+    if bytes_search:
+        needle = term.encode('ascii')
+        caseful = needle != needle.upper()
+    line_index = 0
+    for original in iter_log_blocks(file_path, start, end):
+        if bytes_search:
+            block = original.lower() if caseful else original
+            dense = (block.count(needle, 0, DENSITY_PROBE_SIZE) * 8 >
+                     block.count(b'\n', 0, DENSITY_PROBE_SIZE))
+        else:
+            # Empty or non ASCII terms use the case folding of str.lower()
+            dense = True
+        if dense:
+            # Dense block: most lines are decoded anyway, so decode it whole
+            lines = original.decode('utf-8', errors='replace').split('\n')
+            if lines[-1] == '':
+                lines.pop()
+            for line in lines:
+                if term in line.lower():
+                    yield line_index, line.strip()
+                line_index += 1
+            continue
+        counted = 0
+        pos = block.find(needle)
+        while pos >= 0:
+            line_start = block.rfind(b'\n', 0, pos) + 1
+            line_end = block.find(b'\n', pos)
+            if line_end < 0:
+                line_end = len(block)
+            line_index += block.count(b'\n', counted, line_start)
+            counted = line_start
+            raw = original[line_start:line_end]
+            yield line_index, raw.decode('utf-8', errors='replace').strip()
+            pos = block.find(needle, line_end + 1)
+        line_index += block.count(b'\n', counted)
+
+def iter_log_matches(files, search_term, max_matches=None, ranges=None, cache_entries=None):
+    """
+    Lazily yield the matches of the term in the files, in order, without
+    holding more than one line at a time.
+    'ranges' optionally restricts each file to a (start, end, line_offset)
+    byte range, line_offset being the number of lines before 'start'.
+    The matches of the files having an entry in 'cache_entries' (see
+    open_cache_entries) are read from the parse cache, with their 'record'.
+    """
+    nmatches = 0
+    cache_entries = cache_entries or {}
+    for file_path in files:
+        start, end, line_offset = (ranges or {}).get(file_path, (0, None, 0))
+        try:
+            cache_entry = cache_entries.get(file_path)
+            if cache_entry is None:
+                matches = ((i, content, None)
+                           for i, content in iter_matching_lines(file_path, search_term, start, end))
+            else:
+                matches = iter_cached_matches(cache_entry, search_term, start, end)
+            for i, content, record in matches:
+                match = {
+                    'file': file_path,
+                    'line_number': line_offset + i + 1,
+                    'content': content
+                }
+                if record is not None:
+                    match['record'] = record
+                yield match
+                nmatches += 1
+                if max_matches is not None and nmatches >= max_matches:
+                    return
+        except Exception as e:
+            print(f"Error reading file {file_path}: {e}")
+
+# Columns of the lines of a file in the parse cache: the integer fields of
+# their AccessRecord (CACHE_MISSING for None), their float fields (NaN for
+# None) and the codes of their string fields in the 'strings' of the entry
+# (-1 for None). Their 'rest' is the end of the line from 'rest_start',
+# their timestamp the start of the line when they have a 'header'.
+CACHE_INT_FIELDS = ('epoch', 'conn', 'op', 'err', 'nentries')
+CACHE_FLOAT_FIELDS = ('etime', 'wtime', 'optime')
+CACHE_STRING_FIELDS = ('verb', 'tag', 'notes')
+CACHE_MISSING = -2 ** 63
+# Stripped lines of the file, searched for the term instead of the file
+CACHE_TEXT_FILE = 'lines.txt'
+# Number of matching lines whose records are rebuilt at once
+CACHE_BATCH = 1024
+# Verbs of the records having a sub-second 'time' (see tokenize_access_line)
+TIMED_VERBS = {'RESULT', 'CONNECT', 'CLOSE'}
+
+def is_rotated_log(file_path):
+    """A log file that is not written anymore: compressed, or named after its rotation"""
+    return compressed_opener(file_path) is not None or rotation_timestamp(file_path) is not None
+
+def cache_key(file_path):
+    """
+    Key of the content of a file in the parse cache: the hash of its
+    leading bytes (see file_fingerprint), of its size and of its
+    modification time
+    """
+    stat = os.stat(file_path)
+    fingerprint, _ = file_fingerprint(file_path)
+    return hashlib.sha1(('%s:%d:%d' % (fingerprint, stat.st_size, stat.st_mtime_ns))
+                        .encode('ascii')).hexdigest()
+
+def write_cache_entry(file_path, path):
+    """
+    Tokenize all the lines of a file into the columns of a parse cache
+    entry written in 'path'. The byte 'offsets' of the lines in the
+    (decompressed) file and in the text of the entry ('text_offsets') map
+    the byte ranges of the file to the ones of the text.
+    Returns the metadata of the entry.
+    """
+    offsets = array('q', [0])
+    text_offsets = array('q', [0])
+    ints = {name: array('q') for name in CACHE_INT_FIELDS}
+    floats = {name: array('d') for name in CACHE_FLOAT_FIELDS}
+    codes = {name: array('i') for name in CACHE_STRING_FIELDS}
+    header = array('b')
+    rest_start = array('i')
+    strings = []
+    string_codes = {}
+    position = text_position = 0
+    with open(os.path.join(path, CACHE_TEXT_FILE), 'wb') as text:
+        for block in iter_log_blocks(file_path):
+            raws = block.split(b'\n')
+            if raws[-1] == b'':
+                raws.pop()
+            lines = []
+            for raw in raws:
+                line = raw.decode('utf-8', errors='replace').strip()
+                encoded = line.encode('utf-8')
+                lines.append(encoded)
+                position += len(raw) + 1
+                text_position += len(encoded) + 1
+                offsets.append(position)
+                text_offsets.append(text_position)
+                record = tokenize_access_line(line)
+                for name in CACHE_INT_FIELDS:
+                    value = getattr(record, name)
+                    ints[name].append(CACHE_MISSING if value is None else value)
+                for name in CACHE_FLOAT_FIELDS:
+                    value = getattr(record, name)
+                    floats[name].append(float('nan') if value is None else value)
+                for name in CACHE_STRING_FIELDS:
+                    value = getattr(record, name)
+                    code = -1
+                    if value is not None:
+                        code = string_codes.get(value)
+                        if code is None:
+                            code = string_codes[value] = len(strings)
+                            strings.append(value)
+                    codes[name].append(code)
+                header.append(record.timestamp is not None)
+                # the line is stripped: its rest is its end
+                rest_start.append(len(line) - len(record.rest))
+            if lines:
+                lines.append(b'')
+                text.write(b'\n'.join(lines))
+    save_column(path, 'offsets', offsets, np.int64)
+    save_column(path, 'text_offsets', text_offsets, np.int64)
+    for name, values in ints.items():
+        save_column(path, name, values, np.int64)
+    for name, values in floats.items():
+        save_column(path, name, values, np.float64)
+    for name, values in codes.items():
+        save_column(path, name, values, np.int32)
+    save_column(path, 'header', header, np.int8)
+    save_column(path, 'rest_start', rest_start, np.int32)
+    return {'file': file_path, 'lines': len(header), 'strings': strings}
+
+def open_cache_entries(files, cache):
+    """
+    The parse cache entries (metadata) of the rotated files, the missing
+    ones being parsed into the cache first
+    """
+    entries = {}
+    for file_path in files:
+        if not is_rotated_log(file_path):
+            continue
+        try:
+            key = cache_key(file_path)
+            entry = cache.lookup(key)
+            if entry is None:
+                print(f"Parsing {file_path} into the parse cache...")
+                entry = cache.store(key, lambda path: write_cache_entry(file_path, path))
+        except OSError as e:
+            print(f"Error caching file {file_path}: {e}")
+            continue
+        entries[file_path] = entry
+    return entries
+
+def iter_cached_matches(entry, search_term, start=0, end=None):
+    """
+    Yield (line_index, content, record) for the lines of a cached file
+    containing the search term, as iter_matching_lines does for the file
+    itself, with the AccessRecord of the line rebuilt from the columns of
+    its cache entry. The text and the columns are memory-mapped.
+    """
+    path = entry['path']
+    offsets = load_column(path, 'offsets')
+    text_offsets = load_column(path, 'text_offsets')
+    first = int(np.searchsorted(offsets, start))
+    last = len(offsets) - 1 if end is None else int(np.searchsorted(offsets, end))
+    if first >= last:
+        return
+    columns = {name: load_column(path, name) for name in
+               CACHE_INT_FIELDS + CACHE_FLOAT_FIELDS + CACHE_STRING_FIELDS + ('header', 'rest_start')}
+    strings = entry['strings']
+    matches = iter_matching_lines(os.path.join(path, CACHE_TEXT_FILE), search_term,
+                                  int(text_offsets[first]), int(text_offsets[last]))
+    while True:
+        batch = list(islice(matches, CACHE_BATCH))
+        if not batch:
+            return
+        rows = np.fromiter((first + i for i, _ in batch), np.int64, len(batch))
+        values = {}
+        for name in CACHE_INT_FIELDS:
+            values[name] = [None if value == CACHE_MISSING else value
+                            for value in columns[name][rows].tolist()]
+        for name in CACHE_FLOAT_FIELDS:
+            values[name] = [None if value != value else value
+                            for value in columns[name][rows].tolist()]
+        for name in CACHE_STRING_FIELDS:
+            values[name] = [None if code < 0 else strings[code]
+                            for code in columns[name][rows].tolist()]
+        for (i, content), epoch, conn, op, verb, tag, err, nentries, etime, wtime, optime, \
+                notes, header, rest_start in zip(
+                    batch, values['epoch'], values['conn'], values['op'], values['verb'],
+                    values['tag'], values['err'], values['nentries'], values['etime'],
+                    values['wtime'], values['optime'], values['notes'],
+                    columns['header'][rows].tolist(), columns['rest_start'][rows].tolist()):
+            time = line_time(content, epoch) if verb in TIMED_VERBS else None
+            yield i, content, AccessRecord(content[1:21] if header else None, epoch, conn, op,
+                                           verb, tag, err, nentries, etime, wtime, optime,
+                                           notes, content[rest_start:], time)
+
+def iter_matching_records(file_path, search_term, start=0, end=None, cache_entry=None):
+    """
+    Yield (line_index, content, record) for the lines of a file containing
+    the search term, from its parse cache entry when it is given
+    """
+    if cache_entry is not None:
+        yield from iter_cached_matches(cache_entry, search_term, start, end)
+        return
+    for i, content in iter_matching_lines(file_path, search_term, start, end):
+        yield i, content, tokenize_access_line(content)
+
+def search_files_for_term(files, search_term, max_matches=1000):
+    """Search files for a specific term"""
+    return list(iter_log_matches(files, search_term, max_matches))
+
+def sample_matches(matches, stats, sample_size=100):
+    """
+    Pass the matches through, counting them in stats['total_matches'] and
+    keeping the first 'sample_size' ones in stats['sample']
+    """
+    stats.setdefault('total_matches', 0)
+    sample = stats.setdefault('sample', [])
+    for match in matches:
+        stats['total_matches'] += 1
+        if len(sample) < sample_size:
+            sample.append({key: value for key, value in match.items() if key != 'record'})
+        yield match
+
+def parse_log_entry(line, diag, results, stats=None, record=None):
+    """
+    Tokenize a log line once, unless its 'record' comes from the parse
+    cache, and run all the registered detectors on it.
+    It is accounted in 'stats' when it is given (see count_record).
+    """
+    if record is None:
+        record = tokenize_access_line(line)
+    keys = detect(record, diag, results)
+    if stats is not None:
+        count_record(record, keys, stats)
+    return record
+
+def analyze_log_entries(entries, diag=None, results=None, operations=None, in_flight=None,
+                        operation_stats=None, orphans=None):
+    """
+    Analyze log entries to extract patterns and insights.
+    The detection continues from 'diag' and 'results' when they are given
+    (see load_checkpoint), they are updated in place.
+    When an OperationStore is given, the entries are also correlated into
+    operations appended to it. The requests still waiting for their result
+    at the end are stored too, unless an 'in_flight' table is given (see
+    iter_operations): they are then left in it. The operations are also
+    accounted in the 'operation_stats' dict (see analyze_operations), with the
+    entries themselves (see count_record). The results whose request is not
+    in the entries are appended to the 'orphans' list when it is given,
+    instead of being stored (see divert_orphans).
+    """
+    if diag is None:
+        diag = {}
+    if results is None:
+        results = {}
+    init_detectors(diag, results)
+    if operations is not None and operation_stats is None:
+        operation_stats = {}
+    records = (parse_log_entry(entry['content'], diag, results, operation_stats,
+                               entry.get('record'))
+               for entry in entries)
+    if operations is not None:
+        # the records are joined into operations as they are detected
+        completed = iter_operations(records, in_flight, flush=in_flight is None)
+        if orphans is not None:
+            completed = divert_orphans(completed, orphans)
+        operations.extend(analyze_operations(completed, operation_stats))
+    else:
+        for _ in records:
+            pass
+    return results
+
+# Chunks smaller than this are not worth a process
+MIN_CHUNK_SIZE = 16 * 1024 * 1024
+# Number of snapshots of the detectors state a chunk worker takes, at the
+# first second boundaries of its chunk, to be stitched to the previous chunk
+# early: its last snapshot is taken once its detectors are settled
+STITCH_SNAPSHOTS = 16
+
+def split_log_file(file_path, chunk_size, start=0, end=None):
+    """
+    Split a file, or its [start, end) range, into newline-aligned byte ranges.
+    A compressed file can not be split: it is a single range.
+    """
+    if compressed_opener(file_path) is not None:
+        return [(start, end)]
+    size = os.path.getsize(file_path)
+    if end is not None:
+        size = min(size, end)
+    ranges = []
+    with open(file_path, 'rb') as f:
+        while start < size:
+            end = start + chunk_size
+            if end >= size:
+                end = size
+            else:
+                f.seek(end)
+                f.readline()
+                end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def count_lines(file_path, start, end):
+    """Count the lines of a byte range of a file"""
+    return sum(block.count(b'\n') for block in iter_log_blocks(file_path, start, end))
+
+def detector_state(diag):
+    """Comparable snapshot of the detectors state"""
+    return json.dumps(diag, sort_keys=True)
+
+def count_events(results):
+    """Number of events registered so far in each result list"""
+    return {(name, key): len(events)
+            for name, result in results.items()
+            for key, events in result.items()}
+
+def scan_log_chunk(file_path, start, end, search_term, sample_size=100, keep_operations=True,
+                   cache_entry=None):
+    """
+    Worker of the --jobs mode: search a byte range of a file and run the
+    detectors on its matches, starting from a fresh detector state.
+    As the real state at the start of the chunk is only known once the
+    previous chunks are processed, the worker also snapshots its state at
+    the first second boundaries of the chunk, and once no detector depends
+    on the state it started from (see SETTLED): a replay from the real
+    state reaches that last snapshot at the latest (see stitch_log_chunk).
+    The matches are also correlated into operations. The results whose
+    request is not in the chunk ('orphans') and the requests still waiting
+    for their result at the end ('in_flight') are returned apart, to be
+    joined with the neighbour chunks (see stitch_operations). The operations
+    are only counted unless 'keep_operations' (see OperationStore).
+    The lines are read from the parse cache when the 'cache_entry' of the
+    file is given.
+    """
+    diag, results = init_detectors({}, {})
+    snapshots = []
+    sample = []
+    orphans = []
+    in_flight = OrderedDict()
+    operations = OperationStore(keep_operations)
+    operation_stats = {}
+
+    def records():
+        nmatches = 0
+        previous = first = None
+        unsettled = DETECTORS
+        for i, content, record in iter_matching_records(file_path, search_term, start, end,
+                                                        cache_entry):
+            count_record(record, detect(record, diag, results), operation_stats)
+            nmatches += 1
+            if len(sample) < sample_size:
+                sample.append({'file': file_path, 'line_number': i + 1, 'content': content})
+            if unsettled:
+                if first is None:
+                    first = record.epoch
+                unsettled = unsettled_detectors(unsettled, diag, record, first)
+                if not unsettled or (nmatches > 1 and record.epoch != previous and
+                                     len(snapshots) < STITCH_SNAPSHOTS):
+                    snapshots.append((nmatches, detector_state(diag), count_events(results)))
+            previous = record.epoch
+            yield record
+        chunk['nmatches'] = nmatches
+
+    chunk = {}
+    operations.extend(analyze_operations(
+        divert_orphans(iter_operations(records(), in_flight, flush=False), orphans),
+        operation_stats))
+    chunk.update({
+        'nlines': count_lines(file_path, start, end),
+        'sample': sample,
+        'snapshots': snapshots,
+        'diag': diag,
+        'results': results,
+        'operations': operations,
+        'operation_stats': operation_stats,
+        'orphans': orphans,
+        'in_flight': list(in_flight.values()),
+    })
+    return chunk
+
+def adopt_events(results, chunk, counts=None):
+    """
+    Append to 'results' the events of a chunk detected after its snapshot
+    'counts' (see count_events), all of them by default
+    """
+    for name, result in chunk['results'].items():
+        for key, events in result.items():
+            tail = events[counts.get((name, key), 0):] if counts else events
+            results.setdefault(name, {}).setdefault(key, []).extend(tail)
+
+def stitch_records(diag, results, records, chunk):
+    """
+    Replay the records of the head of a chunk detected from a fresh state
+    (see scan_log_chunk) from the real state (diag, results), until it
+    reaches the state of one of the chunk snapshots: from there both runs
+    are identical, so the chunk events and final state are adopted.
+    Returns the detectors state after the chunk, or None when the records
+    were all replayed without such a convergence.
+    """
+    pending = iter(chunk['snapshots'])
+    snapshot = next(pending, None)
+    nmatches = 0
+    for record in records:
+        detect(record, diag, results)
+        nmatches += 1
+        if snapshot is not None and nmatches == snapshot[0]:
+            if detector_state(diag) == snapshot[1]:
+                adopt_events(results, chunk, snapshot[2])
+                return chunk['diag']
+            snapshot = next(pending, None)
+    return None
+
+def stitch_log_chunk(diag, results, file_path, start, end, search_term, chunk, limit=None,
+                     cache_entry=None):
+    """
+    Continue the detection (diag, results) with a chunk processed by
+    scan_log_chunk (see stitch_records). Without a convergence (or when
+    only 'limit' matches of the chunk must be considered) the whole chunk
+    is processed here.
+    Returns the detectors state after the chunk.
+    """
+    if is_fresh(diag) and limit is None:
+        # Nothing was detected before: the fresh state of the worker is exact
+        adopt_events(results, chunk)
+        return chunk['diag']
+
+    records = (record for _, _, record in
+               iter_matching_records(file_path, search_term, start, end, cache_entry))
+    if limit is not None:
+        for record in islice(records, limit):
+            detect(record, diag, results)
+        return diag
+    stitched = stitch_records(diag, results, records, chunk)
+    return diag if stitched is None else stitched
+
+def divert_orphans(operations, orphans):
+    """
+    Pass the operations through, but the results whose request was not
+    seen ('orphans'), appended to the 'orphans' list instead
+    """
+    for operation in operations:
+        if operation.verb is None:
+            orphans.append(operation)
+        else:
+            yield operation
+
+def join_orphans(orphans, in_flight, unjoined=None):
+    """
+    Yield the orphan results of a range joined to their request, left in
+    flight by the previous ranges. The ones without a request are appended
+    to the 'unjoined' list when it is given, else yielded as they are.
+    """
+    for orphan in orphans:
+        request = in_flight.pop((orphan.conn, orphan.op), None)
+        if request is not None:
+            orphan = orphan._replace(timestamp=request.timestamp, epoch=request.epoch,
+                                     verb=request.verb, base=request.base,
+                                     scope=request.scope, filter=request.filter)
+        elif unjoined is not None:
+            unjoined.append(orphan)
+            continue
+        yield orphan
+
+def stitch_operations(operations, in_flight, operation_stats, chunk, orphans=None):
+    """
+    Continue the correlation of the operations with a chunk processed by
+    scan_log_chunk: its orphan results are joined to the requests left in
+    flight by the previous chunks (see join_orphans), and its own requests
+    in flight are added to them.
+    """
+    operations.extend(analyze_operations(join_orphans(chunk['orphans'], in_flight, orphans),
+                                         operation_stats))
+    operations.merge(chunk['operations'])
+    merge_operation_stats(operation_stats, chunk['operation_stats'])
+    for request in chunk['in_flight']:
+        in_flight[(request.conn, request.op)] = request
+    while len(in_flight) > MAX_IN_FLIGHT:
+        operations.append(in_flight.popitem(last=False)[1])
+
+def analyze_log_files_parallel(files, search_term, jobs, max_matches=1000, sample_size=100,
+                               ranges=None, diag=None, results=None,
+                               operations=None, in_flight=None, operation_stats=None,
+                               cache_entries=None, orphans=None, on_chunk=None):
+    """
+    Search the files and run the detectors in a pool of 'jobs' processes.
+    Each file is split into newline-aligned byte ranges, the largest ones
+    being submitted first so that a huge range does not end up running
+    alone at the end. The chunks are then stitched back in the order of
+    'files' (see order_log_files), so the events are identical to the ones
+    of a sequential run.
+    'ranges', 'cache_entries', 'diag', 'results', 'operations', 'in_flight',
+    'operation_stats' and 'orphans' are as for iter_log_matches and
+    analyze_log_entries.
+    on_chunk(results) is called once each chunk is stitched.
+    Returns the number of matches, a sample of them, the analysis and the
+    final detectors state.
+    """
+    ranges = ranges or {}
+    cache_entries = cache_entries or {}
+    flush = in_flight is None
+    if in_flight is None:
+        in_flight = OrderedDict()
+    if operation_stats is None:
+        operation_stats = {}
+    sizes = {file_path: os.path.getsize(file_path) for file_path in files
+             if os.path.exists(file_path)}
+    chunk_size = max(MIN_CHUNK_SIZE, sum(sizes.values()) // (jobs * 4) + 1)
+    chunks = []
+    for file_path in files:
+        if file_path in sizes:
+            start, end, _ = ranges.get(file_path, (0, None, 0))
+            for chunk_start, chunk_end in split_log_file(file_path, chunk_size, start, end):
+                chunks.append((file_path, chunk_start, chunk_end))
+
+    if diag is None:
+        diag = {}
+    if results is None:
+        results = {}
+    init_detectors(diag, results)
+    sample = []
+    nmatches = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {}
+        def chunk_size_of(chunk):
+            file_path, start, end = chunk
+            return (sizes[file_path] if end is None else end) - start
+        for file_path, start, end in sorted(chunks, key=chunk_size_of, reverse=True):
+            futures[(file_path, start)] = executor.submit(
+                scan_log_chunk, file_path, start, end, search_term, sample_size,
+                operations is None or operations.keep, cache_entries.get(file_path))
+
+        line_offset = 0
+        current_file = None
+        for file_path, start, end in chunks:
+            future = futures[(file_path, start)]
+            if nmatches >= max_matches:
+                future.cancel()
+                continue
+            if file_path != current_file:
+                current_file = file_path
+                line_offset = ranges.get(file_path, (0, None, 0))[2]
+            try:
+                chunk = future.result()
+            except Exception as e:
+                print(f"Error reading file {file_path}: {e}")
+                continue
+            limit = None
+            if nmatches + chunk['nmatches'] > max_matches:
+                limit = max_matches - nmatches
+            diag = stitch_log_chunk(diag, results, file_path, start, end,
+                                    search_term, chunk, limit, cache_entries.get(file_path))
+            if operations is not None:
+                if limit is None:
+                    stitch_operations(operations, in_flight, operation_stats, chunk, orphans)
+                else:
+                    # only the first 'limit' matches of the chunk are analyzed
+                    def records():
+                        for _, _, record in islice(iter_matching_records(
+                                file_path, search_term, start, end,
+                                cache_entries.get(file_path)), limit):
+                            count_record(record, record_keys(record), operation_stats)
+                            yield record
+                    completed = iter_operations(records(), in_flight, flush=False)
+                    if orphans is not None:
+                        completed = divert_orphans(completed, orphans)
+                    operations.extend(analyze_operations(completed, operation_stats))
+            nmatches += chunk['nmatches'] if limit is None else limit
+            keep = sample_size - len(sample)
+            if limit is not None:
+                keep = min(keep, limit)
+            for match in chunk['sample'][:keep]:
+                match['line_number'] += line_offset
+                sample.append(match)
+            line_offset += chunk['nlines']
+            if on_chunk is not None:
+                on_chunk(results)
+    if operations is not None and flush:
+        operations.extend(in_flight.values())
+        in_flight.clear()
+    return nmatches, sample, results, diag
+
+# Version of the checkpoint files written by --incremental
+CHECKPOINT_VERSION = 5
+# Number of leading bytes identifying the content of a log file
+FINGERPRINT_SIZE = 4096
+
+def file_fingerprint(file_path, size=FINGERPRINT_SIZE):
+    """
+    Return the sha1 of the first 'size' bytes of the (decompressed) content
+    of a file, and the number of bytes it was computed on
+    """
+    opener = compressed_opener(file_path) or open
+    with opener(file_path, 'rb') as f:
+        head = f.read(size)
+    return hashlib.sha1(head).hexdigest(), len(head)
+
+def complete_end(file_path, size, block_size=64 * 1024):
+    """
+    Return the offset following the last newline before 'size', so that a
+    line being written is not analyzed before it is complete
+    """
+    with open(file_path, 'rb') as f:
+        end = size
+        while end > 0:
+            start = max(0, end - block_size)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+def load_checkpoint(path, search_term):
+    """
+    Load the checkpoint of an incremental analysis. A missing checkpoint,
+    or one written for another search term or format, starts a new one.
+    """
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'search_term': search_term,
+        'files': {},
+        'diag': {},
+        'results': {},
+    }
+    try:
+        with open(path, 'r') as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return checkpoint
+    except (OSError, ValueError) as e:
+        print(f"Error reading checkpoint {path}: {e}")
+        return checkpoint
+    if saved.get('version') != CHECKPOINT_VERSION or saved.get('search_term') != search_term:
+        print(f"Checkpoint {path} does not match this analysis, starting from scratch")
+        return checkpoint
+    return saved
+
+def save_checkpoint(path, checkpoint):
+    """Atomically write the checkpoint of an incremental analysis"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def find_checkpoint_entry(entries, file_path, stat):
+    """
+    Find the checkpoint entry of a file: the one of the same inode, else the
+    one of the same content (the active log was rotated and compressed).
+    The leading content must match in both cases, inodes being reused.
+    """
+    fingerprints = {}
+
+    def same_content(entry):
+        size = entry['fingerprint_size']
+        if size not in fingerprints:
+            fingerprints[size] = file_fingerprint(file_path, size)
+        return fingerprints[size] == (entry['fingerprint'], size)
+
+    for entry in entries:
+        if entry['dev'] == stat.st_dev and entry['inode'] == stat.st_ino and same_content(entry):
+            return entry
+    for entry in entries:
+        if same_content(entry):
+            return entry
+    return None
+
+def plan_incremental_ranges(files, checkpoint):
+    """
+    Compute, from the checkpoint, the (start, end, line_offset) range of
+    each file that was not analyzed yet, and the checkpoint entries of the
+    files once these ranges are analyzed
+    """
+    entries = list(checkpoint['files'].values())
+    ranges = {}
+    new_entries = {}
+    for file_path in files:
+        entry = None
+        try:
+            stat = os.stat(file_path)
+            entry = find_checkpoint_entry(entries, file_path, stat)
+            compressed = compressed_opener(file_path) is not None
+            start = line_offset = 0
+            if entry is not None:
+                if entry['complete']:
+                    ranges[file_path] = (0, 0, 0)
+                    new_entries[file_path] = dict(entry, path=file_path)
+                    continue
+                if compressed or entry['offset'] <= stat.st_size:
+                    start, line_offset = entry['offset'], entry['lines']
+            end = None if compressed else complete_end(file_path, stat.st_size)
+            fingerprint, fingerprint_size = file_fingerprint(file_path)
+        except OSError as e:
+            print(f"Error reading file {file_path}: {e}")
+            ranges[file_path] = (0, 0, 0)
+            if entry is not None:
+                new_entries[file_path] = entry
+            continue
+        ranges[file_path] = (start, end, line_offset)
+        new_entries[file_path] = {
+            'path': file_path,
+            'dev': stat.st_dev,
+            'inode': stat.st_ino,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'offset': end if end is not None else start,
+            'lines': line_offset,
+            # a rotated compressed file does not change anymore
+            'complete': compressed,
+            'fingerprint': fingerprint,
+            'fingerprint_size': fingerprint_size,
+        }
+    return ranges, new_entries
+
+def update_checkpoint(checkpoint, ranges, new_entries, diag, results):
+    """Record in the checkpoint the analyzed ranges and the detectors state"""
+    for file_path, entry in new_entries.items():
+        start, end, line_offset = ranges[file_path]
+        if end is not None and end > start:
+            entry['lines'] = line_offset + count_lines(file_path, start, end)
+    checkpoint['files'] = new_entries
+    checkpoint['diag'] = diag
+    checkpoint['results'] = results
+
+def new_events(results, before):
+    """
+    Return the part of 'results' holding only the events registered since
+    count_events() returned 'before'
+    """
+    return {name: {key: events[before.get((name, key), 0):]
+                   for key, events in result.items()}
+            for name, result in results.items()}
+
+# Version of the partial result files written by --partial: other versions
+# are not merged
+PARTIAL_VERSION = 2
+# Statistics of a range saved as they are in its partial result
+PARTIAL_STATS = ('unindexed_searches', 'latency_digests', 'long_updates', 'heavy_hitters')
+
+def encode_stats(stats):
+    """
+    JSON-serializable copy of the statistics of a range (see decode_stats):
+    the HyperLogLog registers in base64 and the connections as columns
+    """
+    compress_latency_digests(stats)
+    encoded = {key: stats[key] for key in PARTIAL_STATS if key in stats}
+    encoded['distinct_values'] = {
+        str(minute): {dimension: base64.b64encode(bytes(values)).decode('ascii')
+                      for dimension, values in registers.items()}
+        for minute, registers in stats.get('distinct_values', {}).items()}
+    if 'connections' in stats:
+        encoded['connections'] = stats['connections'].to_dict()
+    return encoded
+
+def decode_stats(encoded):
+    """Statistics of a range saved by encode_stats"""
+    stats = {key: encoded[key] for key in PARTIAL_STATS if key in encoded}
+    stats['distinct_values'] = {
+        int(minute): {dimension: bytearray(base64.b64decode(values))
+                      for dimension, values in registers.items()}
+        for minute, registers in encoded.get('distinct_values', {}).items()}
+    if 'connections' in encoded:
+        stats['connections'] = ConnectionStore.from_dict(encoded['connections'])
+    return stats
+
+def partial_head(files, search_term, ranges=None, cache_entries=None):
+    """
+    Detect again the first matches of a range from a fresh state, as
+    scan_log_chunk, until the state of every detector no longer depends on
+    the one it started from (see SETTLED): from there the merge adopts the
+    events and state of the range, whatever the previous range left (see
+    stitch_partial). Returns these lines (all of them when the range ends
+    before), the snapshots of the state after them, as JSON lists, and the
+    epoch of the first line.
+    """
+    diag, results = init_detectors({}, {})
+    lines = []
+    taken = []
+    first = None
+    unsettled = DETECTORS
+    for match in iter_log_matches(files, search_term, ranges=ranges, cache_entries=cache_entries):
+        record = match.get('record') or tokenize_access_line(match['content'])
+        detect(record, diag, results)
+        lines.append(match['content'])
+        if first is None:
+            first = record.epoch
+        unsettled = unsettled_detectors(unsettled, diag, record, first)
+        if not unsettled:
+            taken.append([len(lines), detector_state(diag),
+                          [[name, key, count] for (name, key), count in count_events(results).items()]])
+            break
+    return lines, taken, first
+
+def save_partial(path, partial):
+    """Atomically write a partial result, as gzip-compressed JSON"""
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt') as f:
+        json.dump(partial, f)
+    os.replace(tmp_path, path)
+
+def load_partial(path):
+    """
+    Load a partial result, with its snapshots, operations and statistics
+    decoded. Returns None when it can not be read or has another version.
+    """
+    try:
+        with gzip.open(path, 'rt') as f:
+            partial = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error reading partial result {path}: {e}")
+        return None
+    if partial.get('version') != PARTIAL_VERSION:
+        print(f"Partial result {path} was written by another version, skipping it")
+        return None
+    partial['snapshots'] = [(nmatches, state, {(name, key): count for name, key, count in counts})
+                            for nmatches, state, counts in partial['snapshots']]
+    partial['in_flight'] = [OperationRecord(*request) for request in partial['in_flight']]
+    partial['orphans'] = [OperationRecord(*orphan) for orphan in partial['orphans']]
+    partial['stats'] = decode_stats(partial['stats'])
+    return partial
+
+def stitch_partial(diag, results, partial):
+    """
+    Continue the detection (diag, results) of a host with the partial
+    result of its following range, by replaying its head (see
+    stitch_records), after which the detectors reach the state of the
+    partial whatever state they started from (see partial_head). When the
+    range ends before, the head is the whole range.
+    Returns the detectors state after the range. Raises ValueError when the
+    detectors do not reach the state of the partial, which is not the range
+    following the previous ones.
+    """
+    if is_fresh(diag):
+        # Nothing was detected before: the fresh state of the range is exact
+        adopt_events(results, partial)
+        return partial['diag']
+    stitched = stitch_records(diag, results, (tokenize_access_line(line) for line in partial['head']),
+                              partial)
+    if stitched is not None:
+        return stitched
+    if partial['snapshots']:
+        raise ValueError(f"the detectors of {partial['host']} did not reach the state of the partial "
+                         f"result after {len(partial['head'])} lines of its range, is it the range "
+                         f"following the previous ones?")
+    return diag
+
+def merge_host_partials(partials):
+    """
+    Merge the partial results of consecutive ranges of the logs of a host,
+    sorted by time: the detection is stitched (see stitch_partial) and the
+    orphan results of each range are joined to the requests left in flight
+    by the previous ones. Returns the events, the statistics and the number
+    of operations of the host.
+    """
+    diag, results = init_detectors({}, {})
+    stats = {}
+    in_flight = OrderedDict()
+
+    def analyze(operations):
+        return sum(1 for _ in analyze_operations(operations, stats))
+
+    noperations = 0
+    for partial in partials:
+        diag = stitch_partial(diag, results, partial)
+        noperations += analyze(join_orphans(partial['orphans'], in_flight))
+        merge_operation_stats(stats, partial['stats'])
+        noperations += partial['operations']
+        for request in partial['in_flight']:
+            in_flight[(request.conn, request.op)] = request
+        while len(in_flight) > MAX_IN_FLIGHT:
+            noperations += analyze([in_flight.popitem(last=False)[1]])
+    # the requests whose result is not logged
+    noperations += analyze(in_flight.values())
+    return results, stats, noperations
+
+def add_host_events(analysis, host, results):
+    """Add the events of a host to the ones of the other hosts, tagged with their 'host'"""
+    for name, result in results.items():
+        for key, events in result.items():
+            for event in events:
+                event['host'] = host
+            analysis.setdefault(name, {}).setdefault(key, []).extend(events)
+
+def sort_events(analysis):
+    """Sort by time the events of several hosts"""
+    for result in analysis.values():
+        for events in result.values():
+            events.sort(key=lambda event: event.get('epoch') or 0)
+
+def merge_partials(partials, sample_size=100):
+    """
+    Merge partial results (see --partial) of any hosts and time ranges into
+    the results of a single run over all their logs. The events and the
+    saturation intervals are tagged with their 'host' when several hosts
+    are merged. The operations are not available: only their latency
+    estimated from the t-digests is reported, as with --digests-only.
+    """
+    hosts = OrderedDict()
+    for partial in sorted(partials, key=lambda partial: (partial['host'], partial['first_epoch'] or 0)):
+        hosts.setdefault(partial['host'], []).append(partial)
+    several = len(hosts) > 1
+    analysis = {}
+    stats = {}
+    matches = []
+    total_matches = 0
+    total_files = 0
+    noperations = 0
+    saturation = None
+    for host, host_partials in hosts.items():
+        results, host_stats, host_operations = merge_host_partials(host_partials)
+        attach_long_updates(results, host_stats)
+        if several:
+            add_host_events(analysis, host, results)
+        else:
+            analysis = results
+        merge_operation_stats(stats, host_stats, continuation=False)
+        noperations += host_operations
+        for partial in host_partials:
+            total_matches += partial['total_matches']
+            total_files += partial['total_files_searched']
+            matches.extend(partial['matches'][:sample_size - len(matches)])
+            if partial['saturation'] is None:
+                continue
+            if saturation is None:
+                saturation = {'threads': partial['saturation']['threads'], 'max_busy': 0,
+                              'busy_seconds': 0, 'intervals': []}
+            saturation['max_busy'] = max(saturation['max_busy'], partial['saturation']['max_busy'])
+            saturation['busy_seconds'] = round(saturation['busy_seconds'] +
+                                               partial['saturation']['busy_seconds'], 6)
+            saturation['intervals'].extend(dict(interval, host=host) if several else interval
+                                           for interval in partial['saturation']['intervals'])
+    if several:
+        sort_events(analysis)
+        if saturation is not None:
+            saturation['intervals'].sort(key=lambda interval: interval['start'])
+
+    unindexed_searches = report_unindexed_searches(stats)
+    analysis['distinct_counts'] = report_distinct_values(stats)
+    connections = report_connections(stats)
+    solutions = (suggest_solutions(analysis) + suggest_indexes(unindexed_searches) +
+                 suggest_connections(connections))
+    if saturation is not None:
+        solutions += suggest_threads(saturation)
+    return {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(),
+            'search_term': partials[0]['search_term'],
+            'hosts': list(hosts),
+            'partials': len(partials),
+            'total_files_searched': total_files,
+            'total_matches': total_matches
+        },
+        'matches': matches,
+        'analysis': analysis,
+        # only estimated from the t-digests: the exact percentiles need the
+        # operations (see main)
+        'latency': {
+            'operations': noperations,
+            'digests_by_verb_minute': report_latency_digests(stats),
+        },
+        'unindexed_searches': unindexed_searches,
+        'heavy_hitters': report_heavy_hitters(stats),
+        'saturation': saturation,
+        'connections': connections,
+        'solutions': solutions
+    }
+
+def merge_main(argv):
+    """The 'merge' subcommand: merge partial result files into the results of a single run"""
+    parser = argparse.ArgumentParser(prog="analyze_logs.py merge",
+                                     description="Merge the partial results written by --partial")
+    parser.add_argument("partials", nargs="+", metavar="PARTIAL",
+                        help="Partial result files, of any hosts and time ranges")
+    parser.add_argument("--output", type=str, help="Output file for results (JSON), else stdout")
+    parser.add_argument("--disable-ai", action="store_true", help="Disable AI enhancement")
+    args = parser.parse_args(argv)
+    output = sys.stdout
+    if not args.output:
+        # stdout carries the results: the messages go to stderr
+        sys.stdout = sys.stderr
+    if args.disable_ai:
+        os.environ["DISABLE_AI_ENHANCEMENT"] = "true"
+    partials = [partial for partial in map(load_partial, args.partials) if partial is not None]
+    if not partials:
+        print("Error: no partial result to merge")
+        sys.exit(1)
+    terms = sorted({partial['search_term'] for partial in partials})
+    if len(terms) > 1:
+        print(f"Error: the partial results are for different search terms: {', '.join(terms)}")
+        sys.exit(1)
+    try:
+        results = merge_partials(partials)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    results = enhance_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Merged {len(partials)} partial results into {args.output}")
+    else:
+        json.dump(results, output, indent=2)
+        output.write('\n')
+
+# Seconds of clock skew tolerated between the replicas: the matches of each
+# replica are counted up to FLEET_SKEW seconds around the window of a
+# fleet-wide event
+FLEET_SKEW = 1
+# Detectors also run on the merged timeline of the replicas: the ones
+# counting per second, a run of consecutive lines ('lines' window) being
+# only meaningful in the log of a single server
+FLEET_DETECTORS = [detector for detector in DETECTORS if detector.window != 'lines']
+
+def parse_replica(value):
+    """A --replica [NAME=]DIR argument: (name, directory), named after the directory by default"""
+    name, sep, directory = value.partition('=')
+    if not sep:
+        directory = value
+        name = os.path.basename(os.path.normpath(value))
+    return name, directory
+
+def iter_replica_matches(host, files, search_term, ranges=None):
     """
-    Check the ABANDON with targetop=xx and 'etime' that occured in
-    the same second.
+    Yield (time, match, record) for the matches of the logs of a replica,
+    each match tagged with its 'host'. The time is the UTC time of the line
+    with its sub-second fraction, or the one of the previous line, so that
+    the lines of a replica stay in their order in the merged timeline.
     """
-    try:
-        results_abandon_high_etime = results["abandon_high_etime"]
-    except KeyError:
-        results_abandon_high_etime = {
-                'event_abandon_high_etime': []}
-        results["abandon_high_etime"] = results_abandon_high_etime
-
-    try:
-        abandon_high_etime = diag["abandon_high_etime"]
-    except KeyError:
-        abandon_high_etime = {
-                'severity': 'normal',
-                'count': 0,
-                'timematch': ""}
-        diag["abandon_high_etime"] = abandon_high_etime
-
-    nb_abandon_high_etime_threshold = 5
-    high_etime_threshold = 20
-    severity_threshold = {
-            'fatal': 50,
-            'critical': 30,
-            'warning': 15}
-    abandon_match = re.search(r'ABANDON targetop=[0-9]+ .*etime=(\d+).', line)
-    if abandon_match:
-        etime = int(abandon_match.group(1))
-    else:
-        etime = 0
-    timestamp_match = re.search(r'^\[(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2})', line)
-
-    if abandon_high_etime['timematch'] == "":
-        abandon_high_etime['timematch'] = timestamp_match.group(1)
-
-    if abandon_match:
-        # This is an abandon
-        if (timestamp_match.group(1) == abandon_high_etime['timematch']):
-            # this record is in the same second than the previous one
-            # If it is a long operation Just increase the number of time we detected it
-            if (etime >= high_etime_threshold):
-                abandon_high_etime['count'] = abandon_high_etime['count'] + 1
-        else:
-            # This record occurred in a next second, register the current one
-            # at the condition it overpass the threshold
-            if (abandon_high_etime['count'] >= nb_abandon_high_etime_threshold):
-                #pdb.set_trace()
-                # in case the number of abandon
-                # exceeded the threshold, register it into the results
-                for threshold in ['fatal', 'critical', 'warning']:
-                    if severity_threshold[threshold] and abandon_high_etime["count"] >= severity_threshold[threshold]:
-                        abandon_high_etime["severity"] = threshold
-                        break
-                new_event = {"count": abandon_high_etime["count"],
-                             "timematch": abandon_high_etime["timematch"],
-                             "severity": abandon_high_etime["severity"]}
-                results_abandon_high_etime["event_abandon_high_etime"].append(new_event)
-
-            abandon_high_etime['count'] = 1
-            abandon_high_etime['timematch'] = timestamp_match.group(1)
-    else:
-        if (timestamp_match.group(1) == abandon_high_etime['timematch']):
-            # different operation in the same second are ignored
-            return
+    when = float('-inf')
+    for match in iter_log_matches(files, search_term, ranges=ranges):
+        record = tokenize_access_line(match['content'])
+        line_epoch = line_time(match['content'], record.epoch)
+        if line_epoch is not None:
+            when = line_epoch
+        match['host'] = host
+        yield when, match, record
 
-        # This is another operation, just check if timestamp change
-        # and if it is so record the previous event
-        if (abandon_high_etime['count'] >= nb_abandon_high_etime_threshold):
-            #pdb.set_trace()
-            # in case the number of abandon
-            # exceeded the threshold, register it into the results
-            for threshold in ['fatal', 'critical', 'warning']:
-                if severity_threshold[threshold] and abandon_high_etime["count"] >= severity_threshold[threshold]:
-                    abandon_high_etime["severity"] = threshold
-                    break
-            new_event = {"count": abandon_high_etime["count"],
-                         "timematch": abandon_high_etime["timematch"],
-                         "severity": abandon_high_etime["severity"]}
-            results_abandon_high_etime["event_abandon_high_etime"].append(new_event)
+def fleet_scope(event, detector, counts, hosts, skew=FLEET_SKEW):
+    """
+    Attach to a fleet-wide event the number of matching records of each
+    replica in its window, give or take 'skew' seconds ('replicas'), and
+    its 'scope': 'fleet' when all the replicas had some, 'replica' when a
+    single one had, 'partial' otherwise. 'counts' maps (detector name,
+    epoch) to the matching records of each replica in that second.
+    """
+    hits = Counter()
+    for second in range(event['epoch'] - (detector.seconds or 1) + 1 - skew,
+                        event['epoch'] + 1 + skew):
+        hits.update(counts.get((detector.name, second), ()))
+    event['replicas'] = {host: hits[host] for host in hosts}
+    hit = sum(1 for host in hosts if hits[host])
+    event['scope'] = 'fleet' if hit == len(hosts) else 'replica' if hit == 1 else 'partial'
 
-        abandon_high_etime['count'] = 0
-        abandon_high_etime['timematch'] = timestamp_match.group(1)
+def analyze_replicas(replicas, search_term, ranges=None, sample_size=100, skew=FLEET_SKEW,
+                     operations=None):
+    """
+    Merge the matches of the logs of several replicas, (host, files) pairs,
+    into one timeline in time order, with a k-way heap merge of their
+    streams (see iter_replica_matches), and run the detectors on the records
+    of each replica and the FLEET_DETECTORS on the whole timeline, whose
+    events are attached their replicas (see fleet_scope). The records of
+    each replica are also correlated into operations, appended to the
+    'operations' store, and accounted in the statistics of the replica
+    (see analyze_operations and count_record).
+    Returns the number of matches of each host, a sample of the timeline,
+    the results and the statistics of each host and the fleet-wide results.
+    """
+    hosts = [host for host, _ in replicas]
+    streams = [iter_replica_matches(host, files, search_term, ranges) for host, files in replicas]
+    if operations is None:
+        operations = OperationStore(keep=False)
+    diags = {}
+    results = {}
+    stats = {}
+    in_flight = {}
+    for host in hosts:
+        diags[host], results[host] = init_detectors({}, {})
+        stats[host] = {}
+        in_flight[host] = OrderedDict()
+    totals = Counter()
+    sample = []
+    fleet_diag, fleet_results = init_detectors({}, {}, FLEET_DETECTORS)
+    # matching records of each replica in the last seconds, and the fleet
+    # events waiting for the seconds following their window
+    counts = {}
+    horizon = max([detector.seconds or 1 for detector in FLEET_DETECTORS], default=1) + 2 * skew
+    pending = deque()
+    registered = Counter()
+    last = None
+    for _, match, record in heapq.merge(*streams, key=itemgetter(0)):
+        host = match['host']
+        totals[host] += 1
+        if len(sample) < sample_size:
+            sample.append(match)
+        count_record(record, detect(record, diags[host], results[host]), stats[host])
+        # the requests of each replica wait for their result in its own table
+        operations.extend(analyze_operations(
+            iter_operations((record,), in_flight[host], flush=False), stats[host]))
+        epoch = record.epoch
+        if epoch is None:
+            continue
+        if epoch != last:
+            last = epoch
+            while pending and pending[0][0] < epoch:
+                _, detector, event = pending.popleft()
+                fleet_scope(event, detector, counts, hosts, skew)
+            for key in [key for key in counts if key[1] < epoch - horizon]:
+                del counts[key]
+        for detector in FLEET_DETECTORS:
+            if detector.predicate(record):
+                counts.setdefault((detector.name, epoch), Counter())[host] += 1
+        detect(record, fleet_diag, fleet_results, FLEET_DETECTORS)
+        for detector in FLEET_DETECTORS:
+            events = fleet_results[detector.name][detector.events]
+            for event in events[registered[detector.name]:]:
+                pending.append((event['epoch'] + skew, detector, event))
+            registered[detector.name] = len(events)
+    for _, detector, event in pending:
+        fleet_scope(event, detector, counts, hosts, skew)
+    for host in hosts:
+        operations.extend(analyze_operations(iter_operations((), in_flight[host]), stats[host]))
+    return totals, sample, results, stats, fleet_results
 
-def check_abandon_too_late(line, diag, results):
+def report_replicas(replicas, search_term, since=None, until=None, sample_size=100):
     """
-    Check the ABANDON with targetop=NOTFOUND that occured in
-    the same second.
+    Results of the analysis of the logs of several replicas, (host,
+    directory) pairs, as one timeline (see analyze_replicas): the events of
+    each replica, tagged with their 'host', in 'analysis' and the
+    fleet-wide events in 'fleet'. As with merge_partials, the operations
+    are not kept: only their latency estimated from the t-digests is
+    reported.
     """
-    try:
-        results_abandon_too_late = results["abandon_too_late"]
-    except KeyError:
-        results_abandon_too_late = {
-                'event_abandon_too_late': []}
-        results["abandon_too_late"] = results_abandon_too_late
+    replica_files = []
+    ranges = {}
+    for host, directory in replicas:
+        files = order_log_files(find_log_files(directory))
+        print(f"Found {len(files)} log files for {host} in {directory}")
+        if since or until:
+            ranges.update(plan_time_window_ranges(files, since, until))
+        replica_files.append((host, files))
+    operations = OperationStore(keep=False)
+    totals, sample, results, host_stats, fleet_results = analyze_replicas(
+        replica_files, search_term, ranges, sample_size, operations=operations)
+    analysis = {}
+    stats = {}
+    for host, _ in replicas:
+        attach_long_updates(results[host], host_stats[host])
+        add_host_events(analysis, host, results[host])
+        merge_operation_stats(stats, host_stats[host], continuation=False)
+    sort_events(analysis)
+    analysis['distinct_counts'] = report_distinct_values(stats)
+    fleet = {'replicas': [host for host, _ in replicas], 'skew': FLEET_SKEW,
+             'analysis': fleet_results}
+    unindexed_searches = report_unindexed_searches(stats)
+    connections = report_connections(stats)
+    return {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(),
+            'search_term': search_term,
+            'replicas': dict(replicas),
+            'total_files_searched': sum(len(files) for _, files in replica_files),
+            'total_matches': sum(totals.values()),
+            'matches_by_replica': {host: totals[host] for host, _ in replicas}
+        },
+        'matches': sample,
+        'analysis': analysis,
+        # events of the detectors run on the merged timeline, with the
+        # matching records of each replica
+        'fleet': fleet,
+        'latency': report_latency(operations, stats),
+        'unindexed_searches': unindexed_searches,
+        'heavy_hitters': report_heavy_hitters(stats),
+        'connections': connections,
+        'solutions': (suggest_solutions(analysis) + suggest_indexes(unindexed_searches) +
+                      suggest_connections(connections) + suggest_fleet(fleet))
+    }
 
-    try:
-        abandon_too_late = diag["abandon_too_late"]
-    except KeyError:
-        abandon_too_late = {
-                'severity': 'normal',
-                'count': 0,
-                'timematch': ""}
-        diag["abandon_too_late"] = abandon_too_late
-
-    abandon_too_late_threshold = 10
-    severity_threshold = {
-            'fatal': 100,
-            'critical': 50,
-            'warning': 20}
-    abandon_match = re.search(r'ABANDON targetop=NOTFOUND', line)
-    timestamp_match = re.search(r'^\[(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2})', line)
-    if abandon_match:
-        #pdb.set_trace()
-        if abandon_too_late['timematch'] == "":
-            abandon_too_late['timematch'] = timestamp_match.group(1)
-
-        if timestamp_match.group(1) == abandon_too_late['timematch']:
-            # this record is in the same second than the previous one
-            abandon_too_late['count'] = abandon_too_late['count'] + 1
+# Version of the sidecar time index written next to each log file
+TIME_INDEX_VERSION = 1
+TIME_INDEX_SUFFIX = '.idx'
+# Width, in seconds, of the buckets of the time index
+TIME_INDEX_BUCKET = 60
+# Longest line header holding the time: '[03/Oct/2023:00:43:21.123456789 +0200]'
+LINE_HEADER_SIZE = 40
+TIME_BOUND_RE = re.compile(r'^(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2})(?:\.\d+)? ?([+-]\d{4})?$')
 
-        else:
-            # This record occurred in a next second, reset the count
-            if abandon_too_late['count'] >= abandon_too_late_threshold:
-                #pdb.set_trace()
-                # in case the number of abandon
-                # exceeded the threshold, register it into the results
-                for threshold in ['fatal', 'critical', 'warning']:
-                    if severity_threshold[threshold] and abandon_too_late["count"] >= severity_threshold[threshold]:
-                        abandon_too_late["severity"] = threshold
-                        break
-                new_event = {"count": abandon_too_late["count"],
-                             "timematch": abandon_too_late["timematch"],
-                             "severity": abandon_too_late["severity"]}
-                results_abandon_too_late["event_abandon_too_late"].append(new_event)
-
-            # This record is in a next second, reset the count
-            # and the timematch
-            abandon_too_late['count'] = 1
-            abandon_too_late['timematch'] = timestamp_match.group(1)
+def parse_time_bound(value):
+    """
+    Parse a --since/--until time, written as in the access logs
+    ('03/Oct/2023:00:43:21', optionally followed by '+0200') or in ISO 8601
+    ('2023-10-03 00:43:21', optionally followed by '+02:00').
+    Return its local epoch and timezone offset, the offset being None when
+    the time is in the timezone of the logs.
+    """
+    bound = TIME_BOUND_RE.match(value.strip())
+    if bound is not None:
+        timestamp, tz = bound.groups()
+        epoch = local_epoch(timestamp)
+        if epoch is not None:
+            return epoch, (timezone_offset(tz) if tz else None)
     else:
-        if abandon_too_late['timematch'] == timestamp_match.group(1):
-            # ignore others events in the same second
-            return
+        try:
+            moment = datetime.fromisoformat(value.strip())
+        except ValueError:
+            pass
         else:
-            # This record occurred in a next second, reset the count
-            if abandon_too_late['count'] >= abandon_too_late_threshold:
-                # in case the number of abandon
-                # exceeded the threshold, register it into the results
-                for threshold in ['fatal', 'critical', 'warning']:
-                    if severity_threshold[threshold] and abandon_too_late["count"] >= severity_threshold[threshold]:
-                        abandon_too_late["severity"] = threshold
-                        break
-                new_event = {"count": abandon_too_late["count"],
-                             "timematch": abandon_too_late["timematch"],
-                             "severity": abandon_too_late["severity"]}
-                results_abandon_too_late["event_abandon_too_late"].append(new_event)
-
-            # This record is in a next second, reset the count
-            # and the timematch
-            abandon_too_late['count'] = 0
-            abandon_too_late['timematch'] = ""
-
-def check_server_unresponsive(line, diag, results):
-    """ The goal of this check is to detect that the server
-    is no longer processing new operations. Only new incoming
-    connections are logged by the accept thread.
-    That means all workers were busy, unable to read operations
-    and send results.
-    diag will increased with 'server_unresponsive' record
-    {'server_unresponsive': 
-        {'severity': 'fatal', 
-         'count': 0,
-         'maxcount': 361,
-         'occurence': 2,
-         'occurence_time': ['03/Oct/2023:00:43:21', '03/Oct/2023:00:43:44']
-         }
-     }
-    """
-    unresponsive_threshold = 10
-    severity_threshold = {
-            'fatal': 150,
-            'critical': 75,
-            'warning': 10}
-    try:
-        results_unresponsive = results["server_unresponsive"]
-    except KeyError:
-        results_unresponsive = {
-                'event_unresponsive': []}
-        results["server_unresponsive"] = results_unresponsive
-
-    try:
-        server_unresponsive = diag["server_unresponsive"]
-    except KeyError:
-        server_unresponsive = {
-                'severity': 'normal',
-                'count': 0,
-                'timematch': ""}
-        diag["server_unresponsive"] = server_unresponsive
-
-    incoming_conn_match = re.search(r'connection from', line, re.IGNORECASE)
-    if incoming_conn_match:
-        # This is a new incoming connection
-        server_unresponsive["count"] = server_unresponsive["count"] + 1
-
-        # if we overpass the threshold, count one more occurence
-        if server_unresponsive["count"] == unresponsive_threshold:
-            timestamp_match = re.search(r'^\[(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2})', line)
-            if timestamp_match:
-                server_unresponsive["timematch"] = timestamp_match.group(1)
-    else:
-        # This is the end of consecutive opened connections
-        # in case the number of consecutive opened connections
-        # exceeded the threshold, register it into the results
-        if server_unresponsive["count"] >= unresponsive_threshold:
-            #pdb.set_trace()
-            # set the severity according to the size of consecutive new incoming connections
-            for threshold in ['fatal', 'critical', 'warning']:
-                if severity_threshold[threshold] and server_unresponsive["count"] >= severity_threshold[threshold]:
-                    server_unresponsive["severity"] = threshold
-                    break
-            new_event = {"count": server_unresponsive["count"],
-                         "timematch": server_unresponsive["timematch"],
-                         "severity": server_unresponsive["severity"]}
-            results_unresponsive["event_unresponsive"].append(new_event)
+            offset = moment.utcoffset()
+            epoch = calendar.timegm(moment.replace(tzinfo=None).timetuple())
+            return epoch, (None if offset is None else int(offset.total_seconds()))
+    raise argparse.ArgumentTypeError(f"invalid time '{value}'")
 
-        # only reset the count
-        server_unresponsive["severity"] = "normal"
-        server_unresponsive["count"] = 0
-        server_unresponsive["timematch"] = ""
-        diag["server_unresponsive"] = server_unresponsive
+def header_record(data, pos):
+    """Tokenize the header of the line starting at 'pos' in a block of bytes"""
+    eol = data.find(b'\n', pos, pos + LINE_HEADER_SIZE)
+    header = data[pos:eol if eol >= 0 else pos + LINE_HEADER_SIZE]
+    return tokenize_access_line(header.decode('utf-8', errors='replace'))
 
+def bisect_lines(data, epoch, lo=0):
+    """
+    Return the offset, in a block of whole lines, of the first line at or
+    after 'lo' whose time is at or after 'epoch' (the length of the block if
+    there is none). The lines are assumed to be in time order, as the
+    server writes them; lines without a time go with the ones before them.
+    """
+    hi = len(data)
+    while lo < hi:
+        newline = data.rfind(b'\n', lo, (lo + hi) // 2)
+        line_start = lo if newline < 0 else newline + 1
+        line_epoch = header_record(data, line_start).epoch
+        if line_epoch is None or line_epoch < epoch:
+            line_end = data.find(b'\n', line_start)
+            lo = hi if line_end < 0 else line_end + 1
+        else:
+            hi = line_start
+    return lo
 
-def search_files_for_term(files, search_term, max_matches=1000):
-    """Search files for a specific term"""
-    matches = []
-    for file_path in files:
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                for i, line in enumerate(f):
-                    if search_term.lower() in line.lower():
-                        matches.append({
-                            'file': file_path,
-                            'line_number': i + 1,
-                            'content': line.strip()
-                        })
-                        if len(matches) >= max_matches:
-                            break
-            if len(matches) >= max_matches:
+def extend_time_index(file_path, index, end):
+    """
+    Index the lines of a file from where the time index stopped up to
+    'end': each bucket is the [minute, offset, lines] of the first line of
+    a minute, 'lines' being the number of lines before it. Finding the
+    first line of the next minute is a binary search in the block holding
+    it, so only a few lines per minute are parsed.
+    """
+    buckets = index['buckets']
+    offset = index['offset']
+    lines = index['lines']
+    next_minute = buckets[-1][0] + TIME_INDEX_BUCKET if buckets else 0
+    for block in iter_log_blocks(file_path, offset, end):
+        last_epoch = header_record(block, block.rfind(b'\n', 0, len(block) - 1) + 1).epoch
+        pos = counted = 0
+        while last_epoch is None or last_epoch >= next_minute:
+            pos = bisect_lines(block, next_minute, pos)
+            if pos >= len(block):
                 break
-        except Exception as e:
-            print(f"Error reading file {file_path}: {e}")
-    return matches
+            record = header_record(block, pos)
+            if not buckets:
+                # timezone offset of the logs, for the times given without one
+                index['tz_offset'] = local_epoch(record.timestamp) - record.epoch
+            lines += block.count(b'\n', counted, pos)
+            counted = pos
+            minute = record.epoch - record.epoch % TIME_INDEX_BUCKET
+            buckets.append([minute, offset + pos, lines])
+            next_minute = minute + TIME_INDEX_BUCKET
+        lines += block.count(b'\n', counted)
+        offset += len(block)
+    index['offset'] = offset
+    index['lines'] = lines
 
-
-def parse_log_entry(line, diag, results):
-    """Parse a log line into structured data"""
-    check_server_unresponsive(line, diag, results)
-    check_abandon_too_late(line, diag, results)
-    check_abandon_high_etime(line, diag, results)
-    if re.search(r'conn=488 op=3 BIND', line, re.IGNORECASE):
-        #pdb.set_trace()
+def load_time_index(file_path):
+    """
+    Return the time index of a log file, read from its sidecar file
+    ('<file>.idx'). It is built on first use, extended when the file grew,
+    and rebuilt when the file was replaced.
+    """
+    path = file_path + TIME_INDEX_SUFFIX
+    index = None
+    try:
+        with open(path, 'r') as f:
+            index = json.load(f)
+    except FileNotFoundError:
         pass
-    return
-    log_entry = {'raw': line}
-    
-    #pdb.set_trace()
-    # Extract timestamp
-    timestamp_match = re.search(r'^\[(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2})', line)
-    if timestamp_match:
-        log_entry["timestamp"] = timestamp_match.group(1)
-    
-    # Extract SRCH etime
-    etime_match = re.search(r'RESULT.*tag=101.*etime=(\d).(\d) ', line, re.IGNORECASE)
-    if log_entry:
-        log_entry["etime second"] = etime_match.group(1)
-        log_entry["etime nsec"] = etime_match.group(2)
-    else:
-        log_entry["etime second"] = 0
-        log_entry["etime nsec"] = 0
+    except (OSError, ValueError) as e:
+        print(f"Error reading time index {path}: {e}")
 
-    if log_entry["etime second"] > 10:
-        log_entry["severity"] = "WARNING"
+    compressed = compressed_opener(file_path) is not None
+    end = None if compressed else complete_end(file_path, os.path.getsize(file_path))
+    if (index is None or index.get('version') != TIME_INDEX_VERSION or
+            file_fingerprint(file_path, index['fingerprint_size']) !=
+            (index['fingerprint'], index['fingerprint_size']) or
+            (end is not None and end < index['offset'])):
+        index = {'version': TIME_INDEX_VERSION, 'offset': 0, 'lines': 0,
+                 'complete': False, 'tz_offset': 0, 'buckets': []}
+    elif index['complete'] or end == index['offset']:
+        return index
 
-    # Extract SRCH wtime
-    wtime_match = re.search(r'RESULT.*tag=101.*wtime=(\d).(\d) ', line, re.IGNORECASE)
-    if log_entry:
-        log_entry["wtime second"] = etime_match.group(1)
-        log_entry["wtime nsec"] = etime_match.group(2)
-    else:
-        log_entry["wtime second"] = 0
-        log_entry["wtime nsec"] = 0
+    index['fingerprint'], index['fingerprint_size'] = file_fingerprint(file_path)
+    extend_time_index(file_path, index, end)
+    # a rotated compressed file does not change anymore
+    index['complete'] = compressed
+    try:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error writing time index {path}: {e}")
+    return index
 
-    if log_entry["wtime second"] > 0:
-        log_entry["severity"] = "CRITICAL"
+def seek_time(file_path, index, minutes, epoch):
+    """
+    Return the offset of the first line of a file at or after 'epoch', and
+    the number of lines before it: the time index gives the minute holding
+    it, a binary search in that minute gives the line.
+    """
+    buckets = index['buckets']
+    i = bisect_right(minutes, epoch) - 1
+    if i < 0:
+        return 0, 0
+    _, offset, lines = buckets[i]
+    end = buckets[i + 1][1] if i + 1 < len(buckets) else index['offset']
+    for block in iter_log_blocks(file_path, offset, end):
+        pos = bisect_lines(block, epoch)
+        if pos < len(block):
+            return offset + pos, lines + block.count(b'\n', 0, pos)
+        offset += len(block)
+        lines += block.count(b'\n')
+    return offset, lines
 
-    # Extract consecutive incoming connections
-    incoming_conn_match = re.search(r'connection from', line, re.IGNORECASE)
+def time_window_range(file_path, index, since=None, until=None):
+    """
+    Return the (start, end, line_offset) byte range of a file holding its
+    lines from 'since' (included) to 'until' (excluded), both being
+    parse_time_bound() values or None
+    """
+    # the bucket minutes are in time order, unless the clock went backward
+    minutes = []
+    latest = None
+    for minute, _, _ in index['buckets']:
+        latest = minute if latest is None else max(latest, minute)
+        minutes.append(latest)
 
-    # Extract severity
-    severity_match = re.search(r'\b(ERROR|INFO|WARNING|DEBUG|CRITICAL|WARN|FATAL)\b', line, re.IGNORECASE)
-    if severity_match:
-        log_entry["severity"] = severity_match.group(1).upper()
-    else:
-        log_entry["severity"] = "UNKNOWN"
-    
-    # Extract component and message
-    if timestamp_match:
-        remainder = line[timestamp_match.end():].strip()
-    else:
-        remainder = line
+    def bound_epoch(bound):
+        epoch, tz_offset = bound
+        return epoch - (index['tz_offset'] if tz_offset is None else tz_offset)
 
-    return log_entry
-        
-    if severity_match:
-        component_msg = remainder.replace(severity_match.group(0), "", 1).strip()
-        
-        # Extract component (in brackets or before colon)
-        component_match = re.search(r'^\[([^\]]+)\]|^([^:]+):', component_msg)
-        if component_match:
-            component = component_match.group(1) or component_match.group(2)
-            log_entry["component"] = component.strip()
-            
-            # Message is the rest
-            if component_match.group(1):  # [component] format
-                log_entry["message"] = component_msg[component_match.end():].strip()
-            else:  # component: format
-                log_entry["message"] = component_msg[component_match.end():].strip()
-        else:
-            log_entry["message"] = component_msg
-    else:
-        log_entry["message"] = remainder
-    
-    return log_entry
-
-def analyze_log_entries(entries):
-    """Analyze log entries to extract patterns and insights"""
-    total_entries = len(entries)
-    severities = Counter()
-    components = Counter()
-    errors_by_component = defaultdict(list)
-    timestamps = []
-    diag = {}
-    #server_unresponsive = {}
-    #server_unresponsive["severity"] = "Normal"
-    #server_unresponsive["count"] = 0
-    #server_unresponsive["timematch"] = ""
-    #diag["server_unresponsive"] = server_unresponsive
-    results = {}
-    
-    # Extract data
-    for entry in entries:
-        parsed = parse_log_entry(entry['content'], diag, results)
-        if re.search(r'conn=488 op=3 BIND', entry['content'], re.IGNORECASE):
-            #pdb.set_trace()
-            pass
-        continue
-        severities[parsed.get('severity', 'UNKNOWN')] += 1
-        
-        if 'component' in parsed:
-            components[parsed['component']] += 1
-            if parsed.get('severity') in ['ERROR', 'CRITICAL', 'FATAL']:
-                errors_by_component[parsed['component']].append(parsed.get('message', ''))
-        
-        if 'timestamp' in parsed:
-            timestamps.append(parsed['timestamp'])
-    return results
-    
-    #pdb.set_trace()
-    # Analyze time patterns
-    time_pattern = None
-    if timestamps:
+    start = line_offset = 0
+    end = None
+    if since is not None:
+        start, line_offset = seek_time(file_path, index, minutes, bound_epoch(since))
+    if until is not None:
+        end, _ = seek_time(file_path, index, minutes, bound_epoch(until))
+        end = max(start, end)
+    return start, end, line_offset
+
+def plan_time_window_ranges(files, since=None, until=None):
+    """
+    Compute the (start, end, line_offset) range of each file holding the
+    lines between 'since' and 'until' (see time_window_range), so that only
+    them are read
+    """
+    ranges = {}
+    for file_path in files:
         try:
-            timestamps = sorted(timestamps)
-            time_pattern = {
-                'first_occurrence': timestamps[0],
-                'last_occurrence': timestamps[-1],
-                'total_occurrences': len(timestamps)
-            }
-        except Exception as e:
-            print(f"Error analyzing timestamps: {e}")
-    
-    # Find most common error patterns
-    error_patterns = []
-    for component, errors in errors_by_component.items():
-        for error in errors:
-            # Look for common patterns in errors
-            if error and len(error) > 10:  # Only consider substantial errors
-                pattern = re.sub(r'\b[a-f0-9]{8}(?:-[a-f0-9]{4}){3}-[a-f0-9]{12}\b', '<ID>', error)  # Replace UUIDs
-                pattern = re.sub(r'\d+', '<NUM>', pattern)  # Replace numbers
-                error_patterns.append((component, pattern))
-    
-    common_patterns = Counter(error_patterns).most_common(10)
-    
-    return {
-        'total_entries': total_entries,
-        'severity_distribution': dict(severities),
-        'components': dict(components),
-        'time_pattern': time_pattern,
-        'error_patterns': [{'component': comp, 'pattern': pat, 'count': count} 
-                           for (comp, pat), count in common_patterns]
-    }
+            index = load_time_index(file_path)
+            ranges[file_path] = time_window_range(file_path, index, since, until)
+        except (OSError, EOFError) as e:
+            print(f"Error reading file {file_path}: {e}")
+            ranges[file_path] = (0, 0, 0)
+    return ranges
+
+def event_time(event):
+    """The time of an event, and its host when the events of several hosts are merged"""
+    if 'host' in event:
+        return '%s on %s' % (event['timematch'], event['host'])
+    return event['timematch']
 
 def suggest_solutions(analysis):
     """Suggest solutions based on the analysis"""
-    #pdb.set_trace()
     solutions = []
-    server_unresponsive = analysis["server_unresponsive"]
-    abandon_too_late = analysis["abandon_too_late"]
-    abandon_high_etime = analysis["abandon_high_etime"]
+    server_unresponsive = analysis.get("server_unresponsive", {"event_unresponsive": []})
+    abandon_too_late = analysis.get("abandon_too_late", {"event_abandon_too_late": []})
+    abandon_high_etime = analysis.get("abandon_high_etime", {"event_abandon_high_etime": []})
+    failed_binds = analysis.get("failed_binds", {"event_failed_binds": []})
     for event in server_unresponsive["event_unresponsive"]:
         if str(event["severity"]) == "fatal":
             solutions.append({
-                'problem': 'Around %s the server was completely unresponsive and unable to process new requests.' % event["timematch"],
+                'problem': 'Around %s the server was completely unresponsive and unable to process new requests.' % event_time(event),
                 'solution': 'As an immediate relief you should increase the number of worker threads. If you can correlate the problem with a long update then you can tune some sensitive plugins (memberof, automember, referential integrity) known to impact others threads.',
                 'root cause': 'A reason can be that current requests are long. Other reason can be a specific task (update) that blocked all the others requests',
                 'further investigations': 'Compare the long operations (etime) with similar operations before/after to confirm if they were also long. Check if an update (ADD/DEL/MODRDN/MOD) was started before that event and complete around the same time that the others requests returned their result. Check if the unresponsiveness was transient or if was a kind of fatal deadlock. Need to collect `top -H` and periodic `pstack`'
@@ -447,18 +2523,18 @@ def suggest_solutions(analysis):
         else:
             if event["severity"] == "critical":
                 solutions.append({
-                    'problem': 'Around %s the server was transiantly unresponsive and unable to process new requests.' % event["timematch"],
+                    'problem': 'Around %s the server was transiantly unresponsive and unable to process new requests.' % event_time(event),
                     'solution': 'As an immediate relief you should increase the number of worker threads.',
                     'root cause': 'A reason can be that current requests are long. Other reason can be a specific update was impacting others requests',
-                    'further investigations': 'Check the update operations started just before %s, if one of them was a bit long (using `etime`).' % event["timematch"]
+                    'further investigations': 'Check the update operations started just before %s, if one of them was a bit long (using `etime`).' % event_time(event)
                 })
             else:
                 if event["severity"] == "warning":
                     solutions.append({
-                        'problem': 'Around %s the server was possibly unresponsive for a short period of time.' % event["timematch"],
+                        'problem': 'Around %s the server was possibly unresponsive for a short period of time.' % event_time(event),
                         'solution': 'As an immediate relief you should increase the number of worker threads.',
                         'root cause': 'A reason can be that current requests are long. Other reason can be a specific update was impacting others requests',
-                        'further investigations': 'Check the update operations started just before %s, if one of them was a bit long (using `etime`).' % event["timematch"]
+                        'further investigations': 'Check the update operations started just before %s, if one of them was a bit long (using `etime`).' % event_time(event)
                     })
     for event in abandon_too_late["event_abandon_too_late"]:
         global_desc = {
@@ -467,13 +2543,13 @@ def suggest_solutions(analysis):
                 'further investigations': 'Compare the long operations (etime) with similar operations before/after to confirm if they were also long. Check if an update (ADD/DEL/MODRDN/MOD) was started before that event and complete around the same time that the others requests returned their result. Check if the unresponsiveness was transient or if was a kind of fatal deadlock. Need to collect `top -H` and periodic `pstack`. Check, with cn=monitor, if there was a spike of connections hitting the maximum threads per connection (default is 5). Check if the abandonned operations (likely the ones before abandonned) was waiting for long in the waiting queue (wtime) or were slow to proceed (etime).'
                 }
         if str(event["severity"]) == "fatal":
-            global_desc['problem'] = 'Around %s clients massively abandonned requests that were already processed.' % event["timematch"]
+            global_desc['problem'] = 'Around %s clients massively abandonned requests that were already processed.' % event_time(event)
         else:
             if event["severity"] == "critical":
-                global_desc['problem'] = 'Around %s several clients abandonned requests that were already processed.' % event["timematch"]
+                global_desc['problem'] = 'Around %s several clients abandonned requests that were already processed.' % event_time(event)
             else:
                 if event["severity"] == "warning":
-                    global_desc['problem'] = 'Around %s few clients abandonned requests that were already processed.' % event["timematch"]
+                    global_desc['problem'] = 'Around %s few clients abandonned requests that were already processed.' % event_time(event)
         solutions.append(global_desc)
 
     for event in abandon_high_etime["event_abandon_high_etime"]:
@@ -483,99 +2559,500 @@ def suggest_solutions(analysis):
                 'further investigations': 'Check if an update (ADD/DEL/MODRDN/MOD) was started before that event and could impact others request like holding the same backend. Check if the unresponsiveness was transient or if was a kind of fatal deadlock. Need to collect `top -H` and periodic `pstack`. Check if the abandonned operations (likely the ones before abandonned) was waiting for long in the waiting queue (wtime) or were slow to proceed (etime).'
                 }
         if str(event["severity"]) == "fatal":
-            global_desc['problem'] = 'Around %s clients massively abandonned requests that were running for long time.' % event["timematch"]
+            global_desc['problem'] = 'Around %s clients massively abandonned requests that were running for long time.' % event_time(event)
         else:
             if event["severity"] == "critical":
-                global_desc['problem'] = 'Around %s several clients abandonned requests that were running for long time.' % event["timematch"]
+                global_desc['problem'] = 'Around %s several clients abandonned requests that were running for long time.' % event_time(event)
             else:
                 if event["severity"] == "warning":
-                    global_desc['problem'] = 'Around %s few clients abandonned requests that were running for long time.' % event["timematch"]
+                    global_desc['problem'] = 'Around %s few clients abandonned requests that were running for long time.' % event_time(event)
         solutions.append(global_desc)
 
-    return solutions
-    for event in server_unresponsive["event_unresponsive"]:
+    for event in failed_binds["event_failed_binds"]:
+        global_desc = {
+                'solution': 'If the binds come from a few client IPs or target a few bind DNs, block these clients or lock these accounts (password policy with account lockout). If they come from an application, update its credentials.',
+                'root cause': 'A client guessing the passwords of the accounts, or an application retrying with an expired or changed password.',
+                'further investigations': 'Check the client IPs and bind DNs of the event (`top`). Check whether the binds of these DNs also succeeded from the same clients, and whether the password policy locked the accounts.'
+                }
         if str(event["severity"]) == "fatal":
-            solutions.append({
-                'problem': 'Server completely unresponsive: The servers is no longer able to process new requests.',
-                'when': event['timematch'],
-                'explanations': ['A reason can be that current requests are long',
-                                 'A reason can be a specific task (update) that blocked all the others requests',
-                                 ],
-                'solutions': ['As an immediate relief you should increase the number of worker threads',
-                              'If correlated to long update, you may tune some sensitive plugins (memberof, automember, referential integrity)'
-                              ],
-                'further investigations': ['Compare the long operations (etime) with similar operations before/after to confirm if they were also long',
-                                           'Check if an update (ADD/DEL/MODRDN/MOD) was started before that event and complete around the same time that the others requests returned their result',
-                                           'Check if the unresponsiveness was transient or if was a kind of fatal deadlock',
-                                           'Need to collect `top -H` and periodic `pstack`',
-                                           ],
-                })
+            global_desc['problem'] = 'Around %s clients massively failed to bind with invalid credentials (%d in %d seconds).' % (event_time(event), event["count"], FAILED_BINDS_SECONDS)
+        elif event["severity"] == "critical":
+            global_desc['problem'] = 'Around %s many binds failed with invalid credentials (%d in %d seconds).' % (event_time(event), event["count"], FAILED_BINDS_SECONDS)
+        else:
+            global_desc['problem'] = 'Around %s some binds failed with invalid credentials (%d in %d seconds).' % (event_time(event), event["count"], FAILED_BINDS_SECONDS)
+        solutions.append(global_desc)
 
     return solutions
-    
-    # Check for connection issues
-    connection_errors = any('connection' in pattern.lower() or 'timeout' in pattern.lower() or 'connect' in pattern.lower() 
-                          for item in analysis.get('error_patterns', []) 
-                          for pattern in [item['pattern'].lower()])
-    
-    if connection_errors:
-        solutions.append({
-            'problem': 'Connection issues',
-            'solution': 'Check network connectivity between services and verify that all dependent services are running. Look for firewall or DNS issues.'
-        })
-    
-    # Check for permission issues
-    permission_errors = any('permission' in pattern.lower() or 'access' in pattern.lower() or 'denied' in pattern.lower() 
-                          for item in analysis.get('error_patterns', []) 
-                          for pattern in [item['pattern'].lower()])
-    
-    if permission_errors:
-        solutions.append({
-            'problem': 'Permission issues',
-            'solution': 'Verify file and resource permissions. Check that service accounts have the necessary access rights.'
-        })
-    
-    # Check for resource issues
-    resource_errors = any('memory' in pattern.lower() or 'cpu' in pattern.lower() or 'capacity' in pattern.lower() or 'full' in pattern.lower()
-                        for item in analysis.get('error_patterns', []) 
-                        for pattern in [item['pattern'].lower()])
-    
-    if resource_errors:
+
+def suggest_indexes(unindexed_searches):
+    """Suggest the indexes to add from the ranking of the unindexed searches"""
+    solutions = []
+    for search in unindexed_searches.get('top_by_etime', []):
+        attributes = sorted(set(attribute.strip().lower() for attribute, _, _ in
+                                FILTER_ITEM_RE.findall(search['fingerprint'])))
         solutions.append({
-            'problem': 'Resource constraints',
-            'solution': 'Check system resources (memory, CPU, disk space). Consider scaling up infrastructure or optimizing resource usage.'
+            'problem': '%d searches with the filter %s (notes=%s) were not fully indexed, they took %.1f seconds in total.' % (
+                search['count'], search['fingerprint'], ','.join(search['notes']), search['etime']),
+            'solution': 'Index the attributes of the filter (%s) with the index types matching its components (eq, sub, pres), or make the clients use a more selective filter. A paged search (notes=P) on an unindexed filter is still evaluated against the whole candidate list.' % ', '.join(attributes),
+            'root cause': 'Unindexed searches evaluate the filter on every entry of the candidate list, they consume a worker thread and CPU for a long time.',
+            'further investigations': 'Check the indexes of the backend of %s and the nsslapd-idlistscanlimit. Check which clients send this filter (conn=).' % search['base'],
         })
+    return solutions
+
+# Default number of worker threads (nsslapd-threadnumber) of the server
+THREAD_NUMBER = 30
+# Number of saturation intervals described in the suggested solution
+SATURATION_TOP = 5
+
+def format_epoch(epoch):
+    """Format a UTC epoch like the timestamps of the access logs"""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%d/%b/%Y:%H:%M:%S.%f +0000')
+
+def suggest_threads(saturation, top=SATURATION_TOP):
+    """Describe when all the worker threads were busy, from the saturation timeline"""
+    intervals = saturation['intervals']
+    if not intervals:
+        return []
+    longest = sorted(intervals, key=lambda interval: interval['duration'], reverse=True)[:top]
+    return [{
+        'problem': 'All the %d worker threads were busy during %d intervals, %.3f seconds in total, with up to %d operations processed at once.' % (
+            saturation['threads'], len(intervals), saturation['busy_seconds'], saturation['max_busy']),
+        'solution': 'Increase nsslapd-threadnumber to at least %d if the CPUs are not saturated at those times, otherwise reduce the cost of the operations running then (unindexed searches, updates triggering plugins).' % saturation['max_busy'],
+        'root cause': 'The operations queued waiting for a worker thread (wtime) while the workers were busy. Longest intervals: %s.' % '; '.join(
+            'from %s for %.3fs (%d operations)' % (format_epoch(interval['start']), interval['duration'], interval['peak'])
+            for interval in longest),
+        'further investigations': 'Check that %d is the nsslapd-threadnumber of the server (--threadnumber). Look at the operations running during those intervals (etime, optime) and at the wtime of the operations that followed them.' % saturation['threads'],
+    }]
+
+def suggest_connections(connections):
+    """Describe the clients opening a connection per operation"""
+    churning = connections['churning_clients']
+    if not churning:
+        return []
+    return [{
+        'problem': '%d clients open a new connection for almost every operation (%d connections in total).' % (
+            len(churning), sum(client['connections'] for client in churning)),
+        'solution': 'Configure these clients to reuse their connections (connection pooling, persistent connections) instead of connecting, binding and unbinding for each operation.',
+        'root cause': 'Opening, binding and closing a connection costs more to the server than the operation itself (accept, TLS handshake, BIND). Clients: %s.' % '; '.join(
+            '%s (%d connections, %.2f operations per connection)' % (
+                client['client_ip'], client['connections'], client['ops_per_connection'])
+            for client in churning[:CONNECTION_CLIENTS_TOP]),
+        'further investigations': 'Check the close reasons of their connections (U1: unbind, B1: closed by the client, T1: idle timeout) and the connection rate of these clients over time.',
+    }]
+
+# Number of fleet-wide events whose time is given in the suggested solutions
+FLEET_EVENTS_TOP = 5
+
+def suggest_fleet(fleet):
+    """
+    Tell whether the bursts detected on the merged timeline of the replicas
+    hit all of them at once, a cause outside the servers, or a single one
+    """
+    solutions = []
+    replicas = fleet['replicas']
+    if len(replicas) < 2:
+        return solutions
+    for detector in FLEET_DETECTORS:
+        events = fleet['analysis'].get(detector.name, {}).get(detector.events, [])
+        everywhere = [event for event in events if event['scope'] == 'fleet']
+        single = Counter(host for event in events if event['scope'] == 'replica'
+                         for host, count in event['replicas'].items() if count)
+        if everywhere:
+            solutions.append({
+                'problem': '%d bursts of %s hit all the %d replicas at once.' % (
+                    len(everywhere), detector.label, len(replicas)),
+                'solution': 'Look for the cause outside the servers, in what the replicas share: the clients, the load balancer in front of them, the network.',
+                'root cause': 'A burst seen by every replica within %d second(s) does not come from one server: clients timing out or retrying all together, a load balancer failover or health check. Bursts at %s.' % (
+                    fleet['skew'], '; '.join(format_epoch(event['epoch']) for event in everywhere[:FLEET_EVENTS_TOP])),
+                'further investigations': 'Compare the client IPs of the events of each replica at these times (top of the events), and the timeouts of these clients and of the load balancer.',
+            })
+        if single:
+            solutions.append({
+                'problem': '%d bursts of %s hit a single replica: %s.' % (
+                    sum(single.values()), detector.label,
+                    ', '.join('%s (%d)' % (host, count) for host, count in single.most_common())),
+                'solution': 'Look at these replicas rather than at the clients: the other replicas served the same clients without the bursts.',
+                'root cause': 'A burst on a single replica comes from that server: worker threads busy with long operations (unindexed searches, updates), backend lock contention, disk or CPU saturation.',
+                'further investigations': 'Check the saturation, the long updates and the unindexed searches of these replicas at the times of their events (analyze their logs alone with --since and --until).',
+            })
+    return solutions
+
+def logs_tz_offset(matches):
+    """Timezone offset, in seconds, of the first matches having a timestamp, or None"""
+    for match in matches:
+        record = tokenize_access_line(match['content'])
+        if record.epoch is not None:
+            return local_epoch(record.timestamp) - record.epoch
+    return None
+
+def write_store(path, operations, operation_stats, results, matches, incremental=False):
+    """
+    Write the connections, the operations and the detector events of an
+    analysis into the AnalysisStore database at 'path'. The previous
+    analysis is replaced, unless the analysis is 'incremental': its rows
+    are then added to the ones of the previous runs.
+    """
+    store = AnalysisStore(path)
+    try:
+        if not incremental:
+            store.clear()
+        tz_offset = logs_tz_offset(matches)
+        if tz_offset is not None:
+            store.set_metadata('tz_offset', tz_offset)
+        # the operations take the client IP of their connection
+        if 'connections' in operation_stats:
+            store.add_connections(operation_stats['connections'], incremental)
+        if operations.keep:
+            store.add_operations(operations)
+        else:
+            print("The operations are not stored with --digests-only")
+        for detector in DETECTORS:
+            store.add_events(detector.name, results.get(detector.name, {}).get(detector.events, []))
+    finally:
+        store.close()
+
+def query_store(args):
+    """Run the --query of the command line on its --store database"""
+    store = AnalysisStore(args.store)
+    try:
+        since = store.utc_epoch(*args.since) if args.since else None
+        until = store.utc_epoch(*args.until) if args.until else None
+        if args.query == 'operations':
+            rows = store.operations(client_ip=args.client_ip, verb=args.verb and args.verb.upper(),
+                                    conn=args.conn, min_etime=args.min_etime,
+                                    since=since, until=until, limit=args.limit)
+        elif args.query == 'connections':
+            rows = store.connections(client_ip=args.client_ip, conn=args.conn,
+                                     since=since, until=until, limit=args.limit)
+        else:
+            rows = store.events(since=since, until=until, limit=args.limit)
+    finally:
+        store.close()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+        print(f"{len(rows)} {args.query} written to {args.output}")
+    else:
+        for row in rows:
+            print(json.dumps(row))
+
+class NdjsonWriter:
+    """
+    Writer of the --output-format ndjson results: one JSON object per line,
+    whose 'type' tells what it holds, flushed as soon as it is written so
+    that the results can be consumed while the analysis is running. The
+    events are written as the detectors register them, the aggregates and
+    the solutions once the analysis is complete.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        # number of events of each detector when the analysis started, and
+        # written so far
+        self.first = {}
+        self.written = {}
+
+    def write(self, kind, **fields):
+        """Write a line of the given type"""
+        self.stream.write(json.dumps(dict(type=kind, **fields)) + '\n')
+        self.stream.flush()
+
+    def start(self, results):
+        """Only write the events registered from now on (see --incremental)"""
+        self.first = {detector.name: len(results.get(detector.name, {}).get(detector.events, []))
+                      for detector in DETECTORS}
+        self.written = dict(self.first)
+
+    def write_new_events(self, results):
+        """
+        Write the events registered since the previous call, with their
+        'index' in the list of the events of their detector
+        """
+        for detector in DETECTORS:
+            events = results.get(detector.name, {}).get(detector.events, [])
+            for index in range(self.written.get(detector.name, 0), len(events)):
+                self.write('event', detector=detector.name, index=index, event=events[index])
+            self.written[detector.name] = len(events)
+
+    def write_event_updates(self, analysis):
+        """Write the long updates attached to the events once written (see attach_long_updates)"""
+        for detector in DETECTORS:
+            first = self.first.get(detector.name, 0)
+            for i, event in enumerate(analysis.get(detector.name, {}).get(detector.events, [])):
+                if 'updates' in event:
+                    self.write('event_updates', detector=detector.name, index=first + i,
+                               updates=event['updates'])
+
+    def write_aggregates(self, results):
+        """Write the sample matches and the aggregates, the time series one row per line"""
+        for match in results['matches']:
+            self.write('match', **match)
+        latency = results['latency']
+        self.write('operations', count=latency['operations'])
+        for name in ('etime_by_verb_minute', 'wtime_by_second', 'digests_by_verb_minute'):
+            for row in latency.get(name, ()):
+                self.write(name, **row)
+        for row in results['analysis'].get('distinct_counts', []):
+            self.write('distinct_counts', **row)
+        for name in ('unindexed_searches', 'heavy_hitters', 'saturation', 'connections'):
+            self.write(name, **{name: results[name]})
+
+    def write_fleet(self, results):
+        """
+        Write the events of the replicas, the fleet-wide events ('fleet_event')
+        and the sample matches of a --replica analysis
+        """
+        self.write_new_events(results['analysis'])
+        for detector in FLEET_DETECTORS:
+            events = results['fleet']['analysis'].get(detector.name, {}).get(detector.events, [])
+            for index, event in enumerate(events):
+                self.write('fleet_event', detector=detector.name, index=index, event=event)
+        for match in results['matches']:
+            self.write('match', **match)
+
+    def write_solutions(self, results):
+        """Write the solutions, then the metadata closing the results"""
+        for solution in results['solutions']:
+            self.write('solution', solution=solution)
+        self.write('metadata', metadata=results['metadata'],
+                   **{key: results[key] for key in results
+                      if key.startswith('ai_') or key == 'ollama_model_used'})
+
+def write_events_while(matches, writer, results):
+    """
+    Pass the matches through, writing the events the detectors registered
+    on a match of 'results' as soon as the next match is read: only the
+    number of events is compared for each match
+    """
+    lists = None
+    registered = 0
+    for match in matches:
+        yield match
+        if lists is None:
+            # the analysis set up the event lists before reading the first match
+            lists = [results[detector.name][detector.events] for detector in DETECTORS]
+            registered = sum(map(len, lists))
+            writer.write_new_events(results)
+            continue
+        count = sum(map(len, lists))
+        if count != registered:
+            registered = count
+            writer.write_new_events(results)
+
+# Delay between two polls of a followed log file
+FOLLOW_POLL_INTERVAL = 0.2
+# Idle time after which the events pending in a followed log are flushed
+FOLLOW_FLUSH_DELAY = 1.0
+# Record closing the detection windows when a followed log is idle: its
+# timestamp differs from any second and it matches no detector
+TICK_RECORD = AccessRecord('tick', -1, None, None, 'TICK', None, None, None,
+                           None, None, None, None, '', None)
+# Detectors whose window the tick closes: the seconds. A run of consecutive
+# lines ('lines' window) is left open, an idle log not ending it, and is
+# reported in progress (see report_events).
+TICK_DETECTORS = [detector for detector in DETECTORS if detector.window == 'second']
+
+def follow_log_file(file_path, search_term, on_events, poll_interval=FOLLOW_POLL_INTERVAL,
+                    flush_delay=FOLLOW_FLUSH_DELAY):
+    """
+    Follow a log file like 'tail -F': run the detectors on the lines
+    appended to it and call on_events(events, diag) with the events they
+    register. The file is reopened when it is rotated and read again from
+    its start when it is truncated. When no line was appended for
+    'flush_delay' seconds, the pending windows of the seconds are closed so
+    that their events are reported without waiting for the next line.
+    """
+    search_term = search_term.lower()
+    diag, results = init_detectors({}, {})
+    f = open(file_path, 'rb')
+    f.seek(0, os.SEEK_END)
+    pending = b''
+    last_activity = time.monotonic()
+    flushed = True
+    try:
+        while True:
+            data = f.read()
+            if data:
+                data = pending + data
+                cut = data.rfind(b'\n') + 1
+                pending = data[cut:]
+                if cut:
+                    before = count_events(results)
+                    for line in data[:cut].decode('utf-8', errors='replace').split('\n')[:-1]:
+                        if search_term in line.lower():
+                            detect(tokenize_access_line(line.strip()), diag, results)
+                    on_events(new_events(results, before), diag)
+                    last_activity = time.monotonic()
+                    flushed = False
+                continue
+
+            if not flushed and time.monotonic() - last_activity >= flush_delay:
+                before = count_events(results)
+                detect(TICK_RECORD, diag, results, TICK_DETECTORS)
+                on_events(new_events(results, before), diag)
+                flushed = True
+
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                # being rotated, the new file is not created yet
+                stat = None
+            if stat is not None and stat.st_ino != os.fstat(f.fileno()).st_ino:
+                # rotated: the old file was read up to its end, switch to the new one
+                f.close()
+                f = open(file_path, 'rb')
+                pending = b''
+                continue
+            if stat is not None and stat.st_size < f.tell():
+                # truncated
+                f.seek(0)
+                pending = b''
+                continue
+            time.sleep(poll_interval)
+    finally:
+        f.close()
+
+def report_events(events, diag, reported):
+    """
+    Print the events detected while following a log, as they come.
+    'reported' remembers the windows already reported as in progress.
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for solution in suggest_solutions(events):
+        if 'problem' in solution:
+            print(f"[{now}] {solution['problem']}")
+    for name, result in events.items():
+        for key, new in result.items():
+            for event in new:
+                print(f"[{now}] {name}: {event['severity']} event at {event['timematch']} (count={event['count']})")
+    for detector in DETECTORS:
+        state = diag.get(detector.name, {})
+        if detector.window == 'second' or state.get("count", 0) < detector.threshold or \
+                reported.get(detector.name) == state["timematch"]:
+            continue
+        # the event is only registered once the window closes, report it
+        # as soon as it is detectable
+        reported[detector.name] = state["timematch"]
+        print(f"[{now}] {detector.name}: in progress since {state['timematch']} "
+              f"({state['count']} {detector.label})")
+    sys.stdout.flush()
+
+def enhance_results(results):
+    """Use AI to enhance the solutions of the results if possible"""
+    ai_status = is_ai_enhancement_enabled()
+    if ai_status:
+        try:
+            print("Enhancing solutions with AI...")
+            results = enhance_solutions(results)
+        except Exception as e:
+            print(f"Error enhancing solutions: {e}")
+            results["ai_enhancement_used"] = False
+            results["ai_error"] = str(e)
+    else:
+        results["ai_enhancement_used"] = False
+    return results
+
+def write_results(results, args, writer=None):
+    """Output the results: as NDJSON, to the --output JSON file or as a summary on the console"""
+    if writer is not None:
+        writer.write_solutions(results)
+        if args.output:
+            writer.stream.close()
+            print(f"Results written to {args.output}")
+    elif args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print_summary(results, args.solution_len)
+
+def print_summary(results, solution_len):
+    """Print the solutions of the results, their first 'solution_len' lines"""
+    # Print summary to console
+    print("\n--- Analysis Summary ---")
     
-    # Database issues
-    db_errors = any('database' in pattern.lower() or 'db' in pattern.lower() or 'sql' in pattern.lower() or 'query' in pattern.lower()
-                   for item in analysis.get('error_patterns', []) 
-                   for pattern in [item['pattern'].lower()])
+    analysis = results['analysis']
+    if 'severity_distribution' in analysis:
+        print("\nSeverity distribution:")
+        for severity, count in analysis['severity_distribution'].items():
+            print(f"  - {severity}: {count}")
     
-    if db_errors:
-        solutions.append({
-            'problem': 'Database issues',
-            'solution': 'Check database connectivity, query performance, and database logs. Verify that database indices are properly set up.'
-        })
+    # Get the solutions from the results dictionary AFTER AI enhancement
+    ai_enhanced_solutions = results.get('solutions', [])
     
-    # General solution if nothing specific found
-    if not solutions:
-        if analysis.get('total_entries', 0) > 0:
-            # Find component with the most errors
-            severity_dist = analysis.get('severity_distribution', {})
-            error_count = severity_dist.get('ERROR', 0) + severity_dist.get('CRITICAL', 0) + severity_dist.get('FATAL', 0)
+    if ai_enhanced_solutions:
+        print("\nSuggested solutions:")
+        
+        # Debug output for solutions
+        if os.getenv("DEBUG") == "1":
+            print(f"\nDEBUG: Total solutions: {len(ai_enhanced_solutions)}")
+            for i, solution in enumerate(ai_enhanced_solutions):
+                print(f"DEBUG: Solution {i+1} keys: {list(solution.keys())}")
+                print(f"DEBUG: Is AI enhanced? {solution.get('ai_enhanced', False)}")
+        
+        for i, solution in enumerate(ai_enhanced_solutions, 1):
+            problem = solution.get('problem', 'Unknown issue')
             
-            components = analysis.get('components', {})
-            most_common_component = max(components.items(), key=lambda x: x[1])[0] if components else 'unknown'
+            # Determine which solution text to display - prefer AI enhanced if available
+            if solution.get('ai_enhanced', False):
+                solution_text = solution.get('solution', '')
+            else:
+                solution_text = solution.get('solution', '')
+                if os.getenv("DEBUG") == "1":
+                    print(f"DEBUG: Using original solution for {problem} - AI enhancement not available")
+                    print(f"  {i}. {problem}")
             
-            solutions.append({
-                'problem': f'Multiple errors in {most_common_component} component',
-                'solution': f'Review the {most_common_component} component logs in detail and check recent code changes or configuration updates to this component.'
-            })
+            # Debug the content of the solution
+            if os.getenv("DEBUG") == "1":
+                print(f"DEBUG: Solution {i} content length: {len(solution_text)}")
+                print(f"DEBUG: Solution {i} first 50 chars: {solution_text[:50]}...")
+            
+            # Only display the first 3-4 lines of the enhanced solution to keep it concise
+            # Split by newlines and filter out empty lines
+            solution_lines = [line for line in solution_text.split('\n') if line.strip()]
+            if (solution_len):
+                solution_len = int(solution_len)
+            else:
+                solution_len = 10
+            if len(solution_lines) > solution_len:
+                # Display first 10 lines if the solution is very long
+                display_solution = '\n     '.join(solution_lines[:solution_len]) + '\n     ...'
+            else:
+                display_solution = '\n     '.join(solution_lines)
+            
+            if solution.get('ai_enhanced', False):
+                print(f"     {display_solution}")
+            else:
+                print(f"\n     {display_solution}")
+            
+            root_cause = solution.get('root cause', '')
+            if not solution.get('ai_enhanced', False):
+                print(f"\n     Root Cause: {root_cause}")
+
+            further_investigations = solution.get('further investigations', '')
+            if not solution.get('ai_enhanced', False):
+                print(f"\n     Further Investigations: {further_investigations}")
+            
+            # Add a line break for readability
+            if i < len(ai_enhanced_solutions):
+                print("\n\n")
     
-    return solutions
+    if results.get("ai_enhancement_used", False):
+        model_name = results.get("ollama_model_used", os.getenv("OLLAMA_MODEL", "default"))
+        print(f"\n✨ Solutions were enhanced using Ollama model: {model_name}")
+    elif results.get("ai_error"):
+        print(f"\n⚠️ AI enhancement failed: {results.get('ai_error')}")
+        if os.getenv("DEBUG") == "1":
+            print(f"Detailed error: {results.get('ai_error')}")
+    else:
+        print("\n⚠️ AI enhancement was not used")
 
 def main():
-    parser = argparse.ArgumentParser(description="Log Analysis with AI assistance")
+    if len(sys.argv) > 1 and sys.argv[1] == 'merge':
+        merge_main(sys.argv[2:])
+        return
+    parser = argparse.ArgumentParser(description="Log Analysis with AI assistance",
+                                     epilog="'analyze_logs.py merge PARTIAL...' merges the --partial results")
     parser.add_argument("--logs", type=str, default="./data/logs", help="Directory containing log files")
     parser.add_argument("--term", type=str, default="error", help="Search term for logs")
     parser.add_argument("--output", type=str, help="Output file for results (JSON)")
@@ -583,7 +3060,79 @@ def main():
     parser.add_argument("--verbose", action="store_true", help="Enable verbose output")
     parser.add_argument("--disable-ai", action="store_true", help="Disable AI enhancement")
     parser.add_argument("--debug", action="store_true", help="Enable debug output")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of processes scanning the log files")
+    parser.add_argument("--follow", action="store_true",
+                        help="Follow the active log file, like 'tail -F', reporting the events as they are detected")
+    parser.add_argument("--incremental", type=str, metavar="STATE_FILE",
+                        help="Only analyze what was appended since the previous run recorded in STATE_FILE")
+    parser.add_argument("--since", type=parse_time_bound, metavar="TIME",
+                        help="Only analyze the lines logged at or after TIME ('03/Oct/2023:00:43:21' or "
+                             "'2023-10-03 00:43:21', in the timezone of the logs unless followed by one)")
+    parser.add_argument("--until", type=parse_time_bound, metavar="TIME",
+                        help="Only analyze the lines logged before TIME")
+    parser.add_argument("--digests-only", action="store_true",
+                        help="Do not keep the operations in memory, for very large runs: their latency "
+                             "percentiles are only estimated from t-digests and the saturation is not computed")
+    parser.add_argument("--threadnumber", type=int, default=THREAD_NUMBER,
+                        help="Number of worker threads (nsslapd-threadnumber) of the server, "
+                             "to detect when they were all busy")
+    parser.add_argument("--parse-cache", metavar="DIR",
+                        help="Cache the parsed rotated log files in DIR, to re-analyze them "
+                             "without parsing their text again")
+    parser.add_argument("--parse-cache-budget", type=int, default=CACHE_BUDGET // (1024 * 1024),
+                        metavar="MB",
+                        help="Disk space of the parse cache, the least recently used files "
+                             "being evicted beyond it (default: %(default)s)")
+    parser.add_argument("--store", metavar="DB",
+                        help="Write the operations, connections and events into the SQLite database DB "
+                             "(added to the previous runs with --incremental)")
+    parser.add_argument("--query", choices=('operations', 'connections', 'events'),
+                        help="Query the --store database instead of analyzing the logs, with the "
+                             "--client-ip, --verb, --conn, --min-etime, --since and --until criteria")
+    parser.add_argument("--client-ip", help="Only query the operations or connections of this client IP")
+    parser.add_argument("--verb", help="Only query the operations of this verb (SRCH, MOD...)")
+    parser.add_argument("--conn", type=int, help="Only query the operations or connections of this connection")
+    parser.add_argument("--min-etime", type=float, metavar="SECONDS",
+                        help="Only query the operations lasting at least SECONDS")
+    parser.add_argument("--limit", type=int, default=QUERY_LIMIT,
+                        help="Maximum number of rows returned by --query (default: %(default)s)")
+    parser.add_argument("--output-format", choices=('json', 'ndjson'), default='json',
+                        help="Format of the results: one JSON document written at the end, or one JSON "
+                             "object per line (events, aggregates, solutions) written as soon as it is "
+                             "final, to --output or else to stdout (default: %(default)s)")
+    parser.add_argument("--partial", metavar="FILE",
+                        help="Also write the partial result of this host and time range (--since, --until) "
+                             "to FILE, to be merged with the ones of other hosts and ranges by "
+                             "'analyze_logs.py merge'")
+    parser.add_argument("--host", default=socket.gethostname(),
+                        help="Name of the server of the logs in the --partial result (default: %(default)s)")
+    parser.add_argument("--replica", type=parse_replica, action="append", metavar="[NAME=]DIR",
+                        help="Log directory of a replica, repeated for each replica: their logs are merged "
+                             "into one timeline, the detectors running per replica and fleet-wide")
     args = parser.parse_args()
+    if args.query:
+        if not args.store:
+            parser.error("--query requires --store")
+        query_store(args)
+        return
+    if (args.since or args.until) and (args.incremental or args.follow):
+        parser.error("--since and --until can not be used with --incremental or --follow")
+    if args.partial and (args.incremental or args.follow):
+        parser.error("--partial can not be used with --incremental or --follow")
+    if args.replica:
+        if args.jobs > 1 or args.incremental or args.follow or args.partial or args.store:
+            parser.error("--replica can not be used with --jobs, --incremental, --follow, --partial or --store")
+        names = [name for name, _ in args.replica]
+        if len(set(names)) < len(names):
+            parser.error("the names of the replicas must be unique, give them with --replica NAME=DIR")
+    writer = None
+    if args.output_format == 'ndjson':
+        if args.output:
+            writer = NdjsonWriter(open(args.output, 'w'))
+        else:
+            writer = NdjsonWriter(sys.stdout)
+            # stdout carries the results: the progress messages go to stderr
+            sys.stdout = sys.stderr
     
     # Set environment variable to control AI usage
     if args.disable_ai:
@@ -597,6 +3146,19 @@ def main():
         os.environ["DEBUG"] = "1"
         print("\n🐞 Debug mode is ENABLED\n")
     
+    if args.replica:
+        for name, directory in args.replica:
+            if not os.path.exists(directory):
+                print(f"Error: Log directory '{directory}' of replica {name} does not exist")
+                sys.exit(1)
+        print(f"Merging the logs of {len(args.replica)} replicas for term '{args.term}'...")
+        results = report_replicas(args.replica, args.term, args.since, args.until)
+        print(f"Found {results['metadata']['total_matches']} matches for term '{args.term}'")
+        if writer is not None:
+            writer.write_fleet(results)
+        write_results(enhance_results(results), args, writer)
+        return
+
     # Verify log directory exists
     if not os.path.exists(args.logs):
         print(f"Error: Log directory '{args.logs}' does not exist")
@@ -605,8 +3167,26 @@ def main():
     print(f"Searching in {args.logs} for term '{args.term}'...")
     
     # Find log files
-    log_files = find_log_files(args.logs)
+    log_files = order_log_files(find_log_files(args.logs))
     print(f"Found {len(log_files)} log files")
+
+    if args.follow:
+        if os.path.isfile(args.logs):
+            active_log = args.logs
+        else:
+            active_logs = [file for file in log_files if compressed_opener(file) is None]
+            if not active_logs:
+                print(f"Error: no log file to follow in '{args.logs}'")
+                sys.exit(1)
+            active_log = active_logs[-1]
+        print(f"Following {active_log} (Ctrl-C to stop)...")
+        reported = {}
+        try:
+            follow_log_file(active_log, args.term,
+                            lambda events, diag: report_events(events, diag, reported))
+        except KeyboardInterrupt:
+            pass
+        return
     
     if args.verbose:
         print("Log files found:")
@@ -615,22 +3195,125 @@ def main():
         if len(log_files) > 10:
             print(f"  ... and {len(log_files) - 10} more")
     
-    # Search for term in files
-    matches = search_files_for_term(log_files, args.term, max_matches=1000000)
-    print(f"Found {len(matches)} matches for term '{args.term}'")
+    # Search for term in files and analyze the matching entries, streaming
+    # the matches from the files to the detectors
+    print("Analyzing log entries...")
+    ranges = None
+    diag = {}
+    analysis = {}
+    operations = OperationStore(keep=not args.digests_only)
+    operation_stats = {}
+    in_flight = None
+    if args.incremental:
+        checkpoint = load_checkpoint(args.incremental, args.term)
+        ranges, new_entries = plan_incremental_ranges(log_files, checkpoint)
+        diag = checkpoint['diag']
+        analysis = checkpoint['results']
+        known_events = count_events(analysis)
+        # the requests whose result will be in the next lines
+        in_flight = OrderedDict(((request[2], request[3]), OperationRecord(*request))
+                                for request in checkpoint.get('in_flight', []))
+        # the latency digests of the last minutes of the previous run are
+        # completed by this one
+        operation_stats['latency_digests'] = checkpoint.get('latency_digests', {})
+        operation_stats['long_updates'] = checkpoint.get('long_updates', [])
+        # the connections opened by the previous runs
+        operation_stats['connections'] = ConnectionStore()
+        operation_stats['connections'].restore(checkpoint.get('connections', []))
+    elif args.since or args.until:
+        # seek, through the time index of each file, to the lines of the window
+        ranges = plan_time_window_ranges(log_files, args.since, args.until)
+    orphans = None
+    if args.partial:
+        # the requests and results crossing the bounds of the range are
+        # joined with the ones of the neighbour ranges by the merge
+        in_flight = OrderedDict()
+        orphans = []
+    if writer is not None:
+        writer.start(analysis)
+    cache_entries = None
+    if args.parse_cache:
+        cache_entries = open_cache_entries(
+            log_files, ParseCache(args.parse_cache, args.parse_cache_budget * 1024 * 1024))
+    if args.jobs > 1:
+        total_matches, matches, analysis, diag = analyze_log_files_parallel(
+            log_files, args.term, args.jobs, max_matches=1000000,
+            ranges=ranges, diag=diag, results=analysis,
+            operations=operations, in_flight=in_flight, operation_stats=operation_stats,
+            cache_entries=cache_entries, orphans=orphans,
+            on_chunk=writer.write_new_events if writer is not None else None)
+    else:
+        stats = {}
+        entries = sample_matches(
+            iter_log_matches(log_files, args.term, max_matches=1000000, ranges=ranges,
+                             cache_entries=cache_entries), stats)
+        if writer is not None:
+            entries = write_events_while(entries, writer, analysis)
+        analysis = analyze_log_entries(entries,
+            diag=diag, results=analysis, operations=operations, in_flight=in_flight,
+            operation_stats=operation_stats, orphans=orphans)
+        total_matches = stats['total_matches']
+        matches = stats['sample']
+    if writer is not None:
+        writer.write_new_events(analysis)
+    if args.incremental:
+        update_checkpoint(checkpoint, ranges, new_entries, diag, analysis)
+        checkpoint['in_flight'] = list(in_flight.values())
+        compress_latency_digests(operation_stats)
+        checkpoint['latency_digests'] = recent_latency_digests(operation_stats)
+        checkpoint['long_updates'] = recent_long_updates(operation_stats)
+        if 'connections' in operation_stats:
+            checkpoint['connections'] = operation_stats['connections'].open_connections()
+        save_checkpoint(args.incremental, checkpoint)
+        # Only report the events detected during this run
+        analysis = new_events(analysis, known_events)
+    print(f"Found {total_matches} matches for term '{args.term}'")
     
     if args.verbose:
         print("Sample matches:")
         for match in matches[:5]:  # Show max 5 matches
             print(f"  - {match['file']}:{match['line_number']}: {match['content'][:100]}...")
     
-    # Analyze log entries
-    print("Analyzing log entries...")
-    analysis = analyze_log_entries(matches)
-    
     # Generate solution suggestions
     print("Generating solutions...")
-    solutions = suggest_solutions(analysis)
+    unindexed_searches = report_unindexed_searches(operation_stats)
+    saturation = operations.saturation(args.threadnumber) if operations.keep else None
+    heavy_hitters = report_heavy_hitters(operation_stats)
+    if args.partial:
+        head, snapshots, first_epoch = partial_head(log_files, args.term, ranges, cache_entries)
+        save_partial(args.partial, {
+            'version': PARTIAL_VERSION,
+            'host': args.host,
+            'search_term': args.term,
+            'first_epoch': first_epoch,
+            'total_files_searched': len(log_files),
+            'total_matches': total_matches,
+            'matches': matches,
+            # the detectors state at the bounds of the range
+            'head': head,
+            'snapshots': snapshots,
+            'diag': diag,
+            'results': analysis,
+            'in_flight': list(in_flight.values()),
+            'orphans': orphans,
+            'operations': len(operations),
+            'stats': encode_stats(operation_stats),
+            'saturation': saturation,
+        })
+        print(f"Partial result written to {args.partial}")
+    # distinct client IPs, connections, bind DNs and bases per minute (epoch)
+    analysis['distinct_counts'] = report_distinct_values(operation_stats)
+    attach_long_updates(analysis, operation_stats)
+    if writer is not None:
+        writer.write_event_updates(analysis)
+    if args.store:
+        write_store(args.store, operations, operation_stats, analysis, matches,
+                    incremental=bool(args.incremental))
+    connections = report_connections(operation_stats)
+    solutions = (suggest_solutions(analysis) + suggest_indexes(unindexed_searches) +
+                 suggest_connections(connections))
+    if saturation is not None:
+        solutions += suggest_threads(saturation)
     
     # Prepare the results
     results = {
@@ -639,111 +3322,30 @@ def main():
             'search_term': args.term,
             'log_directory': args.logs,
             'total_files_searched': len(log_files),
-            'total_matches': len(matches)
+            'total_matches': total_matches
         },
-#        'matches': matches,
+        'matches': matches,
         'analysis': analysis,
+        # latency of the operations, per minute and per second (epochs):
+        # exact from the operation store, unless --digests-only, and
+        # estimated from t-digests (with an --incremental analysis, the
+        # minutes of this run, the last ones of the previous run completed)
+        'latency': report_latency(operations, operation_stats),
+        'unindexed_searches': unindexed_searches,
+        # most frequent client IPs, bind DNs, search bases and filters
+        'heavy_hitters': heavy_hitters,
+        # intervals (UTC epochs) during which all the worker threads were busy
+        'saturation': saturation,
+        # duration and operations of the connections, and their clients
+        'connections': connections,
         'solutions': solutions
     }
     
-    # Use AI to enhance the solutions if possible
-    ai_status = is_ai_enhancement_enabled()
-    if ai_status:
-        try:
-            print("Enhancing solutions with AI...")
-            results = enhance_solutions(results)
-        except Exception as e:
-            print(f"Error enhancing solutions: {e}")
-            results["ai_enhancement_used"] = False
-            results["ai_error"] = str(e)
-    else:
-        results["ai_enhancement_used"] = False
-    
-    # Output the results
-    if args.output:
-        with open(args.output, 'w') as f:
-            json.dump(results, f, indent=2)
-        print(f"Results written to {args.output}")
-    else:
-        # Print summary to console
-        print("\n--- Analysis Summary ---")
-        
-        if 'severity_distribution' in analysis:
-            print("\nSeverity distribution:")
-            for severity, count in analysis['severity_distribution'].items():
-                print(f"  - {severity}: {count}")
-        
-        #pdb.set_trace()
-        # Get the solutions from the results dictionary AFTER AI enhancement
-        ai_enhanced_solutions = results.get('solutions', [])
-        
-        if ai_enhanced_solutions:
-            print("\nSuggested solutions:")
-            
-            # Debug output for solutions
-            if os.getenv("DEBUG") == "1":
-                print(f"\nDEBUG: Total solutions: {len(ai_enhanced_solutions)}")
-                for i, solution in enumerate(ai_enhanced_solutions):
-                    print(f"DEBUG: Solution {i+1} keys: {list(solution.keys())}")
-                    print(f"DEBUG: Is AI enhanced? {solution.get('ai_enhanced', False)}")
-            
-            for i, solution in enumerate(ai_enhanced_solutions, 1):
-                problem = solution.get('problem', 'Unknown issue')
-                
-                # Determine which solution text to display - prefer AI enhanced if available
-                if solution.get('ai_enhanced', False):
-                    solution_text = solution.get('solution', '')
-                else:
-                    solution_text = solution.get('solution', '')
-                    if os.getenv("DEBUG") == "1":
-                        print(f"DEBUG: Using original solution for {problem} - AI enhancement not available")
-                #pdb.set_trace()
-                print(f"  {i}. {problem}")
-                
-                # Debug the content of the solution
-                if os.getenv("DEBUG") == "1":
-                    print(f"DEBUG: Solution {i} content length: {len(solution_text)}")
-                    print(f"DEBUG: Solution {i} first 50 chars: {solution_text[:50]}...")
-                
-                # Only display the first 3-4 lines of the enhanced solution to keep it concise
-                # Split by newlines and filter out empty lines
-                solution_lines = [line for line in solution_text.split('\n') if line.strip()]
-                if (args.solution_len):
-                    solution_len = int(args.solution_len)
-                else:
-                    solution_len = 10
-                if len(solution_lines) > solution_len:
-                    # Display first 10 lines if the solution is very long
-                    display_solution = '\n     '.join(solution_lines[:solution_len]) + '\n     ...'
-                else:
-                    display_solution = '\n     '.join(solution_lines)
-                
-                if solution.get('ai_enhanced', False):
-                    print(f"     {display_solution}")
-                else:
-                    print(f"\n     {display_solution}")
-                
-                root_cause = solution.get('root cause', '')
-                if not solution.get('ai_enhanced', False):
-                    print(f"\n     Root Cause: {root_cause}")
-
-                further_investigations = solution.get('further investigations', '')
-                if not solution.get('ai_enhanced', False):
-                    print(f"\n     Further Investigations: {further_investigations}")
-                
-                # Add a line break for readability
-                if i < len(ai_enhanced_solutions):
-                    print("\n\n")
-        
-        if results.get("ai_enhancement_used", False):
-            model_name = results.get("ollama_model_used", os.getenv("OLLAMA_MODEL", "default"))
-            print(f"\n✨ Solutions were enhanced using Ollama model: {model_name}")
-        elif results.get("ai_error"):
-            print(f"\n⚠️ AI enhancement failed: {results.get('ai_error')}")
-            if os.getenv("DEBUG") == "1":
-                print(f"Detailed error: {results.get('ai_error')}")
-        else:
-            print("\n⚠️ AI enhancement was not used")
+    if writer is not None:
+        writer.write_aggregates(results)
+
+    results = enhance_results(results)
+    write_results(results, args, writer)
 
 if __name__ == "__main__":
     main() 
@@ -0,0 +1,272 @@
+"""
+Columnar store of the lifecycle of the LDAP connections of the access logs:
+when each connection was opened and closed, by which client, how many
+operations it carried and why it was closed.
+"""
+
+from array import array
+
+import numpy as np
+
+from operation_store import PERCENTILES
+
+# Columns of the store: typecode of their growable buffer and NumPy dtype.
+# 'client' and 'reason' are codes of the interned client IPs and close
+# reasons. Missing values are -1 for the codes and NaN for the times.
+COLUMNS = {
+    'conn': ('q', np.int64),
+    'open': ('d', np.float64),
+    'close': ('d', np.float64),
+    'client': ('i', np.int32),
+    'ops': ('i', np.int32),
+    'etime': ('d', np.float64),
+    'reason': ('b', np.int8),
+}
+
+# Upper bounds of the buckets of the distributions of the connections,
+# followed by a last bucket of the higher values
+DURATION_BUCKETS = (0.1, 1, 10, 60, 600, 3600)
+OPS_BUCKETS = (0, 1, 2, 5, 10, 100, 1000)
+NAN = float('nan')
+
+def histogram(values, bounds):
+    """
+    Number of values in each bucket: a list of {'le', 'count'}, 'le' being
+    None for the last bucket, of the values higher than all the bounds
+    """
+    counts = np.bincount(np.searchsorted(np.asarray(bounds), values, side='left'),
+                         minlength=len(bounds) + 1)
+    return [{'le': bound, 'count': int(count)}
+            for bound, count in zip(tuple(bounds) + (None,), counts.tolist())]
+
+def distribution(values, bounds, percentiles=PERCENTILES):
+    """Count, mean, percentiles and histogram of an array of values"""
+    if not len(values):
+        return {'count': 0}
+    result = {'count': int(len(values)), 'mean': float(values.mean())}
+    for percentile, value in zip(percentiles, np.percentile(values, percentiles).tolist()):
+        result['p%d' % percentile] = value
+    result['max'] = float(values.max())
+    result['histogram'] = histogram(values, bounds)
+    return result
+
+class ConnectionStore:
+    """
+    Connections kept as one typed column per field instead of one object
+    per connection. Only the rows of the open connections are indexed by
+    their number: a connection number reused after its close (or after a
+    restart) starts a new row.
+    A row may be partial when the logs start or end while it is open: its
+    open (or close) time is then NaN. The rows of consecutive ranges of the
+    logs are joined by merge().
+    """
+
+    def __init__(self):
+        self._buffers = {name: array(typecode) for name, (typecode, _) in COLUMNS.items()}
+        self._rows = {}
+        self.clients = []
+        self._client_codes = {}
+        self.reasons = []
+        self._reason_codes = {}
+
+    def __len__(self):
+        return len(self._buffers['conn'])
+
+    def _intern(self, value, values, codes):
+        """Code of an interned string, -1 for None"""
+        if value is None:
+            return -1
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def _new_row(self, conn, opened=NAN, client=-1):
+        """Append the row of a connection and index it as open"""
+        buffers = self._buffers
+        row = len(buffers['conn'])
+        buffers['conn'].append(conn)
+        buffers['open'].append(opened)
+        buffers['close'].append(NAN)
+        buffers['client'].append(client)
+        buffers['ops'].append(0)
+        buffers['etime'].append(0.0)
+        buffers['reason'].append(-1)
+        self._rows[conn] = row
+        return row
+
+    def _row(self, conn):
+        """Row of an open connection, a partial one if it opened before the logs"""
+        row = self._rows.get(conn)
+        if row is None:
+            row = self._new_row(conn)
+        return row
+
+    def connect(self, conn, time, client_ip):
+        """A connection opened at 'time' (epoch) by 'client_ip'"""
+        self._new_row(conn, NAN if time is None else time,
+                      self._intern(client_ip, self.clients, self._client_codes))
+
+    def operation(self, conn, etime):
+        """An operation of a connection completed with 'etime'"""
+        row = self._row(conn)
+        self._buffers['ops'][row] += 1
+        if etime is not None:
+            self._buffers['etime'][row] += etime
+
+    def close(self, conn, time, reason):
+        """A connection closed at 'time' (epoch) for 'reason' ('U1', 'T1'...)"""
+        row = self._row(conn)
+        self._buffers['close'][row] = NAN if time is None else time
+        self._buffers['reason'][row] = self._intern(reason, self.reasons, self._reason_codes)
+        del self._rows[conn]
+
+    def merge(self, other, continuation=True):
+        """
+        Append the connections of the store of the following range of the
+        logs: its partial rows of the connections opened before it complete
+        the rows of the connections still open here. The rows are only
+        appended when the store is not a 'continuation' (another server),
+        its connections never continuing the open ones here.
+        """
+        open_rows = None if continuation else dict(self._rows)
+        buffers = self._buffers
+        other_buffers = other._buffers
+        clients = [self._intern(client, self.clients, self._client_codes)
+                   for client in other.clients]
+        reasons = [self._intern(reason, self.reasons, self._reason_codes)
+                   for reason in other.reasons]
+        closed = {}
+        for i in range(len(other)):
+            conn = other_buffers['conn'][i]
+            client = other_buffers['client'][i]
+            reason = other_buffers['reason'][i]
+            row = self._rows.get(conn) if continuation else None
+            if row is not None and other_buffers['open'][i] != other_buffers['open'][i]:
+                # continuation of a connection open here (its open time is NaN)
+                buffers['ops'][row] += other_buffers['ops'][i]
+                buffers['etime'][row] += other_buffers['etime'][i]
+                if buffers['client'][row] < 0 and client >= 0:
+                    buffers['client'][row] = clients[client]
+            else:
+                row = self._new_row(conn, other_buffers['open'][i],
+                                    clients[client] if client >= 0 else -1)
+                buffers['ops'][row] = other_buffers['ops'][i]
+                buffers['etime'][row] = other_buffers['etime'][i]
+            close = other_buffers['close'][i]
+            if close == close or reason >= 0:
+                buffers['close'][row] = close
+                buffers['reason'][row] = reasons[reason] if reason >= 0 else -1
+                closed[conn] = row
+        if open_rows is not None:
+            # the same numbers are other connections there
+            self._rows = open_rows
+            return
+        for conn, row in closed.items():
+            if self._rows.get(conn) == row:
+                del self._rows[conn]
+
+    def open_connections(self):
+        """
+        The connections still open, as JSON-serializable [conn, open, client,
+        ops, etime] lists (see restore), the open time being None when unknown
+        """
+        buffers = self._buffers
+        connections = []
+        for conn, row in self._rows.items():
+            opened = buffers['open'][row]
+            client = buffers['client'][row]
+            connections.append([conn, None if opened != opened else opened,
+                                self.clients[client] if client >= 0 else None,
+                                buffers['ops'][row], buffers['etime'][row]])
+        return connections
+
+    def restore(self, connections):
+        """Open again the connections returned by open_connections()"""
+        for conn, opened, client_ip, ops, etime in connections:
+            self.connect(conn, opened, client_ip)
+            row = self._rows[conn]
+            self._buffers['ops'][row] = ops
+            self._buffers['etime'][row] = etime
+
+    def to_dict(self):
+        """JSON-serializable content of the store (see from_dict), None for the missing times"""
+        columns = {}
+        for name, buffer in self._buffers.items():
+            values = buffer.tolist()
+            if buffer.typecode == 'd':
+                values = [None if value != value else value for value in values]
+            columns[name] = values
+        return {'columns': columns, 'rows': sorted(self._rows.items()),
+                'clients': self.clients, 'reasons': self.reasons}
+
+    @classmethod
+    def from_dict(cls, saved):
+        """Store of a content returned by to_dict()"""
+        store = cls()
+        for name, values in saved['columns'].items():
+            if store._buffers[name].typecode == 'd':
+                values = [NAN if value is None else value for value in values]
+            store._buffers[name].extend(values)
+        store._rows = dict((conn, row) for conn, row in saved['rows'])
+        for client in saved['clients']:
+            store._intern(client, store.clients, store._client_codes)
+        for reason in saved['reasons']:
+            store._intern(reason, store.reasons, store._reason_codes)
+        return store
+
+    def column(self, name):
+        """
+        The column of a field as a NumPy array. It shares the memory of the
+        store: it must not be used once other connections are appended.
+        """
+        return np.frombuffer(self._buffers[name], dtype=COLUMNS[name][1])
+
+    def lifecycle(self, percentiles=PERCENTILES):
+        """
+        Distributions of the duration of the connections opened and closed
+        in the logs and of the number of operations of the closed ones, the
+        number of connections per close reason, and per client IP the number
+        of connections and of operations: a dict of 'connections', 'open',
+        'duration', 'operations', 'close_reasons' and 'clients' (sorted by
+        number of connections)
+        """
+        opened = self.column('open')
+        close = self.column('close')
+        ops = self.column('ops')
+        closed = ~np.isnan(close)
+        complete = closed & ~np.isnan(opened)
+        reason = self.column('reason')
+        reason_counts = np.bincount(reason[reason >= 0], minlength=len(self.reasons))
+        client = self.column('client')
+        known = client >= 0
+        client_connections = np.bincount(client[known], minlength=len(self.clients))
+        client_ops = np.bincount(client[known], weights=ops[known], minlength=len(self.clients))
+        client_closed = np.bincount(client[closed & known], minlength=len(self.clients))
+        client_closed_ops = np.bincount(client[closed & known], weights=ops[closed & known],
+                                        minlength=len(self.clients))
+        clients = []
+        for code in np.argsort(-client_connections, kind='stable').tolist():
+            connections = int(client_connections[code])
+            if not connections:
+                continue
+            clients.append({
+                'client_ip': self.clients[code],
+                'connections': connections,
+                'operations': int(client_ops[code]),
+                'closed': int(client_closed[code]),
+                # operations per closed connection, the open ones not being complete
+                'ops_per_connection': (round(float(client_closed_ops[code] / client_closed[code]), 3)
+                                       if client_closed[code] else None),
+            })
+        return {
+            'connections': len(self),
+            'open': int((~closed).sum()),
+            'duration': distribution(close[complete] - opened[complete], DURATION_BUCKETS,
+                                     percentiles),
+            'operations': distribution(ops[closed].astype(np.float64), OPS_BUCKETS, percentiles),
+            'close_reasons': {self.reasons[code]: int(count)
+                              for code, count in enumerate(reason_counts.tolist()) if count},
+            'clients': clients,
+        }
@@ -0,0 +1,75 @@
+"""
+Space-Saving sketches tracking the most frequent keys of a stream (client
+IPs, bind DNs...) in a bounded memory, however many distinct keys it has.
+A sketch is a plain dict, so that it can be saved in the JSON checkpoints
+and compared between runs.
+"""
+
+# Number of counters of a sketch: it holds between 'capacity' and twice
+# 'capacity' keys
+CAPACITY = 1000
+
+def new_sketch(capacity=CAPACITY):
+    """
+    An empty sketch. 'counters' maps each tracked key to its [count, error]:
+    'count' overestimates the number of occurrences of the key by at most
+    'error'. 'floor' bounds the number of occurrences of the keys that are
+    not tracked.
+    """
+    return {'capacity': capacity, 'floor': 0, 'counters': {}}
+
+def prune_sketch(sketch):
+    """
+    Only keep the 'capacity' keys of highest count once the sketch holds
+    twice as many keys. This is Space-Saving with a lazy eviction: instead
+    of replacing the minimum counter for every new key, the smallest half
+    is evicted at once and 'floor' raised to the highest evicted count, a
+    new key starting from it.
+    """
+    counters = sketch['counters']
+    capacity = sketch['capacity']
+    if len(counters) <= 2 * capacity:
+        return
+    ranked = sorted(counters.items(), key=lambda item: (-item[1][0], item[0]))
+    sketch['floor'] = max(sketch['floor'], ranked[capacity][1][0])
+    sketch['counters'] = dict(ranked[:capacity])
+
+def sketch_add(sketch, key, count=1):
+    """Count 'count' occurrences of a key"""
+    counter = sketch['counters'].get(key)
+    if counter is not None:
+        counter[0] += count
+        return
+    floor = sketch['floor']
+    sketch['counters'][key] = [floor + count, floor]
+    if len(sketch['counters']) > 2 * sketch['capacity']:
+        prune_sketch(sketch)
+
+def merge_sketches(sketch, other):
+    """
+    Add to a sketch the keys counted by another one (mergeable summaries):
+    a key missing from a sketch may have occurred up to its 'floor' times
+    there, which is added to its count and error.
+    """
+    counters = sketch['counters']
+    floor = sketch['floor']
+    other_floor = other['floor']
+    for key, counter in counters.items():
+        if key not in other['counters']:
+            counter[0] += other_floor
+            counter[1] += other_floor
+    for key, (count, error) in other['counters'].items():
+        counter = counters.get(key)
+        if counter is None:
+            counters[key] = [count + floor, error + floor]
+        else:
+            counter[0] += count
+            counter[1] += error
+    sketch['floor'] = floor + other_floor
+    prune_sketch(sketch)
+
+def sketch_top(sketch, top=10):
+    """The 'top' keys of highest count: a list of {'key', 'count', 'error'}"""
+    ranked = sorted(sketch['counters'].items(), key=lambda item: (-item[1][0], item[0]))
+    return [{'key': key, 'count': count, 'error': error}
+            for key, (count, error) in ranked[:top]]
@@ -0,0 +1,65 @@
+"""
+HyperLogLog registers estimating the number of distinct values of a stream
+(client IPs, connections...) in a fixed memory: 2**precision bytes, with
+a standard error of about 1.04 / sqrt(2**precision). The registers of two
+streams merge into the registers of their union.
+"""
+
+import math
+from hashlib import blake2b
+
+# 1024 registers: 1 KiB per counter, about 3% of standard error
+PRECISION = 10
+MASK64 = (1 << 64) - 1
+# Memoized hashes of the last distinct strings: the same bases, DNs and
+# IPs come over and over
+STRING_HASHES = {}
+STRING_HASHES_MAX = 100000
+
+def new_registers(precision=PRECISION):
+    """Registers of an empty stream"""
+    return bytearray(1 << precision)
+
+def hash_value(value):
+    """
+    64-bit hash of a string or of an integer. Python's hash() is salted per
+    process, the registers of the --jobs workers could not be merged.
+    """
+    if isinstance(value, int):
+        # splitmix64 finalizer
+        value = (value + 0x9E3779B97F4A7C15) & MASK64
+        value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+        return value ^ (value >> 31)
+    hashed = STRING_HASHES.get(value)
+    if hashed is None:
+        if len(STRING_HASHES) >= STRING_HASHES_MAX:
+            STRING_HASHES.clear()
+        hashed = STRING_HASHES[value] = int.from_bytes(
+            blake2b(value.encode('utf-8', 'replace'), digest_size=8).digest(), 'big')
+    return hashed
+
+def registers_add(registers, value):
+    """Add a value: its hash selects a register, which keeps the highest rank of its first 1 bit"""
+    hashed = hash_value(value)
+    precision = len(registers).bit_length() - 1
+    width = 64 - precision
+    index = hashed >> width
+    rank = width - (hashed & ((1 << width) - 1)).bit_length() + 1
+    if rank > registers[index]:
+        registers[index] = rank
+
+def merge_registers(registers, other):
+    """Merge into 'registers' the registers of another stream"""
+    registers[:] = bytes(map(max, registers, other))
+
+def estimate_distinct(registers):
+    """Estimated number of distinct values added to the registers"""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / sum(2.0 ** -register for register in registers)
+    zeros = registers.count(0)
+    if estimate <= 2.5 * m and zeros:
+        # small range: linear counting of the empty registers
+        estimate = m * math.log(m / zeros)
+    return int(round(estimate))
@@ -0,0 +1,54 @@
+"""
+Static interval tree answering which intervals of time (operations from
+their start to their end) overlap a given period.
+"""
+
+class IntervalTree:
+    """
+    Augmented binary search tree over the intervals sorted by start, laid
+    out implicitly in a sorted list: the node of a range of the list is its
+    middle element, its subtrees the two halves. Each node also records the
+    highest end of its subtree, so that the subtrees ending before a query
+    are skipped: a query is O(log n + number of results).
+    """
+
+    def __init__(self, intervals):
+        """'intervals' are (start, end, item) tuples"""
+        self._intervals = sorted(intervals, key=lambda interval: interval[:2])
+        self._starts = [interval[0] for interval in self._intervals]
+        self._max_ends = [0.0] * len(self._intervals)
+        self._build(0, len(self._intervals))
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def _build(self, lo, hi):
+        """Compute the highest end of the subtree of the range [lo, hi)"""
+        if lo >= hi:
+            return float('-inf')
+        mid = (lo + hi) // 2
+        max_end = max(self._intervals[mid][1], self._build(lo, mid), self._build(mid + 1, hi))
+        self._max_ends[mid] = max_end
+        return max_end
+
+    def overlap(self, start, end):
+        """The (start, end, item) intervals overlapping [start, end], by start"""
+        found = []
+        stack = [(0, len(self._intervals))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._max_ends[mid] < start:
+                # the whole subtree ends before the period
+                continue
+            stack.append((lo, mid))
+            if self._starts[mid] > end:
+                # the node and its right subtree start after the period
+                continue
+            if self._intervals[mid][1] >= start:
+                found.append(self._intervals[mid])
+            stack.append((mid + 1, hi))
+        found.sort(key=lambda interval: interval[:2])
+        return found
@@ -0,0 +1,212 @@
+"""
+Columnar store of the LDAP operations correlated from the access logs
+(see analyze_logs.iter_operations), for vectorized latency statistics.
+"""
+
+from array import array
+
+import numpy as np
+
+# Code of the verb of an operation in the 'verb' column, 0 when unknown
+VERBS = ('', 'SRCH', 'ADD', 'MOD', 'DEL', 'MODRDN', 'CMP', 'BIND', 'EXT')
+VERB_CODES = {verb: code for code, verb in enumerate(VERBS)}
+
+# Columns of the store: typecode of their growable buffer and NumPy dtype.
+# Missing values are -1 for the integers and NaN for the times.
+COLUMNS = {
+    'epoch': ('q', np.int64),
+    'conn': ('q', np.int64),
+    'op': ('i', np.int32),
+    'verb': ('b', np.int8),
+    'err': ('i', np.int32),
+    'etime': ('d', np.float64),
+    'wtime': ('d', np.float64),
+    'optime': ('d', np.float64),
+    'end': ('d', np.float64),
+}
+
+PERCENTILES = (50, 95, 99)
+NAN = float('nan')
+
+def group_percentiles(keys, values, percentiles=PERCENTILES):
+    """
+    Percentiles of 'values' grouped by 'keys' (two arrays of the same
+    length), NaN values being ignored. All the groups are computed at once:
+    the values are sorted by key then value, and each percentile is
+    interpolated (as numpy.percentile does) at its position in every group.
+    Return the distinct keys, the size of their group and, for each
+    percentile, the array of its value per group.
+    """
+    valid = ~np.isnan(values)
+    keys = keys[valid]
+    values = values[valid]
+    order = np.lexsort((values, keys))
+    keys = keys[order]
+    values = values[order]
+    groups, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+    result = {}
+    for percentile in percentiles:
+        position = starts + (counts - 1) * (percentile / 100.0)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        fraction = position - low
+        result[percentile] = values[low] + (values[high] - values[low]) * fraction
+    return groups, counts, result
+
+def busy_intervals(starts, ends, threshold):
+    """
+    Sweep line over the intervals [starts[i], ends[i]) (two arrays of the
+    same length, NaN values being ignored): their start and end points are
+    sorted and the running sum of +1 (start) and -1 (end), taken after the
+    last point of each distinct time, is the number of intervals open from
+    that time to the next one. Return the maximum of this number and the
+    list of the (start, end, peak) intervals of time during which it was at
+    least 'threshold'.
+    """
+    valid = ~(np.isnan(starts) | np.isnan(ends))
+    starts = starts[valid]
+    ends = ends[valid]
+    if not len(starts):
+        return 0, []
+    times = np.concatenate((starts, ends))
+    deltas = np.concatenate((np.ones(len(starts), np.int64), -np.ones(len(ends), np.int64)))
+    order = np.argsort(times, kind='stable')
+    times = times[order]
+    level = np.cumsum(deltas[order])
+    last = np.append(times[1:] != times[:-1], True)
+    times = times[last]
+    level = level[last]
+    above = level >= threshold
+    changes = np.flatnonzero(above[1:] != above[:-1]) + 1
+    if above[0]:
+        changes = np.concatenate(([0], changes))
+    intervals = []
+    # the level is back to 0 after the last point: every enter has a leave
+    for enter, leave in zip(changes[::2].tolist(), changes[1::2].tolist()):
+        intervals.append((float(times[enter]), float(times[leave]),
+                          int(level[enter:leave].max())))
+    return int(level.max()), intervals
+
+class OperationStore:
+    """
+    Operations kept as one typed column per field instead of one object per
+    operation. Operations are appended to compact growable buffers and the
+    columns are read as NumPy arrays sharing their memory.
+    A store created with 'keep' False only counts the operations, for the
+    runs too large to keep them: its columns stay empty.
+    """
+
+    def __init__(self, keep=True):
+        self.keep = keep
+        self._buffers = {name: array(typecode) for name, (typecode, _) in COLUMNS.items()}
+        self._discarded = 0
+
+    def __len__(self):
+        return len(self._buffers['epoch']) + self._discarded
+
+    def extend(self, operations):
+        """Append OperationRecords (see analyze_logs.iter_operations)"""
+        if not self.keep:
+            for _ in operations:
+                self._discarded += 1
+            return
+        buffers = self._buffers
+        epoch = buffers['epoch'].append
+        conn = buffers['conn'].append
+        op = buffers['op'].append
+        verb = buffers['verb'].append
+        err = buffers['err'].append
+        etime = buffers['etime'].append
+        wtime = buffers['wtime'].append
+        optime = buffers['optime'].append
+        end = buffers['end'].append
+        verb_codes = VERB_CODES
+        for operation in operations:
+            epoch(-1 if operation.epoch is None else operation.epoch)
+            conn(-1 if operation.conn is None else operation.conn)
+            op(-1 if operation.op is None else operation.op)
+            verb(verb_codes.get(operation.verb, 0))
+            err(-1 if operation.err is None else operation.err)
+            etime(NAN if operation.etime is None else operation.etime)
+            wtime(NAN if operation.wtime is None else operation.wtime)
+            optime(NAN if operation.optime is None else operation.optime)
+            end(NAN if operation.end is None else operation.end)
+
+    def append(self, operation):
+        """Append one OperationRecord"""
+        self.extend((operation,))
+
+    def merge(self, other):
+        """Append all the operations of another store"""
+        if self.keep:
+            for name, buffer in self._buffers.items():
+                buffer.extend(other._buffers[name])
+        else:
+            self._discarded += len(other._buffers['epoch'])
+        self._discarded += other._discarded
+
+    def column(self, name):
+        """
+        The column of a field as a NumPy array. It shares the memory of the
+        store: it must not be used once other operations are appended.
+        """
+        return np.frombuffer(self._buffers[name], dtype=COLUMNS[name][1])
+
+    def etime_by_verb_minute(self, percentiles=PERCENTILES):
+        """
+        Percentiles of the etime of the operations of each verb, per minute:
+        a list of {'minute', 'verb', 'count', 'p50', ...} sorted by minute
+        """
+        verb = self.column('verb').astype(np.int64)
+        minute = self.column('epoch') // 60 * 60
+        groups, counts, result = group_percentiles(minute * len(VERBS) + verb,
+                                                   self.column('etime'), percentiles)
+        rows = []
+        for i, key in enumerate(groups.tolist()):
+            minute, verb = divmod(key, len(VERBS))
+            if minute < 0:
+                continue
+            row = {'minute': minute, 'verb': VERBS[verb] or None, 'count': int(counts[i])}
+            for percentile in percentiles:
+                row['p%d' % percentile] = float(result[percentile][i])
+            rows.append(row)
+        return rows
+
+    def wtime_by_second(self, percentiles=PERCENTILES):
+        """
+        Percentiles of the wtime (time waiting for a worker thread) of the
+        operations, per second: a list of {'second', 'count', 'p50', ...}
+        """
+        groups, counts, result = group_percentiles(self.column('epoch'),
+                                                   self.column('wtime'), percentiles)
+        rows = []
+        for i, second in enumerate(groups.tolist()):
+            if second < 0:
+                continue
+            row = {'second': second, 'count': int(counts[i])}
+            for percentile in percentiles:
+                row['p%d' % percentile] = float(result[percentile][i])
+            rows.append(row)
+        return rows
+
+    def saturation(self, threads):
+        """
+        Intervals of time during which at least 'threads' operations were
+        processed at once, that is all the worker threads were busy when
+        'threads' is the nsslapd-threadnumber of the server. An operation
+        keeps a worker from its RESULT time minus its optime (or its etime,
+        that also counts the wait in the work queue, when the optime is not
+        logged) to its RESULT time.
+        """
+        end = self.column('end')
+        optime = self.column('optime')
+        busy = np.where(np.isnan(optime), self.column('etime'), optime)
+        peak, intervals = busy_intervals(end - busy, end, threads)
+        return {
+            'threads': threads,
+            'max_busy': peak,
+            'busy_seconds': round(sum(stop - start for start, stop, _ in intervals), 6),
+            'intervals': [{'start': round(start, 6), 'end': round(stop, 6),
+                           'duration': round(stop - start, 6), 'peak': busy}
+                          for start, stop, busy in intervals],
+        }
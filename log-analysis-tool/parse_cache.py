@@ -0,0 +1,120 @@
+"""
+On-disk cache of the parsed log files. Each entry is a directory named by
+the key of the content of a file, holding the columns of its parsed lines
+as .npy files, memory-mapped when the entry is read, and a JSON metadata
+file. The least recently used entries are evicted once the cache exceeds
+its disk budget.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Version of the layout of the entries: other versions are not read
+CACHE_VERSION = 1
+METADATA_FILE = 'meta.json'
+# Default disk budget of the cache, in bytes
+CACHE_BUDGET = 1024 * 1024 * 1024
+
+def entry_size(path):
+    """Bytes used by the files of a cache entry"""
+    size = 0
+    for name in os.listdir(path):
+        try:
+            size += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass
+    return size
+
+class ParseCache:
+    """
+    Cache entries in 'directory', evicted beyond 'budget' bytes. The last
+    use of an entry is the modification time of its metadata file, touched
+    whenever the entry is read.
+    """
+
+    def __init__(self, directory, budget=CACHE_BUDGET):
+        self.directory = directory
+        self.budget = budget
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        """Directory of the entry of a key"""
+        return os.path.join(self.directory, key)
+
+    def lookup(self, key):
+        """
+        The metadata of the entry of a key, with its 'path', or None when
+        the key is not cached
+        """
+        path = self.path(key)
+        metadata_path = os.path.join(path, METADATA_FILE)
+        try:
+            with open(metadata_path, 'r') as f:
+                metadata = json.load(f)
+            os.utime(metadata_path)
+        except (OSError, ValueError):
+            return None
+        if metadata.get('version') != CACHE_VERSION:
+            return None
+        metadata['path'] = path
+        return metadata
+
+    def store(self, key, write):
+        """
+        Create the entry of a key: write(path) writes its files in a
+        temporary directory, and returns its metadata, then the directory
+        is renamed to the entry. The cache is then trimmed to its budget,
+        sparing the new entry. Returns the metadata of the entry.
+        """
+        tmp_path = tempfile.mkdtemp(prefix='.tmp-', dir=self.directory)
+        try:
+            metadata = write(tmp_path)
+            metadata['version'] = CACHE_VERSION
+            with open(os.path.join(tmp_path, METADATA_FILE), 'w') as f:
+                json.dump(metadata, f)
+            path = self.path(key)
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(tmp_path, path)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        self.evict(spare=key)
+        metadata['path'] = path
+        return metadata
+
+    def evict(self, spare=None):
+        """Remove the least recently used entries, but 'spare', until the cache fits its budget"""
+        entries = []
+        total = 0
+        for key in os.listdir(self.directory):
+            path = self.path(key)
+            if not os.path.isdir(path):
+                continue
+            try:
+                last_use = os.path.getmtime(os.path.join(path, METADATA_FILE))
+            except OSError:
+                # an entry being written, or a broken one
+                continue
+            size = entry_size(path)
+            total += size
+            entries.append((last_use, key, size))
+        entries.sort()
+        for _, key, size in entries:
+            if total <= self.budget:
+                break
+            if key == spare:
+                continue
+            shutil.rmtree(self.path(key), ignore_errors=True)
+            total -= size
+
+def save_column(path, name, values, dtype):
+    """Write a column (an array.array or a sequence) of an entry being stored"""
+    np.save(os.path.join(path, name + '.npy'), np.asarray(values, dtype=dtype))
+
+def load_column(path, name):
+    """Memory-map a column of a cache entry"""
+    return np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
@@ -16,6 +16,20 @@ display_help() {
     echo "  --model MODEL      Specify Ollama model to use (default: llama3.2)"
     echo "  --timeout SECONDS  Set timeout for Ollama API requests in seconds (default: 300)"
     echo "  --debug            Enable debug output"
+    echo "  --jobs N           Number of processes scanning the log files (default: 1)"
+    echo "  --incremental FILE Only analyze what was appended since the run recorded in FILE"
+    echo "  --follow           Follow the active log file and report the events as they are detected"
+    echo "  --since TIME       Only analyze the lines logged at or after TIME (e.g. 03/Oct/2023:00:43:21)"
+    echo "  --until TIME       Only analyze the lines logged before TIME"
+    echo "  --digests-only     Only estimate the latency percentiles, without keeping the operations"
+    echo "  --threadnumber N   Number of worker threads of the server (default: 30)"
+    echo "  --parse-cache DIR  Cache the parsed rotated log files in DIR"
+    echo "  --parse-cache-budget MB  Disk space of the parse cache (default: 1024)"
+    echo "  --store DB         Write the operations, connections and events into the SQLite database DB"
+    echo "  --output-format F  Format of the results: json (default) or ndjson, written as they are final"
+    echo "  --partial FILE     Also write the partial result of this host and time range to FILE"
+    echo "  --host NAME        Name of the server in the partial result (default: the host name)"
+    echo "  --replica [NAME=]DIR  Log directory of a replica, repeated: the replicas are analyzed as one timeline"
     echo "  -h, --help         Display this help message"
     echo ""
     echo "Example: ./run_analysis.sh --logs ./my_logs --term exception --timeout 600"
@@ -37,11 +51,9 @@ echo "OLLAMA_API_BASE is set to: $OLLAMA_API_BASE"
 # Default values
 LOGS_DIR="./data/logs"
 SEARCH_TERM="error"
-OUTPUT=""
-VERBOSE=""
 DISABLE_AI=""
-SOLUTION_LEN=""
-DEBUG_FLAG=""
+# Arguments passed to analyze_logs.py, each one quoted as given
+ARGS=()
 OLLAMA_MODEL=${OLLAMA_MODEL:-"llama3.2"}  # Default to llama3.2 or use env var if set
 OLLAMA_TIMEOUT=${OLLAMA_TIMEOUT:-"300"}   # Default timeout is 300 seconds (5 minutes)
 
@@ -57,19 +69,20 @@ while [[ $# -gt 0 ]]; do
             shift; shift
             ;;
         -o|--output)
-            OUTPUT="--output $2"
+            ARGS+=(--output "$2")
             shift; shift
             ;;
         -v|--verbose)
-            VERBOSE="--verbose"
+            ARGS+=(--verbose)
             shift
             ;;
         --disable-ai)
             DISABLE_AI="--disable-ai"
+            ARGS+=(--disable-ai)
             shift
             ;;
         --solution-len)
-            SOLUTION_LEN="--solution-len $2"
+            ARGS+=(--solution-len "$2")
             shift; shift
             ;;
         --model)
@@ -81,10 +94,66 @@ while [[ $# -gt 0 ]]; do
             shift; shift
             ;;
         --debug)
-            DEBUG_FLAG="--debug"
+            ARGS+=(--debug)
             export DEBUG=1
             shift
             ;;
+        --jobs)
+            ARGS+=(--jobs "$2")
+            shift; shift
+            ;;
+        --incremental)
+            ARGS+=(--incremental "$2")
+            shift; shift
+            ;;
+        --follow)
+            ARGS+=(--follow)
+            shift
+            ;;
+        --since)
+            ARGS+=(--since "$2")
+            shift; shift
+            ;;
+        --until)
+            ARGS+=(--until "$2")
+            shift; shift
+            ;;
+        --digests-only)
+            ARGS+=(--digests-only)
+            shift
+            ;;
+        --threadnumber)
+            ARGS+=(--threadnumber "$2")
+            shift; shift
+            ;;
+        --parse-cache)
+            ARGS+=(--parse-cache "$2")
+            shift; shift
+            ;;
+        --parse-cache-budget)
+            ARGS+=(--parse-cache-budget "$2")
+            shift; shift
+            ;;
+        --store)
+            ARGS+=(--store "$2")
+            shift; shift
+            ;;
+        --output-format)
+            ARGS+=(--output-format "$2")
+            shift; shift
+            ;;
+        --partial)
+            ARGS+=(--partial "$2")
+            shift; shift
+            ;;
+        --host)
+            ARGS+=(--host "$2")
+            shift; shift
+            ;;
+        --replica)
+            ARGS+=(--replica "$2")
+            shift; shift
+            ;;
         -h|--help)
             display_help
             ;;
@@ -125,7 +194,7 @@ fi
 
 # Run the script
 echo "Running Log Analysis..."
-echo "Command: ./analyze_logs.py --logs \"$LOGS_DIR\" --term \"$SEARCH_TERM\" $OUTPUT $VERBOSE $DISABLE_AI $SOLUTION_LEN $DEBUG_FLAG"
-./analyze_logs.py --logs "$LOGS_DIR" --term "$SEARCH_TERM" $OUTPUT $VERBOSE $DISABLE_AI $SOLUTION_LEN $DEBUG_FLAG
+echo "Command: ./analyze_logs.py --logs \"$LOGS_DIR\" --term \"$SEARCH_TERM\"$( ((${#ARGS[@]})) && printf ' %q' "${ARGS[@]}")"
+./analyze_logs.py --logs "$LOGS_DIR" --term "$SEARCH_TERM" "${ARGS[@]}"
 
 echo "Analysis complete." 
@@ -0,0 +1,128 @@
+"""
+Merging t-digests: mergeable sketches of the distribution of a stream of
+values (operation latencies), from which quantiles are estimated with a
+relative accuracy that is best at the tails (p99...), in a memory bounded
+by the compression. A digest is a plain dict, so that it can be saved in
+the JSON checkpoints and sent back by the --jobs workers.
+"""
+
+import math
+
+# Compression of the digests: a digest holds about half this many
+# centroids, and more centroids give more accurate quantiles
+COMPRESSION = 100
+# Values buffered, in multiples of the compression, before being merged
+# into the centroids
+BUFFER_FACTOR = 5
+
+def new_digest(compression=COMPRESSION):
+    """
+    An empty digest: its centroids (sorted 'means' and their 'weights'),
+    the values not yet merged into them ('buffer'), and the count, min and
+    max of the values merged into the centroids
+    """
+    return {'compression': compression, 'count': 0, 'min': None, 'max': None,
+            'means': [], 'weights': [], 'buffer': []}
+
+def scale(q, compression):
+    """k1 scale function: the centroids are smaller near the tails"""
+    return compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+def inverse_scale(k, compression):
+    """Inverse of the scale function"""
+    return (math.sin(min(k * 2 * math.pi / compression, math.pi / 2)) + 1) / 2
+
+def compress_digest(digest, others=()):
+    """
+    Merge the buffered values, and the centroids of the 'others' digests,
+    into the centroids of a digest: all the centroids are sorted by mean
+    and adjacent ones are merged as long as the merged centroid does not
+    span more than one unit of the scale function
+    """
+    items = list(zip(digest['means'], digest['weights']))
+    items.extend((value, 1) for value in digest['buffer'])
+    bounds = [digest]
+    for other in others:
+        items.extend(zip(other['means'], other['weights']))
+        items.extend((value, 1) for value in other['buffer'])
+        bounds.append(other)
+    digest['buffer'] = []
+    if not items:
+        return
+    items.sort()
+    # the means of the centroids are within the min and max of their values
+    digest['min'] = min([items[0][0]] + [d['min'] for d in bounds if d['min'] is not None])
+    digest['max'] = max([items[-1][0]] + [d['max'] for d in bounds if d['max'] is not None])
+    compression = digest['compression']
+    total = sum(weight for _, weight in items)
+    digest['count'] = total
+    means = []
+    weights = []
+    mean, weight = items[0]
+    merged = 0
+    limit = total * inverse_scale(scale(0, compression) + 1, compression)
+    for item_mean, item_weight in items[1:]:
+        if merged + weight + item_weight <= limit:
+            weight += item_weight
+            mean += (item_mean - mean) * item_weight / weight
+        else:
+            means.append(mean)
+            weights.append(weight)
+            merged += weight
+            limit = total * inverse_scale(scale(merged / total, compression) + 1, compression)
+            mean, weight = item_mean, item_weight
+    means.append(mean)
+    weights.append(weight)
+    digest['means'] = means
+    digest['weights'] = weights
+
+def digest_add(digest, value):
+    """Add a value to a digest"""
+    buffer = digest['buffer']
+    buffer.append(value)
+    if len(buffer) >= BUFFER_FACTOR * digest['compression']:
+        compress_digest(digest)
+
+def merge_digests(digest, other):
+    """Add to a digest all the values summarized by another one"""
+    compress_digest(digest, (other,))
+
+def digest_count(digest):
+    """Number of values added to a digest"""
+    return digest['count'] + len(digest['buffer'])
+
+def digest_quantile(digest, q):
+    """
+    Estimate the q-quantile (0 <= q <= 1) of the values of a digest, by
+    interpolating between the centers of its centroids; None when empty
+    """
+    if digest['buffer']:
+        compress_digest(digest)
+    if not digest['count']:
+        return None
+    means = digest['means']
+    weights = digest['weights']
+    # the centroid of weight 'weight' covers the ranks [seen, seen + weight)
+    # and its mean is the value at its center: with single values, the
+    # quantile is interpolated between the closest ranks as numpy does
+    target = q * (digest['count'] - 1) + 0.5
+    # the min and the max are the values at the centers of the first and
+    # last ranks
+    previous_center = 0.5
+    previous_mean = digest['min']
+    seen = 0
+    for mean, weight in zip(means, weights):
+        center = seen + weight / 2.0
+        if target < center:
+            if center == previous_center:
+                return mean
+            fraction = (target - previous_center) / (center - previous_center)
+            return previous_mean + (mean - previous_mean) * fraction
+        previous_center = center
+        previous_mean = mean
+        seen += weight
+    last_center = seen - 0.5
+    if last_center <= previous_center:
+        return digest['max']
+    fraction = (target - previous_center) / (last_center - previous_center)
+    return previous_mean + (digest['max'] - previous_mean) * min(fraction, 1.0)
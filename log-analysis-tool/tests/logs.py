@@ -0,0 +1,90 @@
+"""Access log lines written by the tests"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+# Local time of the lines, in the timezone of the logs (+0200)
+START = datetime(2023, 10, 3, 0, 0, 0, tzinfo=timezone(timedelta(hours=2)))
+
+
+def stamp(seconds):
+    """'[03/Oct/2023:00:00:00.000000000 +0200]', 'seconds' after START"""
+    when = START + timedelta(seconds=seconds)
+    return '[%s.%09d +0200]' % (when.strftime('%d/%b/%Y:%H:%M:%S'), when.microsecond * 1000)
+
+
+def epoch(seconds):
+    """UTC epoch of the line 'seconds' after START"""
+    return START.timestamp() + seconds
+
+
+def connection(seconds, conn, client='10.0.0.1'):
+    return '%s conn=%d fd=64 slot=64 connection from %s to 10.0.0.254' % (stamp(seconds), conn, client)
+
+
+def request(seconds, conn, op, verb, rest=''):
+    return ('%s conn=%d op=%d %s %s' % (stamp(seconds), conn, op, verb, rest)).rstrip()
+
+
+def result(seconds, conn, op, tag=101, err=0, etime=0.001, wtime=0.0001, nentries=1, notes=None):
+    line = '%s conn=%d op=%d RESULT err=%d tag=%d nentries=%d wtime=%.9f optime=%.9f etime=%.9f' % (
+        stamp(seconds), conn, op, err, tag, nentries, wtime, etime - wtime, etime)
+    if notes:
+        line += ' notes=%s' % notes
+    return line
+
+
+def closed(seconds, conn, op, reason='U1'):
+    return '%s conn=%d op=%d fd=64 closed - %s' % (stamp(seconds), conn, op, reason)
+
+
+def session(seconds, conn, client='10.0.0.1', bind_err=0, searches=1):
+    """A connection binding, searching and unbinding"""
+    lines = [connection(seconds, conn, client),
+             request(seconds, conn, 0, 'BIND', 'dn="uid=user%d,ou=people,dc=example,dc=com" '
+                                               'method=128 version=3' % (conn % 50)),
+             result(seconds + 0.001, conn, 0, tag=97, err=bind_err, nentries=0)]
+    for op in range(1, searches + 1):
+        lines.append(request(seconds + 0.002, conn, op, 'SRCH',
+                             'base="dc=example,dc=com" scope=2 filter="(uid=user%d)" attrs=ALL' % op))
+        lines.append(result(seconds + 0.003, conn, op))
+    lines.append(request(seconds + 0.004, conn, searches + 1, 'UNBIND'))
+    lines.append(closed(seconds + 0.004, conn, searches + 1))
+    return lines
+
+
+def busy_log(duration, seed=1):
+    """
+    'duration' seconds of sessions every few seconds, with storms of failed
+    binds, bursts of abandons and runs of incoming connections
+    """
+    rng = random.Random(seed)
+    lines = []
+    conn = 1
+    seconds = 0
+    while seconds < duration:
+        kind = rng.random()
+        if kind < 0.03:
+            # password guessing: 60 failed binds in 30 seconds
+            for i in range(60):
+                lines.extend(session(seconds + i / 2, conn, '10.9.9.9', bind_err=49, searches=0))
+                conn += 1
+            seconds += 30
+        elif kind < 0.06:
+            for op in range(12):
+                lines.append(request(seconds, 7, 100 + op, 'ABANDON', 'targetop=NOTFOUND msgid=%d' % op))
+        elif kind < 0.09:
+            for _ in range(12):
+                lines.append(connection(seconds, conn, '10.0.0.%d' % rng.randrange(1, 5)))
+                conn += 1
+        else:
+            lines.extend(session(seconds, conn, '10.0.0.%d' % rng.randrange(1, 5)))
+            conn += 1
+        seconds += rng.choice((1, 2, 5))
+    return lines
+
+
+def write_log(path, lines):
+    with open(path, 'w') as f:
+        f.write(''.join(line + '\n' for line in lines))
+    return str(path)
@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from logs import closed, connection, epoch, request, result, write_log
+
+TOOL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'analyze_logs.py')
+
+CLIENTS = {1: '10.0.0.1', 2: '10.0.0.2'}
+
+
+def operations():
+    """(seconds, conn, op, verb, etime) of the operations of the log: one every 30 seconds"""
+    return [(30 * i, 1 + i % 2, i // 2 + 1, 'MOD' if i % 3 == 0 else 'SRCH', 0.25 * i)
+            for i in range(12)]
+
+
+def log_lines():
+    lines = [connection(0, conn, client) for conn, client in CLIENTS.items()]
+    for seconds, conn, op, verb, etime in operations():
+        if verb == 'SRCH':
+            lines.append(request(seconds, conn, op, verb,
+                                 'base="dc=example,dc=com" scope=2 filter="(uid=user%d)" attrs=ALL' % op))
+        else:
+            lines.append(request(seconds, conn, op, verb, 'dn="uid=user%d,dc=example,dc=com"' % op))
+        lines.append(result(seconds, conn, op, etime=etime))
+    lines += [closed(400, conn, 99) for conn in CLIENTS]
+    return lines
+
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp('store')
+    logs = tmp_path / 'logs'
+    logs.mkdir()
+    write_log(logs / 'access', log_lines())
+    path = str(tmp_path / 'analysis.db')
+    subprocess.run([sys.executable, TOOL, '--logs', str(logs), '--term', 'conn=', '--disable-ai',
+                    '--output', str(tmp_path / 'results.json'), '--store', path],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return path
+
+
+def query(store, *options):
+    output = subprocess.run([sys.executable, TOOL, '--store', store] + list(options),
+                            check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return [json.loads(line) for line in output.splitlines()]
+
+
+def selected(keep):
+    return [(epoch(seconds), conn, op, verb, etime, CLIENTS[conn])
+            for seconds, conn, op, verb, etime in operations()
+            if keep(seconds, conn, verb, etime)]
+
+
+def rows(found):
+    return [(row['epoch'], row['conn'], row['op'], row['verb'], row['etime'], row['client_ip'])
+            for row in found]
+
+
+def test_all_the_operations_are_stored_with_their_client(store):
+    assert rows(query(store, '--query', 'operations')) == selected(lambda *_: True)
+
+
+def test_operations_by_client_verb_and_etime(store):
+    assert rows(query(store, '--query', 'operations', '--client-ip', '10.0.0.2')) == \
+        selected(lambda seconds, conn, verb, etime: conn == 2)
+    assert rows(query(store, '--query', 'operations', '--verb', 'mod')) == \
+        selected(lambda seconds, conn, verb, etime: verb == 'MOD')
+    assert rows(query(store, '--query', 'operations', '--min-etime', '1.5', '--verb', 'SRCH')) == \
+        selected(lambda seconds, conn, verb, etime: etime >= 1.5 and verb == 'SRCH')
+
+
+def test_time_bounds_in_the_timezone_of_the_logs_or_their_own(store):
+    expected = selected(lambda seconds, conn, verb, etime: 90 <= seconds < 240)
+    assert len(expected) == 5
+    assert rows(query(store, '--query', 'operations', '--since', '03/Oct/2023:00:01:30',
+                      '--until', '03/Oct/2023:00:04:00')) == expected
+    assert rows(query(store, '--query', 'operations', '--since', '2023-10-02 22:01:30+00:00',
+                      '--until', '02/Oct/2023:23:04:00 +0100')) == expected
+
+
+def test_limit_keeps_the_first_rows(store):
+    assert rows(query(store, '--query', 'operations', '--limit', '3')) == \
+        selected(lambda *_: True)[:3]
+
+
+def test_connections_by_client(store):
+    connections = query(store, '--query', 'connections', '--client-ip', '10.0.0.1')
+    assert [(row['conn'], row['open_time'], row['close_time'], row['ops'], row['reason'])
+            for row in connections] == [(1, epoch(0), epoch(400), 6, 'U1')]
@@ -0,0 +1,106 @@
+import random
+
+from connection_store import ConnectionStore
+
+
+def events(n, seed):
+    """A stream of connects, operations and closes, connection numbers being reused"""
+    rng = random.Random(seed)
+    # connections opened before the logs start
+    open_conns = set(range(5))
+    stream = []
+    time = 1000.0
+    for _ in range(n):
+        time += rng.random()
+        action = rng.random()
+        if action < 0.2 or not open_conns:
+            conn = rng.randrange(40)
+            if conn not in open_conns:
+                open_conns.add(conn)
+                stream.append(('connect', conn, time, '10.0.0.%d' % rng.randrange(8)))
+        elif action < 0.85:
+            stream.append(('operation', rng.choice(sorted(open_conns)), rng.random()))
+        else:
+            conn = rng.choice(sorted(open_conns))
+            open_conns.remove(conn)
+            stream.append(('close', conn, time, rng.choice(('U1', 'B1', 'T1'))))
+    return stream
+
+
+def replay(stream):
+    store = ConnectionStore()
+    for action, *args in stream:
+        getattr(store, action)(*args)
+    return store
+
+
+def rows(store):
+    """The rows of a store, in a comparable form"""
+    saved = store.to_dict()
+    columns = saved['columns']
+    clients = saved['clients']
+    reasons = saved['reasons']
+    found = [(conn, opened, close, clients[client] if client >= 0 else None, ops, round(etime, 9),
+              reasons[reason] if reason >= 0 else None)
+             for conn, opened, close, client, ops, etime, reason in zip(
+                 columns['conn'], columns['open'], columns['close'], columns['client'],
+                 columns['ops'], columns['etime'], columns['reason'])]
+    return sorted(found, key=lambda row: [(value is None, 0 if value is None else value)
+                                          for value in row])
+
+
+def test_merge_continues_the_connections_across_chunks():
+    stream = events(3000, seed=1)
+    whole = replay(stream)
+    for seed in range(5):
+        rng = random.Random(seed)
+        cuts = sorted(rng.sample(range(1, len(stream)), 6))
+        chunks = [stream[lo:hi] for lo, hi in zip([0] + cuts, cuts + [len(stream)])]
+        merged = replay(chunks[0])
+        for chunk in chunks[1:]:
+            # as sent back by a --jobs worker
+            merged.merge(ConnectionStore.from_dict(replay(chunk).to_dict()))
+        assert rows(merged) == rows(whole)
+        assert sorted(merged.open_connections()) == sorted(whole.open_connections())
+        assert merged.lifecycle() == whole.lifecycle()
+
+
+def test_connection_open_in_two_chunks():
+    first = ConnectionStore()
+    first.connect(7, 100.0, '10.0.0.1')
+    first.operation(7, 0.5)
+    second = ConnectionStore()
+    second.operation(7, 0.25)
+    second.close(7, 110.0, 'U1')
+    # the number is reused by a new connection
+    second.connect(7, 120.0, '10.0.0.2')
+    first.merge(second)
+    assert rows(first) == [(7, 100.0, 110.0, '10.0.0.1', 2, 0.75, 'U1'),
+                           (7, 120.0, None, '10.0.0.2', 0, 0.0, None)]
+    assert first.open_connections() == [[7, 120.0, '10.0.0.2', 0, 0.0]]
+
+
+def test_merge_of_another_server_appends_its_rows():
+    first = ConnectionStore()
+    first.connect(7, 100.0, '10.0.0.1')
+    second = ConnectionStore()
+    second.operation(7, 0.25)
+    second.close(7, 110.0, 'U1')
+    first.merge(second, continuation=False)
+    assert rows(first) == [(7, 100.0, None, '10.0.0.1', 0, 0.0, None),
+                           (7, None, 110.0, None, 1, 0.25, 'U1')]
+    assert first.lifecycle()['open'] == 1
+    # the connection of the other server does not replace the open one
+    assert first.open_connections() == [[7, 100.0, '10.0.0.1', 0, 0.0]]
+
+
+def test_restore_continues_the_open_connections():
+    stream = events(2000, seed=2)
+    whole = replay(stream)
+    first = replay(stream[:1000])
+    # as in an --incremental run: only the open connections are kept
+    second = ConnectionStore()
+    second.restore(first.open_connections())
+    for action, *args in stream[1000:]:
+        getattr(second, action)(*args)
+    assert sorted(second.open_connections()) == sorted(whole.open_connections())
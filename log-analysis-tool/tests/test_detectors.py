@@ -0,0 +1,142 @@
+import random
+
+from analyze_logs import (AccessRecord, Detector, DETECTORS, SETTLED, detect, detector_state,
+                          init_detectors, tokenize_access_line)
+
+SECONDS = 5
+THRESHOLD = 4
+SLIDING = Detector('failures', 'event_failures', lambda record: record.verb == 'FAIL', 'sliding',
+                   SECONDS, THRESHOLD, (('critical', 8), ('warning', THRESHOLD)), 'failures')
+
+
+def record(epoch, verb='FAIL'):
+    return AccessRecord('[%d]' % epoch, epoch, None, None, verb, None, None, None,
+                        None, None, None, None, '', None)
+
+
+def run(records, detector=SLIDING):
+    diag, results = init_detectors({}, {}, [detector])
+    for r in records:
+        detect(r, diag, results, [detector])
+    return diag[detector.name], results[detector.name][detector.events]
+
+
+def test_sliding_count_wraps_around_the_ring():
+    rng = random.Random(1)
+    diag, results = init_detectors({}, {}, [SLIDING])
+    state = diag[SLIDING.name]
+    seen = []
+    epoch = 1000
+    # many laps of the ring, with repeated seconds and short gaps
+    for _ in range(5000):
+        epoch += rng.choice((0, 0, 1, 1, 2, 3))
+        r = record(epoch, rng.choice(('FAIL', 'FAIL', 'OK')))
+        detect(r, diag, results, [SLIDING])
+        if r.verb == 'FAIL':
+            seen.append(epoch)
+        expected = sum(1 for second in seen if epoch - SECONDS < second <= epoch)
+        assert state['count'] == expected
+        assert sum(state['counts']) == expected
+
+
+def test_sliding_gap_longer_than_window_clears_it():
+    state, events = run([record(100)] * 3 + [record(100 + SECONDS + 7)])
+    assert state['count'] == 1
+    assert sum(state['counts']) == 1
+    assert events == []
+
+
+def test_sliding_drops_the_second_leaving_the_window():
+    state, _ = run([record(100), record(101), record(100 + SECONDS)])
+    # 100 left the window (100 + SECONDS - SECONDS < second)
+    assert state['count'] == 2
+
+
+def test_sliding_registers_an_episode_once_below_threshold():
+    records = ([record(10)] * 2 + [record(11)] * 3 +  # 5 >= THRESHOLD from the 4th
+               [record(12)] * 4 +                       # up to 9
+               [record(30, 'OK')])                      # window empty again
+    state, events = run(records)
+    assert len(events) == 1
+    event = events[0]
+    assert event['count'] == 9
+    assert event['severity'] == 'critical'
+    assert event['epoch'] == 11
+    assert event['timematch'] == '[11]'
+    assert state['epoch'] is None and state['maxcount'] == 0
+
+
+def test_sliding_episode_spans_the_seconds_a_second_window_misses():
+    # never more than 2 per second, THRESHOLD reached over the window
+    records = [record(epoch) for epoch in range(50, 54) for _ in range(2)]
+    _, events = run(records + [record(80, 'OK')])
+    assert [event['count'] for event in events] == [8]
+
+
+def test_failed_binds_detector():
+    detector = next(detector for detector in DETECTORS if detector.name == 'failed_binds')
+    assert detector.window == 'sliding'
+    line = ('[03/Oct/2023:00:50:%02d.000000000 +0200] conn=7 op=%d RESULT err=%d tag=97 '
+            'nentries=0 wtime=0.000100000 optime=0.000200000 etime=0.000300000')
+    records = [tokenize_access_line(line % (second, op, 49))
+               for op, second in enumerate(range(60))]
+    # successful binds are not counted
+    records += [tokenize_access_line(line % (59, 100 + op, 0)) for op in range(10)]
+    diag, results = init_detectors({}, {})
+    for r in records:
+        detect(r, diag, results)
+    assert diag['failed_binds']['count'] == 60
+    assert diag['failed_binds']['maxcount'] == 60
+    assert results['failed_binds']['event_failed_binds'] == []
+
+
+def access_records(n, seed):
+    """Normal traffic with storms of connections, abandons and failed binds"""
+    rng = random.Random(seed)
+    # the verbs of each kind of traffic and the seconds between its records
+    storms = [(('CONNECT', 'ABANDON', 'BIND', 'SRCH', 'SRCH', 'SRCH'), (0, 0, 0, 1, 2, 30)),
+              (('CONNECT',), (0, 0, 1)),
+              (('ABANDON', 'SRCH'), (0, 0, 0, 0, 0, 1)),
+              (('BIND', 'SRCH'), (0,) * 10 + (1,))]
+    epoch = 5000
+    records = []
+    while len(records) < n:
+        kinds, steps = rng.choice(storms)
+        for _ in range(rng.randrange(10, 300)):
+            epoch += rng.choice(steps)
+            kind = rng.choice(kinds)
+            if kind == 'ABANDON':
+                rest = 'targetop=NOTFOUND msgid=2'
+            elif kind == 'SRCH':
+                rest = 'base="dc=example,dc=com" scope=2 filter="(uid=x)"'
+            else:
+                rest = 'from 10.0.0.%d' % rng.randrange(4)
+            records.append(AccessRecord('[%d]' % epoch, epoch, None, None, kind, None, None, None,
+                                        None, None, None, None, rest, None))
+            if kind == 'BIND':
+                records.append(record(epoch, 'RESULT')._replace(tag='97', err=49))
+    return records
+
+
+def test_settled_detectors_no_longer_depend_on_the_previous_state():
+    records = access_records(20000, seed=3)
+    rng = random.Random(4)
+    for cut in sorted(rng.sample(range(1, len(records)), 40)):
+        diag, results = init_detectors({}, {})
+        for r in records[:cut]:
+            detect(r, diag, results)
+        fresh, fresh_results = init_detectors({}, {})
+        unsettled = DETECTORS
+        first = None
+        for r in records[cut:]:
+            detect(r, diag, results)
+            detect(r, fresh, fresh_results)
+            if first is None:
+                first = r.epoch
+            unsettled = [detector for detector in unsettled
+                         if not SETTLED[detector.window](detector, fresh[detector.name], r, first)]
+            if not unsettled:
+                break
+        else:
+            continue
+        assert detector_state(diag) == detector_state(fresh)
@@ -0,0 +1,80 @@
+import random
+from collections import Counter
+
+from heavy_hitters import merge_sketches, new_sketch, sketch_add, sketch_top
+
+CAPACITY = 50
+
+
+def zipf_stream(n, keys, seed):
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    return rng.choices(['key%d' % rank for rank in range(keys)], weights, k=n)
+
+
+def check_bounds(sketch, truth):
+    total = sum(truth.values())
+    counters = sketch['counters']
+    floor = sketch['floor']
+    # Space-Saving: an untracked key occurred at most 'floor' <= N / capacity times
+    assert floor <= total / sketch['capacity']
+    for key, true in truth.items():
+        if key in counters:
+            count, error = counters[key]
+            assert count - error <= true <= count
+            assert error <= floor
+        else:
+            assert true <= floor
+
+
+def test_space_saving_error_bounds():
+    stream = zipf_stream(50000, 5000, seed=1)
+    sketch = new_sketch(CAPACITY)
+    for key in stream:
+        sketch_add(sketch, key)
+    assert sketch['floor'] > 0  # the sketch did evict keys
+    assert len(sketch['counters']) <= 2 * CAPACITY
+    check_bounds(sketch, Counter(stream))
+
+
+def test_space_saving_finds_the_heavy_hitters():
+    stream = zipf_stream(50000, 5000, seed=2)
+    truth = Counter(stream)
+    sketch = new_sketch(CAPACITY)
+    for key in stream:
+        sketch_add(sketch, key)
+    top = sketch_top(sketch, 5)
+    assert [item['key'] for item in top] == [key for key, _ in truth.most_common(5)]
+    # every key occurring more than 'floor' times is tracked
+    assert all(key in sketch['counters'] for key, true in truth.items() if true > sketch['floor'])
+
+
+def test_weighted_add():
+    sketch = new_sketch(CAPACITY)
+    sketch_add(sketch, 'a', 5)
+    sketch_add(sketch, 'a')
+    assert sketch_top(sketch) == [{'key': 'a', 'count': 6, 'error': 0}]
+
+
+def test_merge_keeps_the_error_bounds():
+    streams = [zipf_stream(20000, 3000, seed) for seed in (3, 4, 5)]
+    merged = new_sketch(CAPACITY)
+    for stream in streams:
+        sketch = new_sketch(CAPACITY)
+        for key in stream:
+            sketch_add(sketch, key)
+        merge_sketches(merged, sketch)
+    assert len(merged['counters']) <= 2 * CAPACITY
+    check_bounds(merged, Counter(key for stream in streams for key in stream))
+
+
+def test_merge_of_exact_sketches_is_exact():
+    first, second = new_sketch(CAPACITY), new_sketch(CAPACITY)
+    for key in 'aab':
+        sketch_add(first, key)
+    for key in 'bbc':
+        sketch_add(second, key)
+    merge_sketches(first, second)
+    assert sketch_top(first) == [{'key': 'b', 'count': 3, 'error': 0},
+                                 {'key': 'a', 'count': 2, 'error': 0},
+                                 {'key': 'c', 'count': 1, 'error': 0}]
@@ -0,0 +1,58 @@
+import math
+
+import pytest
+
+from hyperloglog import PRECISION, estimate_distinct, merge_registers, new_registers, registers_add
+
+# standard error of the estimates
+ERROR = 1.04 / math.sqrt(1 << PRECISION)
+
+
+def registers_of(values):
+    registers = new_registers()
+    for value in values:
+        registers_add(registers, value)
+    return registers
+
+
+@pytest.mark.parametrize('distinct', [1000, 10000, 100000])
+def test_relative_error(distinct):
+    ips = ['10.%d.%d.%d' % (i >> 16, (i >> 8) & 255, i & 255) for i in range(distinct)]
+    assert abs(estimate_distinct(registers_of(ips)) - distinct) <= 3 * ERROR * distinct
+    connections = range(distinct)
+    assert abs(estimate_distinct(registers_of(connections)) - distinct) <= 3 * ERROR * distinct
+
+
+def test_mean_relative_error():
+    errors = [(estimate_distinct(registers_of(range(run * 10**6, run * 10**6 + 20000))) - 20000) / 20000
+              for run in range(20)]
+    assert math.sqrt(sum(error * error for error in errors) / len(errors)) <= 1.5 * ERROR
+
+
+def test_small_counts_are_almost_exact():
+    # linear counting of the empty registers: few collisions while most are empty
+    for distinct in (0, 1, 10, 100):
+        assert abs(estimate_distinct(registers_of(map(str, range(distinct)))) - distinct) <= max(1, distinct * 0.05)
+
+
+def test_duplicates_are_not_counted():
+    values = ['cn=user%d' % (i % 500) for i in range(20000)]
+    assert registers_of(values) == registers_of(values[:500])
+
+
+def test_merge_is_the_union():
+    first = ['uid=a%d' % i for i in range(30000)]
+    second = ['uid=a%d' % i for i in range(20000, 60000)]
+    registers = registers_of(first)
+    merge_registers(registers, registers_of(second))
+    assert registers == registers_of(first + second)
+    assert abs(estimate_distinct(registers) - 60000) <= 3 * ERROR * 60000
+
+
+def test_merge_with_empty_registers():
+    registers = registers_of(range(5000))
+    merged = new_registers()
+    merge_registers(merged, registers)
+    assert merged == registers
+    merge_registers(merged, new_registers())
+    assert merged == registers
@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+
+from logs import busy_log, write_log
+
+TOOL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'analyze_logs.py')
+
+
+def analyze(logs, output, *options):
+    subprocess.run([sys.executable, TOOL, '--logs', str(logs), '--term', 'conn=', '--disable-ai',
+                    '--output', str(output)] + list(options),
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with open(output) as f:
+        return json.load(f)
+
+
+def events(results):
+    return sorted(json.dumps(event, sort_keys=True)
+                  for name, result in results['analysis'].items() if isinstance(result, dict)
+                  for key, found in result.items() if key.startswith('event')
+                  for event in found)
+
+
+def minute_counts(results, minutes):
+    return {(row['minute'], row['verb']): row['count']
+            for row in results['latency']['digests_by_verb_minute'] if row['minute'] in minutes}
+
+
+def test_runs_cover_the_appended_lines_and_the_state_stays_small(tmp_path):
+    lines = busy_log(1800)
+    whole, logs = tmp_path / 'whole', tmp_path / 'logs'
+    whole.mkdir()
+    logs.mkdir()
+    write_log(whole / 'access', lines)
+    single = analyze(whole, tmp_path / 'single.json')
+
+    state = tmp_path / 'state'
+    cut = len(lines) // 2
+    write_log(logs / 'access', lines[:cut])
+    first = analyze(logs, tmp_path / 'first.json', '--incremental', str(state))
+    # the state only keeps the digests of the last minutes
+    with open(state) as f:
+        carried = {int(minute) for minute in json.load(f)['latency_digests']}
+    assert 0 < len(carried) <= 2
+    write_log(logs / 'access', lines)
+    second = analyze(logs, tmp_path / 'second.json', '--incremental', str(state))
+
+    assert sorted(events(first) + events(second)) == events(single)
+    assert first['latency']['operations'] + second['latency']['operations'] == \
+        single['latency']['operations']
+    # the second run reports its minutes, the last ones of the first run completed
+    first_minutes = {row['minute'] for row in first['latency']['digests_by_verb_minute']}
+    second_minutes = {row['minute'] for row in second['latency']['digests_by_verb_minute']}
+    assert first_minutes & second_minutes <= carried
+    assert first_minutes | second_minutes == \
+        {row['minute'] for row in single['latency']['digests_by_verb_minute']}
+    # and the minutes spanning the two runs are complete
+    assert minute_counts(second, carried) == minute_counts(single, carried)
@@ -0,0 +1,48 @@
+import random
+
+from interval_tree import IntervalTree
+
+
+def brute_force(intervals, start, end):
+    return sorted(interval for interval in intervals if interval[0] <= end and interval[1] >= start)
+
+
+def test_overlap_matches_brute_force():
+    rng = random.Random(1)
+    for size in (1, 2, 3, 10, 100, 1000):
+        intervals = []
+        for item in range(size):
+            start = rng.uniform(0, 1000)
+            # mostly short operations, a few long updates
+            length = rng.expovariate(1 / 5) if rng.random() < 0.9 else rng.uniform(0, 500)
+            intervals.append((start, start + length, item))
+        tree = IntervalTree(intervals)
+        assert len(tree) == size
+        for _ in range(200):
+            start = rng.uniform(-50, 1050)
+            end = start + rng.choice((0, rng.expovariate(1 / 10), rng.uniform(0, 1000)))
+            found = tree.overlap(start, end)
+            assert [interval[:2] for interval in found] == sorted(interval[:2] for interval in found)
+            assert sorted(found) == brute_force(intervals, start, end)
+
+
+def test_overlap_bounds_are_inclusive():
+    tree = IntervalTree([(10, 20, 'a'), (20, 30, 'b'), (31, 31, 'c')])
+    assert [item for _, _, item in tree.overlap(20, 20)] == ['a', 'b']
+    assert [item for _, _, item in tree.overlap(30, 31)] == ['b', 'c']
+    assert tree.overlap(21, 29) == [(20, 30, 'b')]
+    assert tree.overlap(0, 9.5) == []
+    assert tree.overlap(32, 40) == []
+
+
+def test_integer_and_duplicate_intervals():
+    intervals = [(5, 8, item) for item in range(4)] + [(0, 100, 'long')]
+    tree = IntervalTree(intervals)
+    assert sorted(tree.overlap(6, 6), key=str) == sorted(intervals, key=str)
+    assert tree.overlap(9, 50) == [(0, 100, 'long')]
+
+
+def test_empty_tree():
+    tree = IntervalTree([])
+    assert len(tree) == 0
+    assert tree.overlap(0, 10) == []
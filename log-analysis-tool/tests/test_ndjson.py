@@ -0,0 +1,33 @@
+import io
+import json
+
+from analyze_logs import NdjsonWriter, init_detectors, write_events_while
+
+
+def test_events_are_written_before_the_next_match():
+    stream = io.StringIO()
+    writer = NdjsonWriter(stream)
+    _, results = init_detectors({}, {})
+    writer.start(results)
+    written = []
+    for match in write_events_while(iter(range(5)), writer, results):
+        written.append(len(stream.getvalue().splitlines()))
+        if match == 2:
+            # as registered by the detectors on this match
+            results['abandon_too_late']['event_abandon_too_late'].append({'count': 10})
+    assert written == [0, 0, 0, 1, 1]
+    assert json.loads(stream.getvalue()) == {
+        'type': 'event', 'detector': 'abandon_too_late', 'index': 0, 'event': {'count': 10}}
+
+
+def test_only_the_events_after_start_are_written():
+    stream = io.StringIO()
+    writer = NdjsonWriter(stream)
+    _, results = init_detectors({}, {})
+    events = results['server_unresponsive']['event_unresponsive']
+    events.append({'count': 12})
+    writer.start(results)
+    events.append({'count': 20})
+    writer.write_new_events(results)
+    writer.write_new_events(results)
+    assert [json.loads(line)['index'] for line in stream.getvalue().splitlines()] == [1]
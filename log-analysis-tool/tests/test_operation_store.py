@@ -0,0 +1,105 @@
+import numpy as np
+from pytest import approx
+
+from analyze_logs import analyze_log_entries
+from operation_store import OperationStore, busy_intervals, group_percentiles
+
+from logs import epoch, request, result
+
+SEARCH = 'base="dc=example,dc=com" scope=2 filter="(uid=user1)" attrs=ALL'
+BIND = 'dn="uid=user1,ou=people,dc=example,dc=com" method=128 version=3'
+
+
+def store(lines):
+    operations = OperationStore()
+    analyze_log_entries(({'content': line} for line in lines), operations=operations)
+    return operations
+
+
+def test_group_percentiles_match_numpy():
+    rng = np.random.default_rng(1)
+    keys = rng.integers(0, 7, 1000)
+    values = rng.exponential(1.0, 1000)
+    values[rng.integers(0, 1000, 50)] = np.nan
+    groups, counts, result = group_percentiles(keys, values, (0, 50, 95, 99, 100))
+    assert groups.tolist() == list(range(7))
+    for i, key in enumerate(groups):
+        group = values[(keys == key) & ~np.isnan(values)]
+        assert counts[i] == len(group)
+        for percentile in (0, 50, 95, 99, 100):
+            assert result[percentile][i] == approx(np.percentile(group, percentile))
+
+
+def test_etime_percentiles_by_verb_and_minute():
+    lines = []
+    for op, etime in enumerate((0.1, 0.4, 0.2)):
+        lines += [request(op, 1, op, 'SRCH', SEARCH), result(op + 0.5, 1, op, etime=etime)]
+    lines += [request(10, 2, 0, 'BIND', BIND), result(10, 2, 0, tag=97, etime=1.0),
+              request(70, 1, 5, 'SRCH', SEARCH), result(70, 1, 5, etime=0.3),
+              # no request: counted without a verb
+              result(71, 3, 9, etime=2.0),
+              # no result: no etime
+              request(72, 1, 6, 'SRCH', SEARCH)]
+    rows = store(lines).etime_by_verb_minute()
+    minute = epoch(0)
+    assert [(row['minute'], row['verb'], row['count']) for row in rows] == [
+        (minute, 'SRCH', 3), (minute, 'BIND', 1),
+        (minute + 60, None, 1), (minute + 60, 'SRCH', 1)]
+    searches = rows[0]
+    assert searches['p50'] == approx(0.2)
+    assert searches['p95'] == approx(0.2 + (0.4 - 0.2) * 0.9)
+    assert searches['p99'] == approx(0.2 + (0.4 - 0.2) * 0.98)
+    assert rows[1]['p50'] == rows[1]['p99'] == approx(1.0)
+    assert rows[3]['p50'] == approx(0.3)
+
+
+def test_wtime_percentiles_by_second():
+    lines = []
+    for op, wtime in enumerate((0.001, 0.003, 0.002, 0.004)):
+        lines += [request(op // 2, 1, op, 'SRCH', SEARCH),
+                  result(op // 2 + 0.5, 1, op, etime=0.01, wtime=wtime)]
+    rows = store(lines).wtime_by_second()
+    assert [(row['second'], row['count']) for row in rows] == [(epoch(0), 2), (epoch(1), 2)]
+    assert rows[0]['p50'] == approx(0.002)
+    assert rows[1]['p50'] == approx(0.003)
+    assert rows[1]['p99'] == approx(0.002 + 0.002 * 0.99)
+
+
+def test_merge_appends_the_operations():
+    first = store([request(0, 1, 1, 'SRCH', SEARCH), result(0, 1, 1, etime=0.1)])
+    second = store([request(1, 1, 2, 'SRCH', SEARCH), result(1, 1, 2, etime=0.3)])
+    first.merge(second)
+    assert len(first) == 2
+    assert first.column('etime').tolist() == [0.1, 0.3]
+    assert first.etime_by_verb_minute()[0]['p50'] == approx(0.2)
+
+
+def test_busy_intervals_match_a_brute_force_count():
+    rng = np.random.default_rng(2)
+    starts = rng.integers(0, 200, 300).astype(np.float64)
+    ends = starts + rng.integers(1, 20, 300)
+    starts[:5] = np.nan
+    for threshold in (1, 5, 10):
+        peak, intervals = busy_intervals(starts, ends, threshold)
+        valid = ~np.isnan(starts)
+        assert peak == max(np.sum((starts[valid] <= t) & (t < ends[valid])) for t in range(220))
+        for t in np.arange(0.5, 220):
+            level = np.sum((starts[valid] <= t) & (t < ends[valid]))
+            inside = [busy for start, end, busy in intervals if start <= t < end]
+            assert bool(inside) == (level >= threshold)
+            assert all(busy >= level for busy in inside)
+
+
+def test_saturation_at_the_thread_number():
+    # busy from the RESULT time minus the optime to the RESULT time
+    lines = [result(10, 1, 1, etime=4, wtime=0),     # 6 - 10
+             result(9, 2, 1, etime=2, wtime=0),      # 7 - 9
+             result(12, 3, 1, etime=1.5, wtime=0),   # 10.5 - 12
+             result(11, 4, 1, etime=2, wtime=0)]     # 9 - 11
+    saturation = store(lines).saturation(2)
+    assert saturation['max_busy'] == 2
+    assert [(interval['start'], interval['end'], interval['peak'])
+            for interval in saturation['intervals']] == [(epoch(7), epoch(10), 2),
+                                                          (epoch(10.5), epoch(11), 2)]
+    assert saturation['busy_seconds'] == approx(3.5)
+    assert store(lines).saturation(3)['intervals'] == []
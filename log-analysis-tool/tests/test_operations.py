@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+from analyze_logs import iter_operations, tokenize_access_line
+
+from logs import epoch, request, result
+
+SEARCH = 'base="dc=example,dc=com" scope=2 filter="(uid=user1)" attrs=ALL'
+
+
+def records(lines):
+    return [tokenize_access_line(line) for line in lines]
+
+
+def test_requests_are_joined_to_their_result():
+    lines = [request(0, 1, 0, 'BIND', 'dn="uid=user1,ou=people,dc=example,dc=com" method=128 version=3'),
+             request(0.1, 2, 0, 'SRCH', SEARCH),
+             # the RESULT lines are not in the order of the requests
+             result(0.2, 2, 0, etime=0.1, nentries=3),
+             result(1.5, 1, 0, tag=97, err=49, etime=1.5, nentries=0)]
+    search, bind = iter_operations(records(lines))
+    assert (search.conn, search.op, search.verb) == (2, 0, 'SRCH')
+    assert (search.base, search.scope, search.filter) == ('dc=example,dc=com', 2, '(uid=user1)')
+    assert (search.epoch, search.nentries, search.etime, search.err) == (epoch(0), 3, 0.1, 0)
+    assert (bind.conn, bind.verb, bind.base) == (1, 'BIND', 'uid=user1,ou=people,dc=example,dc=com')
+    assert (bind.err, bind.etime) == (49, 1.5)
+
+
+def test_unmatched_results_and_requests():
+    lines = [result(0, 5, 3, etime=0.5),
+             request(1, 6, 1, 'SRCH', SEARCH),
+             # not answered by a RESULT line
+             request(1, 6, 2, 'UNBIND')]
+    unmatched, pending = iter_operations(records(lines))
+    # the request is before the analyzed lines
+    assert (unmatched.conn, unmatched.op, unmatched.verb, unmatched.etime) == (5, 3, None, 0.5)
+    # still in flight at the end
+    assert (pending.conn, pending.op, pending.verb, pending.etime) == (6, 1, 'SRCH', None)
+
+
+def test_in_flight_is_left_for_the_following_records():
+    in_flight = OrderedDict()
+    first = list(iter_operations(records([request(0, 1, 1, 'SRCH', SEARCH)]), in_flight,
+                                 flush=False))
+    assert first == []
+    assert list(in_flight) == [(1, 1)]
+    operation, = iter_operations(records([result(2, 1, 1, etime=2.0)]), in_flight, flush=False)
+    assert (operation.verb, operation.epoch, operation.etime) == ('SRCH', epoch(0), 2.0)
+    assert not in_flight
+
+
+def test_oldest_request_is_evicted_when_in_flight_overflows():
+    lines = [request(i, conn, 1, 'SRCH', SEARCH) for i, conn in enumerate((1, 2, 3, 4))]
+    lines += [result(5, 4, 1), result(5, 1, 1)]
+    in_flight = OrderedDict()
+    operations = list(iter_operations(records(lines), in_flight, max_in_flight=2, flush=False))
+    # conns 1 and 2 overflow without their result, which then has no request
+    assert [(operation.conn, operation.verb, operation.etime) for operation in operations] == [
+        (1, 'SRCH', None), (2, 'SRCH', None), (4, 'SRCH', 0.001), (1, None, 0.001)]
+    assert list(in_flight) == [(3, 1)]
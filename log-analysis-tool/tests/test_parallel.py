@@ -0,0 +1,27 @@
+import analyze_logs
+from analyze_logs import analyze_log_entries, analyze_log_files_parallel, iter_log_matches
+
+from logs import busy_log, write_log
+
+
+def test_chunks_converge_to_the_sequential_run(tmp_path, monkeypatch):
+    path = write_log(tmp_path / 'access', busy_log(3000))
+    sequential = analyze_log_entries(iter_log_matches([path], 'conn='))
+    assert sequential['failed_binds']['event_failed_binds']
+
+    outcomes = []
+    stitch_records = analyze_logs.stitch_records
+
+    def recording(*args):
+        stitched = stitch_records(*args)
+        outcomes.append(stitched is not None)
+        return stitched
+
+    monkeypatch.setattr(analyze_logs, 'stitch_records', recording)
+    monkeypatch.setattr(analyze_logs, 'MIN_CHUNK_SIZE', 64 * 1024)
+    total, _, parallel, _ = analyze_log_files_parallel([path], 'conn=', jobs=2, max_matches=10**6)
+    assert parallel == sequential
+    # every chunk after the first one is stitched from its snapshots,
+    # none of them is detected again by the parent
+    assert len(outcomes) >= 6
+    assert all(outcomes)
@@ -0,0 +1,84 @@
+import gzip
+import os
+
+import numpy as np
+
+from analyze_logs import (analyze_log_entries, cache_key, iter_log_matches, open_cache_entries,
+                          parse_time_bound, plan_time_window_ranges, tokenize_access_line)
+from parse_cache import ParseCache, load_column, save_column
+
+from logs import busy_log, write_log
+
+
+def rotated_logs(tmp_path):
+    lines = busy_log(3000)
+    half = len(lines) // 2
+    plain = write_log(tmp_path / 'access.20231003-000000', lines[:half])
+    compressed = str(tmp_path / 'access.20231003-010000.gz')
+    with gzip.open(compressed, 'wt') as f:
+        f.write(''.join(line + '\n' for line in lines[half:]))
+    return [plain, compressed]
+
+
+def test_key_changes_with_the_content(tmp_path):
+    path = write_log(tmp_path / 'access.20231003-000000', busy_log(100))
+    key = cache_key(path)
+    assert cache_key(path) == key
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    touched = cache_key(path)
+    assert touched != key
+    with open(path, 'a') as f:
+        f.write(busy_log(10)[0] + '\n')
+    assert cache_key(path) not in (key, touched)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ParseCache(str(tmp_path / 'cache'), budget=3 * 8000 + 1000)
+
+    def writer(value):
+        def write(path):
+            save_column(path, 'values', [value] * 1000, np.int64)
+            return {'value': value}
+        return write
+
+    for i, key in enumerate(('a', 'b', 'c')):
+        cache.store(key, writer(i))
+        # explicit last uses: the entries are created within the same second
+        os.utime(os.path.join(cache.path(key), 'meta.json'), (1000 + i, 1000 + i))
+    # 'a' is read: 'b' becomes the least recently used entry
+    entry = cache.lookup('a')
+    assert entry['value'] == 0
+    assert load_column(entry['path'], 'values').tolist() == [0] * 1000
+    cache.store('d', writer(3))
+    assert [key for key in 'abcd' if cache.lookup(key) is not None] == ['a', 'c', 'd']
+    # the new entry is kept even when it alone exceeds the budget
+    small = ParseCache(str(tmp_path / 'small'), budget=100)
+    small.store('a', writer(0))
+    small.store('b', writer(1))
+    assert small.lookup('a') is None
+    assert small.lookup('b')['value'] == 1
+
+
+def test_output_is_the_same_with_a_cold_and_a_warm_cache(tmp_path):
+    files = rotated_logs(tmp_path)
+    cache = ParseCache(str(tmp_path / 'cache'))
+    ranges = plan_time_window_ranges(files, parse_time_bound('03/Oct/2023:00:20:00'),
+                                     parse_time_bound('03/Oct/2023:00:40:00'))
+    for window in (None, ranges):
+        uncached = list(iter_log_matches(files, 'conn=', ranges=window))
+        assert uncached
+        for _ in ('cold', 'warm'):
+            entries = open_cache_entries(files, cache)
+            assert sorted(entries) == sorted(files)
+            cached = list(iter_log_matches(files, 'conn=', ranges=window, cache_entries=entries))
+            assert [{key: value for key, value in match.items() if key != 'record'}
+                    for match in cached] == uncached
+            assert [match['record'] for match in cached] == [
+                tokenize_access_line(match['content']) for match in uncached]
+    expected = analyze_log_entries(iter_log_matches(files, 'conn='))
+    assert expected['abandon_too_late']['event_abandon_too_late']
+    for _ in ('cold', 'warm'):
+        cache = ParseCache(str(tmp_path / 'analysis'))
+        entries = open_cache_entries(files, cache)
+        assert analyze_log_entries(iter_log_matches(files, 'conn=', cache_entries=entries)) == expected
@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+import pytest
+
+from tdigest import (COMPRESSION, digest_add, digest_count, digest_quantile, merge_digests,
+                     new_digest)
+
+QUANTILES = (0.01, 0.1, 0.5, 0.9, 0.99, 0.999)
+
+
+def latencies(n, seed):
+    return np.random.default_rng(seed).lognormal(mean=-5, sigma=1.5, size=n)
+
+
+def build(values):
+    digest = new_digest()
+    for value in values:
+        digest_add(digest, float(value))
+    return digest
+
+
+def check_accuracy(digest, values):
+    """
+    A centroid spans at most one unit of the k1 scale, 2 pi / compression *
+    sqrt(q (1 - q)) in quantile around q: interpolating between the centers,
+    the estimate is within half of it from the exact quantile
+    """
+    for q in QUANTILES:
+        error = math.pi / digest['compression'] * math.sqrt(q * (1 - q))
+        low, high = np.quantile(values, [max(q - error, 0), min(q + error, 1)])
+        assert low <= digest_quantile(digest, q) <= high
+
+
+def test_quantiles_match_numpy_on_few_values():
+    # too few values to merge any centroid
+    values = latencies(20, seed=1)
+    digest = build(values)
+    for q in (0.0,) + QUANTILES + (1.0,):
+        assert digest_quantile(digest, q) == pytest.approx(np.quantile(values, q))
+
+
+def test_quantile_accuracy():
+    values = latencies(100000, seed=2)
+    digest = build(values)
+    assert digest_count(digest) == len(values)
+    assert len(digest['means']) <= COMPRESSION
+    check_accuracy(digest, values)
+    assert digest_quantile(digest, 0) == values.min()
+    assert digest_quantile(digest, 1) == values.max()
+
+
+def test_merge():
+    parts = [latencies(25000, seed) for seed in range(3, 7)]
+    merged = new_digest()
+    for part in parts:
+        merge_digests(merged, build(part))
+    values = np.concatenate(parts)
+    assert digest_count(merged) == len(values)
+    assert len(merged['means']) <= COMPRESSION
+    check_accuracy(merged, values)
+    assert digest_quantile(merged, 0) == values.min()
+    assert digest_quantile(merged, 1) == values.max()
+
+
+def test_merge_with_unmerged_buffers():
+    first, second = build([1.0, 2.0]), build([3.0, 4.0, 5.0])
+    merge_digests(first, second)
+    assert digest_count(first) == 5
+    assert digest_quantile(first, 0.5) == 3.0
+
+
+def test_empty_digest():
+    digest = new_digest()
+    assert digest_count(digest) == 0
+    assert digest_quantile(digest, 0.5) is None
+    merge_digests(digest, new_digest())
+    assert digest_quantile(digest, 0.5) is None
@@ -0,0 +1,78 @@
+import json
+import os
+
+from analyze_logs import (TIME_INDEX_SUFFIX, load_time_index, parse_time_bound,
+                          plan_time_window_ranges, tokenize_access_line)
+
+from logs import connection, epoch, write_log
+
+
+def lines_every(step, count, start=0, first_conn=1):
+    return [connection(start + i * step, first_conn + i) for i in range(count)]
+
+
+def window(path, since=None, until=None):
+    """The lines of the range planned for a time window, and the lines before it"""
+    start, end, line_offset = plan_time_window_ranges([path], since, until)[path]
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data[:start].count(b'\n') == line_offset
+    return data[start:end].decode().splitlines(), line_offset
+
+
+def expected(lines, since, until):
+    return [line for line in lines
+            if since <= tokenize_access_line(line).epoch < until]
+
+
+def test_window_selects_the_lines_in_range(tmp_path):
+    lines = lines_every(7, 90)
+    path = write_log(tmp_path / 'access', lines)
+    selected, before = window(path, parse_time_bound('03/Oct/2023:00:03:10'),
+                              parse_time_bound('03/Oct/2023:00:07:00'))
+    assert selected == expected(lines, epoch(190), epoch(420))
+    assert before == lines.index(selected[0])
+    # the same times, in ISO 8601 with another timezone offset
+    assert window(path, parse_time_bound('2023-10-02 22:03:10+00:00'),
+                  parse_time_bound('2023-10-02T22:07:00+00:00')) == (selected, before)
+    # open bounds
+    assert window(path, until=parse_time_bound('03/Oct/2023:00:03:10'))[0] == lines[:before]
+    assert window(path, since=parse_time_bound('03/Oct/2023:00:07:00'))[0] == \
+        expected(lines, epoch(420), epoch(10 ** 6))
+    # before and after the logs
+    assert window(path, parse_time_bound('03/Oct/2023:01:00:00'))[0] == []
+    assert window(path, until=parse_time_bound('02/Oct/2023:23:00:00'))[0] == []
+
+
+def test_index_is_extended_when_the_file_grows(tmp_path):
+    lines = lines_every(7, 50)
+    path = write_log(tmp_path / 'access', lines)
+    index = load_time_index(path)
+    assert index['offset'] == os.path.getsize(path)
+    assert [bucket[0] for bucket in index['buckets']] == [epoch(60 * i) for i in range(6)]
+    more = lines_every(7, 50, start=350, first_conn=51)
+    with open(path, 'a') as f:
+        f.write(''.join(line + '\n' for line in more))
+    since = parse_time_bound('03/Oct/2023:00:09:00')
+    selected, before = window(path, since)
+    assert selected == expected(lines + more, epoch(540), epoch(10 ** 6))
+    assert before == (lines + more).index(selected[0])
+    with open(path + TIME_INDEX_SUFFIX) as f:
+        index = json.load(f)
+    assert index['offset'] == os.path.getsize(path)
+    assert index['lines'] == 100
+    assert [bucket[0] for bucket in index['buckets']] == [epoch(60 * i) for i in range(12)]
+
+
+def test_index_is_rebuilt_when_the_file_is_rotated(tmp_path):
+    path = write_log(tmp_path / 'access', lines_every(7, 50))
+    load_time_index(path)
+    # a new, larger, file an hour later replaces the indexed one
+    lines = lines_every(11, 60, start=3600, first_conn=1000)
+    write_log(path, lines)
+    index = load_time_index(path)
+    assert index['buckets'][0][:2] == [epoch(3600), 0]
+    assert index['offset'] == os.path.getsize(path)
+    selected, _ = window(path, parse_time_bound('03/Oct/2023:01:02:00'),
+                         parse_time_bound('03/Oct/2023:01:05:00'))
+    assert selected == expected(lines, epoch(3720), epoch(3900))
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import os
 import json
+import calendar
 import subprocess
 import tempfile
 import requests
@@ -10,6 +11,7 @@ import sys
 import argparse
 from dotenv import load_dotenv
 from agent_helper import is_ollama_available, get_available_ollama_models
+from analysis_store import AnalysisStore, QUERY_LIMIT
 
 # Reset environment variables before anything else
 # This ensures VSCode's injected values don't interfere
@@ -96,7 +98,8 @@ if DEBUG_MODE:
     log("Loading environment variables...", "INFO")
     log(f"OLLAMA_API_BASE={os.getenv('OLLAMA_API_BASE', 'Not set')}", "INFO")
 
-def run_analysis(log_dir, search_term, verbose=False, disable_ai=False, ollama_model=None):
+def run_analysis(log_dir, search_term, verbose=False, disable_ai=False, ollama_model=None,
+                 store_path=None):
     """Run the log analysis and return results"""
     # Create a temporary file to store the JSON results
     with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as tmp:
@@ -115,6 +118,9 @@ def run_analysis(log_dir, search_term, verbose=False, disable_ai=False, ollama_m
         
     if disable_ai:
         cmd.append('--disable-ai')
+
+    if store_path:
+        cmd.extend(['--store', store_path])
         
     # Add debug flag if in debug mode
     if DEBUG_MODE:
@@ -206,6 +212,8 @@ def main():
     search_term = st.sidebar.text_input("Search Term", value="error")
     verbose = st.sidebar.checkbox("Verbose Output")
     disable_ai = st.sidebar.checkbox("Disable AI Enhancement")
+    store_path = st.sidebar.text_input("Analysis Database (optional)", value="",
+                                       help="SQLite file the operations, connections and events are written to")
     
     # Show debug toggle in sidebar when in debug mode
     if DEBUG_MODE:
@@ -260,7 +268,8 @@ def main():
                     search_term=search_term,
                     verbose=verbose,
                     disable_ai=disable_ai,
-                    ollama_model=ollama_model
+                    ollama_model=ollama_model,
+                    store_path=store_path
                 )
                 
                 if error:
@@ -271,6 +280,57 @@ def main():
                             st.code(error_details)
                 else:
                     display_results(results, ollama_model)
+
+    if store_path and os.path.exists(store_path):
+        display_store_query(store_path)
+
+def parse_query_time(value, store):
+    """UTC epoch of a 'YYYY-MM-DD HH:MM:SS' time in the timezone of the logs, or None"""
+    if not value.strip():
+        return None
+    moment = datetime.fromisoformat(value.strip())
+    offset = moment.utcoffset()
+    local_epoch = calendar.timegm(moment.replace(tzinfo=None).timetuple())
+    return store.utc_epoch(local_epoch, None if offset is None else int(offset.total_seconds()))
+
+def display_store_query(store_path):
+    """Query the analysis database with the criteria of a form"""
+    st.header("Query the Analysis Database")
+    with st.form("store_query"):
+        table = st.selectbox("Rows", ["operations", "connections", "events"])
+        col1, col2, col3 = st.columns(3)
+        client_ip = col1.text_input("Client IP")
+        verb = col2.text_input("Verb (operations)")
+        min_etime = col3.number_input("Minimum etime (operations)", min_value=0.0, value=0.0)
+        since = col1.text_input("Since (YYYY-MM-DD HH:MM:SS)")
+        until = col2.text_input("Until (YYYY-MM-DD HH:MM:SS)")
+        limit = col3.number_input("Maximum rows", min_value=1, value=QUERY_LIMIT)
+        submitted = st.form_submit_button("Query")
+    if not submitted:
+        return
+    store = AnalysisStore(store_path)
+    try:
+        since_epoch = parse_query_time(since, store)
+        until_epoch = parse_query_time(until, store)
+        if table == "operations":
+            rows = store.operations(client_ip=client_ip or None, verb=verb.upper() or None,
+                                    min_etime=min_etime or None, since=since_epoch,
+                                    until=until_epoch, limit=int(limit))
+        elif table == "connections":
+            rows = store.connections(client_ip=client_ip or None, since=since_epoch,
+                                     until=until_epoch, limit=int(limit))
+        else:
+            rows = store.events(since=since_epoch, until=until_epoch, limit=int(limit))
+            for row in rows:
+                row['event'] = json.dumps(row['event'])
+    except ValueError as e:
+        st.error(f"Invalid query: {e}")
+        return
+    finally:
+        store.close()
+    st.subheader(f"{len(rows)} {table}")
+    if rows:
+        st.dataframe(pd.DataFrame(rows), use_container_width=True)
                     
 def display_results(results, ollama_model=None):
     """Display the analysis results in the Streamlit UI"""